@@ -0,0 +1,223 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from hellodb.consts import (
+    ASYNC_MAX_GROUP_OPS,
+    ASYNC_SCAN_CHUNK_SIZE,
+    DEFAULT_ASYNC_WORKERS,
+    DEL_OPERATION,
+    PUT_OPERATION,
+    TOMBSTONE_ENTRY,
+)
+from hellodb.db import HelloDB
+from hellodb.write_batch import WriteBatch
+
+
+class AsyncHelloDB(object):
+    """
+    asyncio front end of a HelloDB. Reads, scans and commits run in a
+    dedicated thread pool, the event loop only awaits them.
+
+    Writes are coalesced on the loop: while one group is being committed
+    the writes of other coroutines queue up, and the next group goes to
+    HelloDB.write as a single batch, one WAL record and one sync for all
+    of them. A group is applied atomically, so a failed commit fails every
+    write in it, except for writes the database refuses, such as a key of
+    the wrong type, which fail on their own.
+
+        db = await AsyncHelloDB.open(path, None)
+        await db.put("key", "value")
+        async for key, value in db.scan("a", "b"):
+            ...
+        await db.close()
+    """
+
+    def __init__(
+        self,
+        db,
+        executor=None,
+        max_workers=DEFAULT_ASYNC_WORKERS,
+        max_group_ops=ASYNC_MAX_GROUP_OPS,
+    ):
+        self._db = db
+        self._own_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers, thread_name_prefix="hellodb")
+        self._executor = executor
+        self._max_group_ops = max_group_ops
+        self._pending = deque()
+        self._commit_task = None
+        self.groups_committed = 0
+        self.ops_committed = 0
+
+    @classmethod
+    async def open(
+        cls, *args, executor=None, max_workers=DEFAULT_ASYNC_WORKERS, **kwargs
+    ):
+        """Open a HelloDB, recovery included, without blocking the loop."""
+        async_db = cls(None, executor, max_workers)
+        async_db._db = await async_db._run(lambda: HelloDB(*args, **kwargs))
+        return async_db
+
+    @property
+    def db(self):
+        return self._db
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def get(self, key):
+        return await self._run(self._db.get, key)
+
+    async def multi_get(self, keys):
+        return await self._run(self._db.multi_get, keys)
+
+    async def put(self, key, value):
+        await self._write([(PUT_OPERATION, key, value)])
+
+    async def delete(self, key):
+        await self._write([(DEL_OPERATION, key, TOMBSTONE_ENTRY)])
+
+    async def write(self, batch):
+        if len(batch) == 0:
+            return
+        await self._write(list(batch.ops))
+
+    async def _write(self, ops):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((ops, future))
+        if self._commit_task is None:
+            self._commit_task = asyncio.ensure_future(self._commit_groups())
+        await future
+
+    def _next_group(self):
+        group, num_ops = [], 0
+        while self._pending:
+            ops, future = self._pending[0]
+            if group and num_ops + len(ops) > self._max_group_ops:
+                break
+            self._pending.popleft()
+            group.append((ops, future))
+            num_ops += len(ops)
+        return group
+
+    @staticmethod
+    def _batch(group):
+        batch = WriteBatch()
+        for ops, _ in group:
+            for operation, key, value in ops:
+                if operation == PUT_OPERATION:
+                    batch.put(key, value)
+                else:
+                    batch.delete(key)
+        return batch
+
+    async def _commit_groups(self):
+        try:
+            while self._pending:
+                group = self._next_group()
+                try:
+                    await self._commit(group)
+                except (TypeError, ValueError):
+                    # HelloDB.write checks every op before logging any, one
+                    # bad write fails only its caller, the other writes of
+                    # the group are committed on their own
+                    for member in group:
+                        await self._commit_or_fail([member])
+                except Exception as ex:
+                    self._fail(group, ex)
+        finally:
+            self._commit_task = None
+
+    async def _commit(self, group):
+        batch = self._batch(group)
+        await self._run(self._db.write, batch)
+        self.groups_committed += 1
+        self.ops_committed += len(batch)
+        # cancelled writers may or may not have been committed
+        for _, future in group:
+            if not future.done():
+                future.set_result(None)
+
+    async def _commit_or_fail(self, group):
+        try:
+            await self._commit(group)
+        except Exception as ex:
+            self._fail(group, ex)
+
+    @staticmethod
+    def _fail(group, ex):
+        for _, future in group:
+            if not future.done():
+                future.set_exception(ex)
+
+    def scan(self, start=None, end=None, limit=None, reverse=False):
+        return AsyncDBIterator(
+            self, lambda: self._db.scan(start, end, limit, reverse)
+        )
+
+    def get_stats(self):
+        stats = self._db.get_stats()
+        stats["async"] = {
+            "groups_committed": self.groups_committed,
+            "ops_committed": self.ops_committed,
+            "pending_writes": len(self._pending),
+        }
+        return stats
+
+    async def close(self):
+        while self._commit_task is not None:
+            await asyncio.shield(self._commit_task)
+        await self._run(self._db.close)
+        if self._own_executor:
+            self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class AsyncDBIterator(object):
+    """
+    async for over a DBIterator. Entries are fetched in the executor
+    chunk_size at a time, so the loop is not entered once per entry.
+    """
+
+    def __init__(self, async_db, open_iterator, chunk_size=ASYNC_SCAN_CHUNK_SIZE):
+        self._async_db = async_db
+        self._open_iterator = open_iterator
+        self._iterator = None
+        self._chunk_size = chunk_size
+        self._buffer = deque()
+        self._exhausted = False
+
+    def _next_chunk(self):
+        if self._iterator is None:
+            self._iterator = self._open_iterator()
+        return list(islice(self._iterator, self._chunk_size))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._buffer:
+            if self._exhausted:
+                raise StopAsyncIteration
+            chunk = await self._async_db._run(self._next_chunk)
+            if len(chunk) < self._chunk_size:
+                self._exhausted = True
+            if not chunk:
+                raise StopAsyncIteration
+            self._buffer.extend(chunk)
+        return self._buffer.popleft()
+
+    async def aclose(self):
+        self._exhausted = True
+        self._buffer.clear()
+        if self._iterator is not None:
+            await self._async_db._run(self._iterator.close)
@@ -0,0 +1,5 @@
+from hellodb.bench.db_bench import main
+
+# guarded, shard worker processes import the main module again
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Puts/sec of thousands of concurrent coroutines, each writing then reading
+back its keys, with a WAL sync per commit. "coalesced" goes through
+AsyncHelloDB, "executor" hands every put to the same thread pool with
+run_in_executor. The event loop lag is how late a 1ms timer fires.
+
+    python -m hellodb.bench.async_writes [ops_per_coroutine]
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import sys
+import tempfile
+import time
+
+from hellodb.async_db import AsyncHelloDB
+from hellodb.consts import DEFAULT_ASYNC_WORKERS, WAL_SYNC_PER_COMMIT
+from hellodb import stats
+from hellodb.db import HelloDB
+from hellodb.stats import Statistics
+
+COROUTINE_COUNTS = (100, 1000, 5000)
+OPS_PER_COROUTINE = 4
+
+
+async def measure_lag(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def coalesced(db, num_coroutines, ops, latencies):
+    executor = ThreadPoolExecutor(DEFAULT_ASYNC_WORKERS)
+    async_db = AsyncHelloDB(db, executor)
+
+    async def worker(worker_id):
+        for i in range(ops):
+            key = "key{}-{}".format(worker_id, i)
+            start = time.perf_counter()
+            await async_db.put(key, "value{}".format(i))
+            latencies.append(time.perf_counter() - start)
+            assert await async_db.get(key) == "value{}".format(i)
+
+    await asyncio.gather(*[worker(w) for w in range(num_coroutines)])
+    executor.shutdown(wait=True)
+
+
+async def per_put_executor(db, num_coroutines, ops, latencies):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(DEFAULT_ASYNC_WORKERS)
+
+    async def worker(worker_id):
+        for i in range(ops):
+            key = "key{}-{}".format(worker_id, i)
+            start = time.perf_counter()
+            await loop.run_in_executor(executor, db.put, key, "value{}".format(i))
+            latencies.append(time.perf_counter() - start)
+            assert await loop.run_in_executor(executor, db.get, key) == (
+                "value{}".format(i)
+            )
+
+    await asyncio.gather(*[worker(w) for w in range(num_coroutines)])
+    executor.shutdown(wait=True)
+
+
+async def run(mode, num_coroutines, ops):
+    statistics = Statistics()
+    latencies, lags = [], []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = HelloDB(
+            tmp_dir,
+            None,
+            wal_sync_policy=WAL_SYNC_PER_COMMIT,
+            statistics=statistics,
+        )
+        stop = asyncio.Event()
+        lag_task = asyncio.ensure_future(measure_lag(stop, lags))
+        start = time.perf_counter()
+        await MODES[mode](db, num_coroutines, ops, latencies)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await lag_task
+        db.close()
+    latencies.sort()
+    puts = num_coroutines * ops
+    return {
+        "puts_per_sec": puts / elapsed,
+        "puts_per_sync": puts / max(1, statistics.get_ticker(stats.WAL_SYNCS)),
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1e3,
+        "max_lag_ms": max(lags, default=0.0) * 1e3,
+    }
+
+
+MODES = {"coalesced": coalesced, "executor": per_put_executor}
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else OPS_PER_COROUTINE
+    print(
+        "{:<11}{:>11}{:>12}{:>14}{:>10}{:>13}".format(
+            "mode", "coroutines", "puts/sec", "puts/sync", "p99 ms", "max lag ms"
+        )
+    )
+    for num_coroutines in COROUTINE_COUNTS:
+        for mode in MODES:
+            result = asyncio.run(run(mode, num_coroutines, ops))
+            print(
+                "{:<11}{:>11}{:>12.0f}{:>14.1f}{:>10.1f}{:>13.1f}".format(
+                    mode,
+                    num_coroutines,
+                    result["puts_per_sec"],
+                    result["puts_per_sync"],
+                    result["p99_ms"],
+                    result["max_lag_ms"],
+                )
+            )
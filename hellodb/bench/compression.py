@@ -0,0 +1,109 @@
+"""
+Table size, write throughput and read latency of each block compression
+codec, on JSON user records. Lookups bypass the block cache so every one
+reads and decompresses a block.
+
+    python -m hellodb.bench.compression [num_keys] [num_gets]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from hellodb.io.compression import COMPRESSION_TYPES
+from hellodb.sstable.block_sst_mngr import BlockSSTableROMngr, BlockSSTableRWMngr
+
+NUM_KEYS = 50000
+NUM_GETS = 20000
+WORDS = (
+    "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima "
+    "mike november oscar papa quebec romeo sierra tango uniform victor"
+).split()
+COUNTRIES = ("DE", "FR", "IN", "JP", "US", "BR", "GB", "CA")
+
+
+def make_record(rand, i):
+    record = json.dumps(
+        {
+            "id": i,
+            "name": "{} {}".format(rand.choice(WORDS), rand.choice(WORDS)).title(),
+            "email": "{}.{}@example.com".format(rand.choice(WORDS), i),
+            "country": rand.choice(COUNTRIES),
+            "created_at": "2024-{:02d}-{:02d}T{:02d}:{:02d}:00Z".format(
+                rand.randint(1, 12),
+                rand.randint(1, 28),
+                rand.randint(0, 23),
+                rand.randint(0, 59),
+            ),
+            "active": rand.random() < 0.8,
+            "score": round(rand.random() * 100, 2),
+            "tags": rand.sample(WORDS, 3),
+        }
+    )
+    return str.encode(record)
+
+
+def make_dataset(num_keys):
+    rand = random.Random(42)
+    return [
+        (str.encode("user{:08d}".format(i)), make_record(rand, i))
+        for i in range(num_keys)
+    ]
+
+
+def run(compression, dataset, num_gets):
+    raw_bytes = sum(len(key) + len(value) for key, value in dataset)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        sst_writer = BlockSSTableRWMngr(tmp_dir, 0, compression=compression)
+        for key, value in dataset:
+            sst_writer.write_key_value(key, value)
+        sst_writer.close()
+        write_time = time.perf_counter() - start
+        table_size = os.path.getsize(os.path.join(tmp_dir, "0.sst"))
+
+        sst_reader = BlockSSTableROMngr(tmp_dir, 0)
+        rand = random.Random(7)
+        keys = [rand.choice(dataset)[0] for _ in range(num_gets)]
+        start = time.perf_counter()
+        for key in keys:
+            sst_reader.get(key)
+        get_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in sst_reader.get_all_pairs():
+            pass
+        scan_time = time.perf_counter() - start
+        sst_reader.close()
+    return {
+        "size": table_size,
+        "ratio": raw_bytes / table_size,
+        "write_mb_s": raw_bytes / write_time / (1024 * 1024),
+        "get_us": get_time / num_gets * 1e6,
+        "scan_mb_s": raw_bytes / scan_time / (1024 * 1024),
+    }
+
+
+if __name__ == "__main__":
+    num_keys = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_KEYS
+    num_gets = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_GETS
+    dataset = make_dataset(num_keys)
+    print(
+        "{:<8}{:>12}{:>8}{:>12}{:>10}{:>12}".format(
+            "codec", "bytes", "ratio", "write MB/s", "get us", "scan MB/s"
+        )
+    )
+    for compression in COMPRESSION_TYPES:
+        result = run(compression, dataset, num_gets)
+        print(
+            "{:<8}{:>12}{:>8.2f}{:>12.2f}{:>10.1f}{:>12.2f}".format(
+                compression,
+                result["size"],
+                result["ratio"],
+                result["write_mb_s"],
+                result["get_us"],
+                result["scan_mb_s"],
+            )
+        )
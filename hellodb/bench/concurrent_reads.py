@@ -0,0 +1,65 @@
+"""
+Reads/sec of random gets for 1, 4 and 16 reader threads while a writer
+thread keeps putting new keys.
+
+    python -m hellodb.bench.concurrent_reads [num_keys] [seconds]
+"""
+import logging
+import random
+import sys
+import tempfile
+from threading import Event, Thread
+import time
+
+from hellodb.consts import WAL_SYNC_NONE
+from hellodb.db import HelloDB
+
+THREAD_COUNTS = (1, 4, 16)
+NUM_KEYS = 20000
+DURATION = 3.0
+
+
+def load(db, num_keys):
+    for i in range(num_keys):
+        db.put("key{:08d}".format(i), "value{}".format(i))
+
+
+def run(db, num_keys, num_threads, duration):
+    stop = Event()
+    counts = [0] * num_threads
+
+    def reader(thread_id):
+        rand = random.Random(thread_id)
+        while not stop.is_set():
+            db.get("key{:08d}".format(rand.randrange(num_keys)))
+            counts[thread_id] += 1
+
+    def writer():
+        i = num_keys
+        while not stop.is_set():
+            db.put("key{:08d}".format(i), "value{}".format(i))
+            i += 1
+
+    threads = [Thread(target=reader, args=(t,)) for t in range(num_threads)]
+    threads.append(Thread(target=writer))
+    for th in threads:
+        th.start()
+    time.sleep(duration)
+    stop.set()
+    for th in threads:
+        th.join()
+    return sum(counts) / duration
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    num_keys = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_KEYS
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else DURATION
+    print("{:>10}{:>14}".format("threads", "reads/sec"))
+    for num_threads in THREAD_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = HelloDB(tmp_dir, 2000, wal_sync_policy=WAL_SYNC_NONE)
+            load(db, num_keys)
+            rate = run(db, num_keys, num_threads, duration)
+            db.close()
+        print("{:>10}{:>14.0f}".format(num_threads, rate))
@@ -0,0 +1,416 @@
+"""
+db_bench style benchmarks against a HelloDB in a temporary directory.
+
+    python -m hellodb.bench --benchmarks fillrandom,readrandom --num 100000
+
+Benchmarks run in the given order against the same database, so fills
+have to come before the reads. Results are printed and, with --json,
+written as machine readable JSON.
+"""
+import argparse
+from bisect import bisect_left
+from itertools import accumulate
+import json
+import logging
+import platform
+import random
+import shutil
+import tempfile
+from threading import Event, Thread
+import time
+
+from hellodb.consts import COMPRESSION_NONE, WAL_SYNC_NONE, WAL_SYNC_POLICIES
+from hellodb.db import HelloDB
+from hellodb.io.compression import COMPRESSION_TYPES
+from hellodb.sharded_db import ShardedHelloDB
+from hellodb.stats import Statistics
+
+DEFAULT_BENCHMARKS = "fillseq,fillrandom,overwrite,readrandom,readseq,readmissing"
+DISTRIBUTION_UNIFORM = "uniform"
+DISTRIBUTION_ZIPFIAN = "zipfian"
+PERCENTILES = (50, 99, 99.9)
+
+
+class UniformKeys(object):
+    def __init__(self, num, rand):
+        self._num = num
+        self._rand = rand
+
+    def next(self):
+        return self._rand.randrange(self._num)
+
+
+class ZipfianKeys(object):
+    """
+    Zipfian key indexes, the popular ones scattered over the key space by
+    a hash as in YCSB's scrambled zipfian generator. Draws binary search
+    the precomputed cumulative distribution.
+    """
+
+    def __init__(self, num, rand, theta):
+        self._num = num
+        self._rand = rand
+        weights = [1.0 / (rank ** theta) for rank in range(1, num + 1)]
+        self._cdf = list(accumulate(weights))
+
+    def next(self):
+        rank = bisect_left(self._cdf, self._rand.random() * self._cdf[-1])
+        return _fnv1a(min(rank, self._num - 1)) % self._num
+
+
+def _fnv1a(value):
+    hash_value = 0xCBF29CE484222325
+    for _ in range(8):
+        hash_value ^= value & 0xFF
+        hash_value = (hash_value * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+        value >>= 8
+    return hash_value
+
+
+class Stats(object):
+    def __init__(self):
+        self.latencies = []
+        self.bytes = 0
+        self.found = 0
+        self.elapsed = 0.0
+
+    def merge(self, other):
+        self.latencies.extend(other.latencies)
+        self.bytes += other.bytes
+        self.found += other.found
+
+    def to_dict(self, name):
+        ops = len(self.latencies)
+        latencies = sorted(self.latencies)
+        result = {
+            "benchmark": name,
+            "ops": ops,
+            "found": self.found,
+            "seconds": self.elapsed,
+            "ops_per_sec": ops / self.elapsed if self.elapsed else 0.0,
+            "mb_per_sec": (
+                self.bytes / self.elapsed / (1024 * 1024) if self.elapsed else 0.0
+            ),
+            "latency_us": {},
+        }
+        if latencies:
+            result["latency_us"]["avg"] = sum(latencies) / ops * 1e6
+            for percentile in PERCENTILES:
+                index = min(ops - 1, int(ops * percentile / 100.0))
+                result["latency_us"]["p{}".format(percentile)] = latencies[index] * 1e6
+            result["latency_us"]["max"] = latencies[-1] * 1e6
+        return result
+
+
+class Benchmark(object):
+    def __init__(self, db, args):
+        self._db = db
+        self._args = args
+        self._value = b"v" * args.value_size
+
+    def key(self, index):
+        return str.encode(str(index).zfill(self._args.key_size))
+
+    def key_generator(self, seed):
+        rand = random.Random(self._args.seed + seed)
+        if self._args.distribution == DISTRIBUTION_ZIPFIAN:
+            return ZipfianKeys(self._args.num, rand, self._args.zipf_theta)
+        return UniformKeys(self._args.num, rand)
+
+    def run(self, name):
+        return getattr(self, name)()
+
+    def _run_threads(self, work, num_threads):
+        stats = [Stats() for _ in range(num_threads)]
+        threads = [
+            Thread(target=work, args=(thread_id, stats[thread_id]))
+            for thread_id in range(num_threads)
+        ]
+        start = time.perf_counter()
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        total = Stats()
+        total.elapsed = time.perf_counter() - start
+        for thread_stats in stats:
+            total.merge(thread_stats)
+        return total
+
+    def _ops_per_thread(self, ops):
+        return max(1, ops // self._args.threads)
+
+    def _write(self, key_index, seed):
+        ops = self._ops_per_thread(self._args.num)
+        entry_size = self._args.key_size + self._args.value_size
+
+        def work(thread_id, stats):
+            keys = self.key_generator(seed + thread_id)
+            for i in range(ops):
+                key = self.key(key_index(keys, thread_id * ops + i))
+                start = time.perf_counter()
+                self._db.put(key, self._value)
+                stats.latencies.append(time.perf_counter() - start)
+                stats.bytes += entry_size
+
+        return self._run_threads(work, self._args.threads)
+
+    def fillseq(self):
+        return self._write(lambda keys, i: i, 1)
+
+    def fillrandom(self):
+        # random order, the keys themselves are not drawn from a distribution
+        order = list(range(self._args.num))
+        random.Random(self._args.seed).shuffle(order)
+        return self._write(lambda keys, i: order[i % len(order)], 2)
+
+    def overwrite(self):
+        return self._write(lambda keys, i: keys.next(), 3)
+
+    def _read(self, seed, missing=False):
+        ops = self._ops_per_thread(self._args.reads or self._args.num)
+
+        def work(thread_id, stats):
+            keys = self.key_generator(seed + thread_id)
+            for _ in range(ops):
+                index = keys.next()
+                # indexes past num were never written
+                key = self.key(index + self._args.num if missing else index)
+                start = time.perf_counter()
+                value = self._db.get(key)
+                stats.latencies.append(time.perf_counter() - start)
+                if value:
+                    stats.found += 1
+                    stats.bytes += len(key) + len(value)
+
+        return self._run_threads(work, self._args.threads)
+
+    def readrandom(self):
+        return self._read(4)
+
+    def readmissing(self):
+        return self._read(5, missing=True)
+
+    def multireadrandom(self):
+        # an op is a multi_get of batch_size keys, compare found and MB/s
+        # with readrandom
+        batch_size = self._args.batch_size
+        ops = self._ops_per_thread((self._args.reads or self._args.num) // batch_size)
+
+        def work(thread_id, stats):
+            keys = self.key_generator(9 + thread_id)
+            for _ in range(ops):
+                batch = [self.key(keys.next()) for _ in range(batch_size)]
+                start = time.perf_counter()
+                values = self._db.multi_get(batch)
+                stats.latencies.append(time.perf_counter() - start)
+                for key, value in zip(batch, values):
+                    if value:
+                        stats.found += 1
+                        stats.bytes += len(key) + len(value)
+
+        return self._run_threads(work, self._args.threads)
+
+    def readseq(self):
+        stats = Stats()
+        iterator = self._db.scan()
+        start = time.perf_counter()
+        while True:
+            op_start = time.perf_counter()
+            entry = next(iterator, None)
+            if entry is None:
+                break
+            stats.latencies.append(time.perf_counter() - op_start)
+            stats.found += 1
+            stats.bytes += len(entry[0]) + len(entry[1])
+        stats.elapsed = time.perf_counter() - start
+        iterator.close()
+        return stats
+
+    def scan(self):
+        ops = self._ops_per_thread(
+            (self._args.reads or self._args.num) // self._args.scan_length
+        )
+
+        def work(thread_id, stats):
+            keys = self.key_generator(6 + thread_id)
+            for _ in range(ops):
+                start = time.perf_counter()
+                for key, value in self._db.scan(
+                    self.key(keys.next()), limit=self._args.scan_length
+                ):
+                    stats.found += 1
+                    stats.bytes += len(key) + len(value)
+                stats.latencies.append(time.perf_counter() - start)
+
+        return self._run_threads(work, self._args.threads)
+
+    def readwhilewriting(self):
+        # reader threads are measured, one writer overwrites keys until
+        # they are done
+        stop = Event()
+        writer_keys = self.key_generator(7)
+
+        def writer():
+            while not stop.is_set():
+                self._db.put(self.key(writer_keys.next()), self._value)
+
+        writer_th = Thread(target=writer)
+        writer_th.start()
+        try:
+            return self._read(8)
+        finally:
+            stop.set()
+            writer_th.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m hellodb.bench", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument(
+        "--benchmarks",
+        default=DEFAULT_BENCHMARKS,
+        help="comma separated list of {}".format(", ".join(BENCHMARKS)),
+    )
+    parser.add_argument("--num", type=int, default=100000, help="number of keys")
+    parser.add_argument(
+        "--reads", type=int, default=0, help="read operations, --num by default"
+    )
+    parser.add_argument("--key_size", type=int, default=16)
+    parser.add_argument("--value_size", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument(
+        "--distribution",
+        choices=(DISTRIBUTION_UNIFORM, DISTRIBUTION_ZIPFIAN),
+        default=DISTRIBUTION_UNIFORM,
+    )
+    parser.add_argument("--zipf_theta", type=float, default=0.99)
+    parser.add_argument("--scan_length", type=int, default=100)
+    parser.add_argument(
+        "--batch_size", type=int, default=500, help="keys per multireadrandom op"
+    )
+    parser.add_argument("--seed", type=int, default=301)
+    parser.add_argument(
+        "--wal_sync_policy", choices=WAL_SYNC_POLICIES, default=WAL_SYNC_NONE
+    )
+    parser.add_argument(
+        "--compression", choices=tuple(COMPRESSION_TYPES), default=COMPRESSION_NONE
+    )
+    parser.add_argument(
+        "--db", default=None, help="database directory, a temporary one by default"
+    )
+    parser.add_argument(
+        "--statistics",
+        action="store_true",
+        help="collect database statistics and print them at the end",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=0,
+        help="hash partition over this many shards, 0 for a single HelloDB",
+    )
+    parser.add_argument(
+        "--shard_processes",
+        action="store_true",
+        help="run every shard in its own worker process",
+    )
+    parser.add_argument(
+        "--value_log_threshold",
+        type=int,
+        default=None,
+        help="keep values of at least this many bytes in the value log",
+    )
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+def format_result(result):
+    latency = result["latency_us"]
+    return (
+        "{:<18}{:>12.0f} ops/s{:>10.2f} MB/s"
+        "  p50 {:>9.1f}  p99 {:>9.1f}  p99.9 {:>9.1f} us"
+    ).format(
+        result["benchmark"],
+        result["ops_per_sec"],
+        result["mb_per_sec"],
+        latency.get("p50", 0.0),
+        latency.get("p99", 0.0),
+        latency.get("p99.9", 0.0),
+    )
+
+
+BENCHMARKS = (
+    "fillseq",
+    "fillrandom",
+    "overwrite",
+    "readrandom",
+    "multireadrandom",
+    "readseq",
+    "readmissing",
+    "readwhilewriting",
+    "scan",
+)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [name.strip() for name in args.benchmarks.split(",")]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit("Unknown benchmarks: {}".format(", ".join(unknown)))
+    logging.getLogger().setLevel(logging.WARNING)
+    db_path = args.db or tempfile.mkdtemp(prefix="hellodb-bench-")
+    statistics = Statistics() if args.statistics else None
+    options = dict(
+        wal_sync_policy=args.wal_sync_policy,
+        compression=args.compression,
+        binary=True,
+        statistics=statistics,
+        value_log_threshold=args.value_log_threshold,
+    )
+    if args.shards:
+        db = ShardedHelloDB(
+            db_path,
+            None,
+            num_shards=args.shards,
+            processes=args.shard_processes,
+            **options
+        )
+    else:
+        db = HelloDB(db_path, None, **options)
+    benchmark = Benchmark(db, args)
+    results = []
+    try:
+        for name in names:
+            result = benchmark.run(name).to_dict(name)
+            results.append(result)
+            print(format_result(result))
+        db_stats = db.get_stats()
+        if args.statistics:
+            print(statistics.to_string() if args.shards else db.dump_stats())
+    finally:
+        db.close()
+        if args.db is None:
+            shutil.rmtree(db_path, ignore_errors=True)
+    report = {
+        "config": {
+            name: value for name, value in vars(args).items() if name != "json"
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+        "stats": db_stats,
+    }
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
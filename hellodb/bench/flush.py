@@ -0,0 +1,84 @@
+"""
+Memstore flush throughput in MB/s of SSTable written, for the legacy
+SSTable writer as it was before writes were buffered (every entry
+flushed and fsynced in both files), the buffered legacy writer and the
+block SSTable builder.
+
+    python -m hellodb.bench.flush [num_keys] [value_size]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from hellodb.consts import IDX_FILE_NAME_FORMAT, SST_FILE_NAME_FORMAT
+from hellodb.io import writer
+from hellodb.memstore.avl import AVLMemStore
+from hellodb.sstable.block_sst_mngr import BlockSSTableRWMngr
+from hellodb.sstable.sst_mngr import SSTableRWMngr
+
+NUM_KEYS = 100000
+VALUE_SIZE = 100
+
+
+class PerEntrySyncSSTableWriter(object):
+    """The legacy writer before buffering, the baseline of the other two."""
+
+    def __init__(self, tmp_dir):
+        self._sst_writer = writer.SSTWriter(
+            os.path.join(tmp_dir, SST_FILE_NAME_FORMAT.format(0))
+        )
+        self._index_writer = writer.IndexWriter(
+            os.path.join(tmp_dir, IDX_FILE_NAME_FORMAT.format(0))
+        )
+
+    def write_key_value(self, key, value):
+        offset = self._sst_writer.append(value)
+        self._index_writer.append(key, offset)
+
+    def close(self):
+        self._index_writer.close()
+        self._sst_writer.close()
+
+
+def make_memstore(num_keys, value_size):
+    memstore = AVLMemStore()
+    value = b"v" * value_size
+    for i in range(num_keys):
+        memstore.put(str.encode("key{:08d}".format(i)), value)
+    return memstore
+
+
+def table_size(tmp_dir):
+    return sum(
+        os.path.getsize(os.path.join(tmp_dir, name)) for name in os.listdir(tmp_dir)
+    )
+
+
+def run(make_writer, memstore):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        sst_writer = make_writer(tmp_dir)
+        for key, value in memstore.get_all_pairs():
+            sst_writer.write_key_value(key, value)
+        sst_writer.close()
+        elapsed = time.perf_counter() - start
+        size = table_size(tmp_dir)
+    return size / elapsed / (1024 * 1024), elapsed
+
+
+WRITERS = {
+    "synced": PerEntrySyncSSTableWriter,
+    "legacy": lambda tmp_dir: SSTableRWMngr(tmp_dir, 0),
+    "block": lambda tmp_dir: BlockSSTableRWMngr(tmp_dir, 0, temporary=True),
+}
+
+
+if __name__ == "__main__":
+    num_keys = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_KEYS
+    value_size = int(sys.argv[2]) if len(sys.argv) > 2 else VALUE_SIZE
+    memstore = make_memstore(num_keys, value_size)
+    print("{:<10}{:>10}{:>12}".format("writer", "MB/s", "seconds"))
+    for name, make_writer in WRITERS.items():
+        rate, elapsed = run(make_writer, memstore)
+        print("{:<10}{:>10.2f}{:>12.3f}".format(name, rate, elapsed))
@@ -0,0 +1,47 @@
+"""
+Puts/sec for 1, 8 and 64 concurrent writer threads under each WAL sync
+policy.
+
+    python -m hellodb.bench.group_commit [puts_per_thread]
+"""
+import logging
+import sys
+import tempfile
+from threading import Thread
+import time
+
+from hellodb.consts import WAL_SYNC_POLICIES
+from hellodb.db import HelloDB
+
+THREAD_COUNTS = (1, 8, 64)
+TOTAL_PUTS = 4000
+
+
+def run(sync_policy, num_threads, total_puts):
+    puts_per_thread = max(1, total_puts // num_threads)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = HelloDB(tmp_dir, 100000, wal_sync_policy=sync_policy)
+
+        def writer(thread_id):
+            for i in range(puts_per_thread):
+                db.put("key{}-{}".format(thread_id, i), "value{}".format(i))
+
+        threads = [Thread(target=writer, args=(t,)) for t in range(num_threads)]
+        start = time.perf_counter()
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        elapsed = time.perf_counter() - start
+        db.close()
+    return puts_per_thread * num_threads / elapsed
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    total_puts = int(sys.argv[1]) if len(sys.argv) > 1 else TOTAL_PUTS
+    print("{:<12}{:>10}{:>14}".format("policy", "threads", "puts/sec"))
+    for sync_policy in WAL_SYNC_POLICIES:
+        for num_threads in THREAD_COUNTS:
+            rate = run(sync_policy, num_threads, total_puts)
+            print("{:<12}{:>10}{:>14.0f}".format(sync_policy, num_threads, rate))
@@ -0,0 +1,64 @@
+"""
+Insert, lookup and sorted iteration cost of each memstore implementation
+for sequential (user0001, user0002, ...) and random keys.
+
+    python -m hellodb.bench.memstore [num_keys]
+"""
+import random
+import sys
+import time
+
+from hellodb.memstore.rw_memstore import MEMSTORE_TYPES
+
+NUM_KEYS = 5000
+
+
+def make_keys(num_keys, sequential):
+    keys = ["user{:08d}".format(i) for i in range(num_keys)]
+    if not sequential:
+        random.shuffle(keys)
+    return keys
+
+
+def run(memstore_cls, keys):
+    memstore = memstore_cls()
+    start = time.perf_counter()
+    for key in keys:
+        memstore.put(key, key)
+    insert_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in keys:
+        memstore.get(key)
+    get_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        for _ in memstore.get_all_pairs():
+            pass
+        iterate_time = "{:.3f}".format(time.perf_counter() - start)
+    except RecursionError:
+        iterate_time = "RecursionError"
+    return len(keys) / insert_time, len(keys) / get_time, iterate_time
+
+
+if __name__ == "__main__":
+    num_keys = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_KEYS
+    print(
+        "{:<8}{:<12}{:>14}{:>14}{:>16}".format(
+            "store", "keys", "puts/sec", "gets/sec", "iterate(s)"
+        )
+    )
+    for name, memstore_cls in sorted(MEMSTORE_TYPES.items()):
+        for sequential in (True, False):
+            keys = make_keys(num_keys, sequential)
+            puts, gets, iterate_time = run(memstore_cls, keys)
+            print(
+                "{:<8}{:<12}{:>14.0f}{:>14.0f}{:>16}".format(
+                    name,
+                    "sequential" if sequential else "random",
+                    puts,
+                    gets,
+                    iterate_time,
+                )
+            )
@@ -0,0 +1,122 @@
+"""
+Time to first request, opening the database plus one get, for data
+directories holding 10, 100 and 1000 tables and some WAL files left to
+replay. Each run opens a fresh copy of the directory, the files are in
+the page cache.
+
+    python -m hellodb.bench.recovery [keys_per_table] [wal_records] [threads]
+
+scan opens every table the way directories written before the manifest
+are, lazy opens none of them and preload fills the table cache.
+"""
+import glob
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from hellodb.consts import CURRENT_FILE_NAME, WAL_SYNC_NONE
+from hellodb.db import HelloDB
+
+TABLE_COUNTS = (10, 100, 1000)
+KEYS_PER_TABLE = 100
+WAL_RECORDS = 10000
+THREADS = 4
+
+
+def key(i):
+    return str.encode("key{:08d}".format(i))
+
+
+def build(db_path, num_tables, keys_per_table, wal_records):
+    # one table per keys_per_table puts, nothing is compacted away
+    db = HelloDB(
+        db_path,
+        keys_per_table,
+        wal_sync_policy=WAL_SYNC_NONE,
+        compaction_policy=None,
+        flush_workers=4,
+        binary=True,
+    )
+    value = b"v" * 100
+    for i in range(num_tables * keys_per_table):
+        db.put(key(i), value)
+    db.close()
+    # left in the WAL, close() does not flush the write memstore
+    db = HelloDB(
+        db_path,
+        None,
+        wal_sync_policy=WAL_SYNC_NONE,
+        compaction_policy=None,
+        write_buffer_size=1 << 30,
+        binary=True,
+    )
+    for i in range(wal_records):
+        db.put(key(i), value)
+    db.close()
+
+
+def remove_manifest(db_path):
+    os.remove(os.path.join(db_path, CURRENT_FILE_NAME))
+    for manifest in glob.glob(os.path.join(db_path, "MANIFEST-*")):
+        os.remove(manifest)
+
+
+def time_to_first_request(source, num_keys, mode, threads):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "db")
+        shutil.copytree(source, db_path)
+        if mode == "scan":
+            remove_manifest(db_path)
+        start = time.perf_counter()
+        db = HelloDB(
+            db_path,
+            None,
+            wal_sync_policy=WAL_SYNC_NONE,
+            compaction_policy=None,
+            recovery_threads=threads,
+            preload_tables=mode == "preload",
+            binary=True,
+        )
+        db.get(key(num_keys // 2))
+        elapsed = time.perf_counter() - start
+        recovery = db.get_recovery_stats()
+        db.close()
+    return elapsed, recovery
+
+
+if __name__ == "__main__":
+    keys_per_table = int(sys.argv[1]) if len(sys.argv) > 1 else KEYS_PER_TABLE
+    wal_records = int(sys.argv[2]) if len(sys.argv) > 2 else WAL_RECORDS
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else THREADS
+    logging.getLogger().setLevel(logging.WARNING)
+    print(
+        "{:>7}{:>10}{:>9}{:>12}{:>12}{:>12}".format(
+            "tables", "mode", "threads", "first req s", "tables s", "wal s"
+        )
+    )
+    for num_tables in TABLE_COUNTS:
+        with tempfile.TemporaryDirectory() as source:
+            build(source, num_tables, keys_per_table, wal_records)
+            for mode, mode_threads in (
+                ("scan", 1),
+                ("scan", threads),
+                ("lazy", 1),
+                ("lazy", threads),
+                ("preload", threads),
+            ):
+                elapsed, recovery = time_to_first_request(
+                    source, num_tables * keys_per_table, mode, mode_threads
+                )
+                print(
+                    "{:>7}{:>10}{:>9}{:>12.3f}{:>12.3f}{:>12.3f}".format(
+                        num_tables,
+                        mode,
+                        mode_threads,
+                        elapsed,
+                        recovery["tables_seconds"],
+                        recovery["wal_seconds"],
+                    )
+                )
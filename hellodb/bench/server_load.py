@@ -0,0 +1,143 @@
+"""
+Throughput and tail latency of hellodb.server against 1, 8 and 32
+concurrent connections. The server runs in its own process on a fresh
+database with a WAL sync per commit, every connection is driven by a
+thread sending pipelines of depth commands, reads with probability
+read_ratio. Latency is per pipeline, from send to the last reply.
+
+    python -m hellodb.bench.server_load [seconds] [depth] [read_ratio]
+"""
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from hellodb.client import HelloDBClient
+from hellodb.consts import DEFAULT_SERVER_HOST
+
+CONNECTION_COUNTS = (1, 8, 32)
+SECONDS = 3.0
+DEPTH = 16
+READ_RATIO = 0.5
+NUM_KEYS = 100000
+STARTUP_TIMEOUT = 30.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((DEFAULT_SERVER_HOST, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, port):
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "hellodb.server",
+            db_path,
+            "--port",
+            str(port),
+            "--log_level",
+            "WARNING",
+        ]
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while True:
+        try:
+            with HelloDBClient(DEFAULT_SERVER_HOST, port, 1) as client:
+                client.ping()
+            return process
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("hellodb.server did not start")
+            time.sleep(0.1)
+
+
+def key(i):
+    return str.encode("key{:08d}".format(i))
+
+
+def connection_worker(client, deadline, depth, read_ratio, latencies, ops):
+    rand = random.Random()
+    value = b"v" * 100
+    pipe = client.pipeline()
+    while time.monotonic() < deadline:
+        for _ in range(depth):
+            if rand.random() < read_ratio:
+                pipe.get(key(rand.randrange(NUM_KEYS)))
+            else:
+                pipe.put(key(rand.randrange(NUM_KEYS)), value)
+        start = time.perf_counter()
+        pipe.execute()
+        latencies.append(time.perf_counter() - start)
+        ops[0] += depth
+
+
+def run(port, num_connections, seconds, depth, read_ratio):
+    client = HelloDBClient(DEFAULT_SERVER_HOST, port, num_connections)
+    deadline = time.monotonic() + seconds
+    latencies = [[] for _ in range(num_connections)]
+    ops = [[0] for _ in range(num_connections)]
+    threads = [
+        threading.Thread(
+            target=connection_worker,
+            args=(client, deadline, depth, read_ratio, latencies[i], ops[i]),
+        )
+        for i in range(num_connections)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    client.close()
+    latencies = sorted(latency for worker in latencies for latency in worker)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e3
+
+    return {
+        "ops_per_sec": sum(worker[0] for worker in ops) / elapsed,
+        "p50_ms": percentile(0.5),
+        "p99_ms": percentile(0.99),
+        "p999_ms": percentile(0.999),
+    }
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else SECONDS
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else DEPTH
+    read_ratio = float(sys.argv[3]) if len(sys.argv) > 3 else READ_RATIO
+    logging.getLogger().setLevel(logging.WARNING)
+    print(
+        "{:>12}{:>7}{:>12}{:>10}{:>10}{:>11}".format(
+            "connections", "depth", "ops/sec", "p50 ms", "p99 ms", "p99.9 ms"
+        )
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        port = free_port()
+        server = start_server(os.path.join(tmp_dir, "db"), port)
+        try:
+            for num_connections in CONNECTION_COUNTS:
+                result = run(port, num_connections, seconds, depth, read_ratio)
+                print(
+                    "{:>12}{:>7}{:>12.0f}{:>10.2f}{:>10.2f}{:>11.2f}".format(
+                        num_connections,
+                        depth,
+                        result["ops_per_sec"],
+                        result["p50_ms"],
+                        result["p99_ms"],
+                        result["p999_ms"],
+                    )
+                )
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,92 @@
+"""
+Scaling of ShardedHelloDB over 1, 2, 4 and 8 shards, with the shards in
+this process and in worker processes. threads writer threads put
+num_keys random keys with a WAL sync per commit, then as many reader
+threads get them back. Speedups are against a single shard in the same
+mode, shard processes only scale up to the number of cores.
+
+    python -m hellodb.bench.sharded [num_keys] [threads]
+"""
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from hellodb.sharded_db import ShardedHelloDB
+
+SHARD_COUNTS = (1, 2, 4, 8)
+NUM_KEYS = 20000
+THREADS = 16
+
+
+def key(i):
+    return str.encode("key{:08d}".format(i))
+
+
+def run_threads(threads, target):
+    workers = [
+        threading.Thread(target=target, args=(worker,)) for worker in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def run(num_shards, processes, num_keys, threads):
+    value = b"v" * 100
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = ShardedHelloDB(
+            tmp_dir, None, num_shards=num_shards, processes=processes, binary=True
+        )
+        try:
+
+            def writer(worker):
+                rand = random.Random(worker)
+                for _ in range(num_keys // threads):
+                    db.put(key(rand.randrange(num_keys)), value)
+
+            def reader(worker):
+                rand = random.Random(worker)
+                for _ in range(num_keys // threads):
+                    db.get(key(rand.randrange(num_keys)))
+
+            ops = num_keys // threads * threads
+            put_seconds = run_threads(threads, writer)
+            get_seconds = run_threads(threads, reader)
+        finally:
+            db.close()
+    return ops / put_seconds, ops / get_seconds
+
+
+if __name__ == "__main__":
+    num_keys = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_KEYS
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else THREADS
+    logging.getLogger().setLevel(logging.WARNING)
+    print("{} cores, {} threads".format(os.cpu_count(), threads))
+    print(
+        "{:>10}{:>8}{:>12}{:>9}{:>12}{:>9}".format(
+            "mode", "shards", "puts/sec", "speedup", "gets/sec", "speedup"
+        )
+    )
+    for processes in (False, True):
+        base = None
+        for num_shards in SHARD_COUNTS:
+            puts, gets = run(num_shards, processes, num_keys, threads)
+            if base is None:
+                base = puts, gets
+            print(
+                "{:>10}{:>8}{:>12.0f}{:>8.2f}x{:>12.0f}{:>8.2f}x".format(
+                    "processes" if processes else "threads",
+                    num_shards,
+                    puts,
+                    puts / base[0],
+                    gets,
+                    gets / base[1],
+                )
+            )
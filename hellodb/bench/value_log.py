@@ -0,0 +1,111 @@
+"""
+Key-value separation against inline values: num_keys keys with value_size
+byte values are loaded and then overwritten in random order, once with
+every value inline and once with values of at least threshold bytes in
+the value log. Reports puts/sec and gets/sec, the bytes left in tables
+and value log files, write amplification, the bytes written to the WAL,
+flushed tables, compacted tables and the value log per byte put, and the
+value log bytes garbage collection reclaimed.
+
+    python -m hellodb.bench.value_log [num_keys] [value_size] [threshold]
+"""
+import logging
+import random
+import sys
+import tempfile
+import time
+
+from hellodb.consts import WAL_SYNC_NONE
+from hellodb.db import HelloDB
+from hellodb import stats
+from hellodb.stats import Statistics
+
+NUM_KEYS = 20000
+VALUE_SIZE = 4096
+THRESHOLD = 1024
+OVERWRITES = 2
+NUM_GETS = 10000
+MEMSTORE_SIZE = 1000
+VALUE_LOG_FILE_SIZE = 16 * 1024 * 1024
+
+
+def key(i):
+    return str.encode("key{:08d}".format(i))
+
+
+def run(num_keys, value_size, threshold):
+    rand = random.Random(301)
+    statistics = Statistics()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = HelloDB(
+            tmp_dir,
+            MEMSTORE_SIZE,
+            wal_sync_policy=WAL_SYNC_NONE,
+            binary=True,
+            statistics=statistics,
+            value_log_threshold=threshold,
+            value_log_file_size=VALUE_LOG_FILE_SIZE,
+        )
+        order = list(range(num_keys))
+        puts = 0
+        start = time.perf_counter()
+        for round_ in range(1 + OVERWRITES):
+            value = bytes([ord("a") + round_]) * value_size
+            for i in order:
+                db.put(key(i), value)
+            puts += len(order)
+            rand.shuffle(order)
+        put_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(NUM_GETS):
+            db.get(key(rand.randrange(num_keys)))
+        get_seconds = time.perf_counter() - start
+        db.collect_garbage()
+        db_stats = db.get_stats()
+        db.close()
+    value_log = db_stats["value_log"]
+    written = (
+        statistics.get_ticker(stats.WAL_BYTES)
+        + statistics.get_ticker(stats.FLUSH_BYTES)
+        + db_stats["compaction"].get("bytes_written", 0)
+        + value_log.get("bytes_written", 0)
+    )
+    return {
+        "puts_per_sec": puts / put_seconds,
+        "gets_per_sec": NUM_GETS / get_seconds,
+        "sstable_mb": db_stats["gauges"]["sstable_bytes"] / 1e6,
+        "value_log_mb": value_log.get("bytes", 0) / 1e6,
+        "write_amplification": written / statistics.get_ticker(stats.BYTES_WRITTEN),
+        "reclaimed_mb": value_log.get("gc_bytes_reclaimed", 0) / 1e6,
+    }
+
+
+if __name__ == "__main__":
+    num_keys = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_KEYS
+    value_size = int(sys.argv[2]) if len(sys.argv) > 2 else VALUE_SIZE
+    threshold = int(sys.argv[3]) if len(sys.argv) > 3 else THRESHOLD
+    logging.getLogger().setLevel(logging.WARNING)
+    print(
+        "{:>10}{:>12}{:>12}{:>11}{:>11}{:>10}{:>14}".format(
+            "threshold",
+            "puts/sec",
+            "gets/sec",
+            "sst MB",
+            "vlog MB",
+            "write amp",
+            "reclaimed MB",
+        )
+    )
+    for value_log_threshold in (None, threshold):
+        result = run(num_keys, value_size, value_log_threshold)
+        print(
+            "{:>10}{:>12.0f}{:>12.0f}{:>11.1f}{:>11.1f}{:>10.2f}{:>14.1f}".format(
+                "inline" if value_log_threshold is None else value_log_threshold,
+                result["puts_per_sec"],
+                result["gets_per_sec"],
+                result["sstable_mb"],
+                result["value_log_mb"],
+                result["write_amplification"],
+                result["reclaimed_mb"],
+            )
+        )
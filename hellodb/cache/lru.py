@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache(object):
+    """
+    Thread safe LRU cache bounded by the total charge, in bytes, of its
+    entries. Keys are (owner id, key) tuples, owners get their id from
+    new_id() and can drop all of their entries at once with erase_owner().
+    """
+
+    def __init__(self, capacity):
+        self._capacity = capacity
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._keys_by_owner = {}
+        self._usage = 0
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def usage(self):
+        return self._usage
+
+    def new_id(self):
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, charge):
+        if charge > self._capacity:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, charge)
+            self._keys_by_owner.setdefault(key[0], set()).add(key)
+            self._usage += charge
+            while self._usage > self._capacity:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._usage -= entry[1]
+        owner_keys = self._keys_by_owner[key[0]]
+        owner_keys.discard(key)
+        if not owner_keys:
+            del self._keys_by_owner[key[0]]
+
+    def erase_owner(self, owner_id):
+        with self._lock:
+            for key in list(self._keys_by_owner.get(owner_id, ())):
+                self._remove(key)
+
+    def to_dict(self):
+        return {
+            "capacity": self._capacity,
+            "usage": self._usage,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
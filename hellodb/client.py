@@ -0,0 +1,234 @@
+import queue
+import socket
+import threading
+
+from hellodb.consts import (
+    DEFAULT_CLIENT_POOL_SIZE,
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
+)
+from hellodb import resp
+
+
+class Connection(object):
+    """A blocking connection to a hellodb.server."""
+
+    def __init__(
+        self, host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT, timeout=None
+    ):
+        self._sock = socket.create_connection((host, port), timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+
+    def send(self, *commands):
+        self._sock.sendall(b"".join(resp.encode_command(*c) for c in commands))
+
+    def read_reply(self):
+        """Read a reply, an error reply is returned as a ResponseError."""
+        return resp.read_response(self._file)
+
+    def execute(self, *args):
+        self.send(args)
+        reply = self.read_reply()
+        if isinstance(reply, resp.ResponseError):
+            raise reply
+        return reply
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+
+class ConnectionPool(object):
+    """
+    Thread safe pool of up to max_connections connections, they are opened
+    on demand and callers block while all of them are in use.
+    """
+
+    def __init__(
+        self,
+        host=DEFAULT_SERVER_HOST,
+        port=DEFAULT_SERVER_PORT,
+        max_connections=DEFAULT_CLIENT_POOL_SIZE,
+        timeout=None,
+    ):
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._idle = queue.LifoQueue()
+        self._num_connections = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._num_connections < self._max_connections:
+                self._num_connections += 1
+                open_new = True
+            else:
+                open_new = False
+        if not open_new:
+            return self._idle.get()
+        try:
+            return Connection(self._host, self._port, self._timeout)
+        except Exception:
+            with self._lock:
+                self._num_connections -= 1
+            raise
+
+    def release(self, connection, broken=False):
+        # a connection whose replies were not all read cannot be reused
+        if broken or self._closed:
+            connection.close()
+            with self._lock:
+                self._num_connections -= 1
+            return
+        self._idle.put(connection)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._num_connections -= 1
+
+
+class HelloDBClient(object):
+    """
+    Client of hellodb.server, safe to share between threads. Keys and values
+    are bytes or str, values are returned as bytes and None when missing.
+
+        client = HelloDBClient("127.0.0.1", 6380)
+        client.put("key", "value")
+        with client.pipeline() as pipe:
+            for i in range(100):
+                pipe.put("key{}".format(i), "value")
+            pipe.get("key0")
+            replies = pipe.execute()
+    """
+
+    def __init__(
+        self,
+        host=DEFAULT_SERVER_HOST,
+        port=DEFAULT_SERVER_PORT,
+        max_connections=DEFAULT_CLIENT_POOL_SIZE,
+        timeout=None,
+    ):
+        self.pool = ConnectionPool(host, port, max_connections, timeout)
+
+    def execute(self, *args):
+        connection = self.pool.acquire()
+        broken = False
+        try:
+            return connection.execute(*args)
+        except resp.ResponseError:
+            raise
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.pool.release(connection, broken)
+
+    def ping(self):
+        return self.execute("PING")
+
+    def get(self, key):
+        return self.execute("GET", key)
+
+    def put(self, key, value):
+        self.execute("PUT", key, value)
+
+    def delete(self, *keys):
+        """Returns how many of the keys existed, a key given twice counts once."""
+        return self.execute("DEL", *keys)
+
+    def mget(self, keys):
+        return self.execute("MGET", *keys)
+
+    def scan(self, start=None, end=None, limit=None):
+        """Returns a list of (key, value), an unbounded scan is capped by the server."""
+        args = ["SCAN", start or b"", end or b""]
+        if limit is not None:
+            args.append(limit)
+        items = self.execute(*args)
+        return list(zip(items[::2], items[1::2]))
+
+    def pipeline(self):
+        return Pipeline(self)
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Pipeline(object):
+    """
+    Queues commands and sends them in one write on execute(), the server
+    runs pipelined puts together and commits them with a single WAL sync.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __len__(self):
+        return len(self._commands)
+
+    def get(self, key):
+        self._commands.append(("GET", key))
+        return self
+
+    def put(self, key, value):
+        self._commands.append(("PUT", key, value))
+        return self
+
+    def delete(self, *keys):
+        self._commands.append(("DEL",) + keys)
+        return self
+
+    def mget(self, keys):
+        self._commands.append(("MGET",) + tuple(keys))
+        return self
+
+    def execute(self, raise_on_error=True):
+        """
+        Returns the replies in command order. Error replies are raised, the
+        first one, after every reply was read, or returned in place when
+        raise_on_error is False.
+        """
+        commands, self._commands = self._commands, []
+        if not commands:
+            return []
+        pool = self._client.pool
+        connection = pool.acquire()
+        broken = True
+        try:
+            connection.send(*commands)
+            replies = [connection.read_reply() for _ in commands]
+            broken = False
+        finally:
+            pool.release(connection, broken)
+        if raise_on_error:
+            for reply in replies:
+                if isinstance(reply, resp.ResponseError):
+                    raise reply
+        return replies
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._commands = []
@@ -4,16 +4,153 @@ DEL_OPERATION = 3
 WAL_FILE_NAME_FORMAT = "{}.wal"
 WAL_HEADER_FORMAT = "<IHI"
 CRC_FORMAT = "<I"
-TOMBSTONE_ENTRY = "TOMBSTONE"
 WAL_HEADER_SIZE = 10
+WAL_BATCH_KEY_LEN = 0xFFFF
+WAL_BATCH_COUNT_FORMAT = "<I"
+WAL_BATCH_COUNT_SIZE = 4
+WAL_BATCH_OP_FORMAT = "<BHI"
+WAL_BATCH_OP_SIZE = 7
 FILE_START_INDEX = 0
 CRC_SIZE = 4
 WHENCE_BEGINING = 0
 
+
+class _Tombstone(object):
+    """
+    A deleted key in memstores, table reads and merges. It is not bytes,
+    so no value a user can store is equal to it. On disk a delete is a
+    typed WAL operation or a flagged table entry.
+    """
+
+    __slots__ = ()
+
+    def __len__(self):
+        # counted as an empty value by the memstore and write accounting
+        return 0
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return "TOMBSTONE_ENTRY"
+
+    def __reduce__(self):
+        # unpickles to the same object, in shard processes too
+        return "TOMBSTONE_ENTRY"
+
+
+TOMBSTONE_ENTRY = _Tombstone()
+# the value deletes were stored as before they were typed. It still marks
+# a delete in plain WAL records and in tables written without
+# SST_TYPED_DELETES_PROPERTY, a put of this value is logged as a typed
+# operation instead.
+LEGACY_TOMBSTONE_VALUE = b"TOMBSTONE"
+
 IDX_FILE_NAME_FORMAT = "{}.idx"
 IDX_HEADER_FORMAT = WAL_HEADER_FORMAT
 IDX_HEADER_SIZE = WAL_HEADER_SIZE
 
 SST_FILE_NAME_FORMAT = "{}.sst"
+VALUE_LOG_FILE_NAME_FORMAT = "{}.vlog"
+SST_TMP_FILE_NAME_FORMAT = "{}.sst.tmp"
+MANIFEST_FILE_NAME_FORMAT = "MANIFEST-{}"
+MANIFEST_EDIT_KEY = b"edit"
+CURRENT_FILE_NAME = "CURRENT"
+CURRENT_TMP_FILE_NAME = "CURRENT.tmp"
+
 SST_HEADER_FORMAT = "<II"
 SST_HEADER_SIZE = 8
+
+BLOCK_SST_MAGIC = 0x48454C4C4F425354
+BLOCK_SST_FOOTER_FORMAT = "<QIQIQ"
+BLOCK_SST_FOOTER_SIZE = 32
+BLOCK_ENTRY_HEADER_FORMAT = "<HI"
+BLOCK_ENTRY_HEADER_SIZE = 6
+# set in the value length of a block entry that deletes its key
+BLOCK_ENTRY_DELETE_FLAG = 0x80000000
+SST_TYPED_DELETES_PROPERTY = "typed_deletes"
+BLOCK_TRAILER_FORMAT = "<BI"
+BLOCK_TRAILER_SIZE = 5
+BLOCK_HANDLE_FORMAT = "<QI"
+BLOCK_HANDLE_SIZE = 12
+BLOCK_NO_COMPRESSION = 0
+BLOCK_ZLIB_COMPRESSION = 1
+BLOCK_LZMA_COMPRESSION = 2
+BLOCK_BZ2_COMPRESSION = 3
+COMPRESSION_NONE = "none"
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_LZMA = "lzma"
+COMPRESSION_BZ2 = "bz2"
+# a block is stored compressed only if that saves at least 1/8 of it
+BLOCK_COMPRESSION_MIN_SAVING = 8
+DEFAULT_SST_BLOCK_SIZE = 4096
+SST_WRITE_BUFFER_SIZE = 1024 * 1024
+DEFAULT_BLOOM_BITS_PER_KEY = 10
+DEFAULT_BLOCK_CACHE_SIZE = 8 * 1024 * 1024
+# largest single read multi_get coalesces adjacent blocks into
+MULTI_GET_MAX_READ_SIZE = 1024 * 1024
+DEFAULT_MAX_OPEN_TABLES = 1000
+DEFAULT_RECOVERY_THREADS = 4
+
+# a value kept in the value log is stored in memstores and tables as this
+# prefix followed by the (file id, offset, size) of its entry
+VALUE_POINTER_MAGIC = b"\x00HDBVPTR"
+VALUE_POINTER_FORMAT = "<QQI"
+VALUE_POINTER_SIZE = 28
+DEFAULT_VALUE_LOG_FILE_SIZE = 64 * 1024 * 1024
+# a value log file is collected once this share of it is dead
+DEFAULT_VALUE_LOG_GC_RATIO = 0.5
+VALUE_LOG_GC_FILES_PER_RUN = 4
+# live values moved by one commit during garbage collection
+VALUE_LOG_GC_BATCH_BYTES = 4 * 1024 * 1024
+
+COMPACTION_SIZE_TIERED = "size_tiered"
+COMPACTION_MIN_THRESHOLD = 4
+COMPACTION_MAX_THRESHOLD = 32
+COMPACTION_BUCKET_LOW = 0.5
+COMPACTION_BUCKET_HIGH = 1.5
+COMPACTION_MIN_SSTABLE_SIZE = 1024 * 1024
+
+MEMSTORE_SCAN_CHUNK_SIZE = 256
+# measured with tracemalloc, the node or dict slot plus the str headers of
+# the key and the value
+MEMSTORE_TREE_ENTRY_OVERHEAD = 208
+MEMSTORE_DICT_ENTRY_OVERHEAD = 120
+DEFAULT_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+DEFAULT_MAX_IMMUTABLE_MEMSTORES = 2
+DEFAULT_FLUSH_WORKERS = 1
+WRITE_SLOWDOWN_DELAY = 0.001
+# how often close() checks that the flush threads waited for are alive
+FLUSH_WAIT_INTERVAL = 0.1
+# a table write that failed is retried this many times, after a growing
+# delay, before flushing stops with a background error
+FLUSH_MAX_RETRIES = 3
+FLUSH_RETRY_DELAY = 0.1
+MEMSTORE_AVL = "avl"
+MEMSTORE_BST = "bst"
+MEMSTORE_SIMPLE = "simple"
+
+WAL_SYNC_PER_COMMIT = "per_commit"
+WAL_SYNC_INTERVAL = "interval"
+WAL_SYNC_NONE = "none"
+WAL_SYNC_POLICIES = (WAL_SYNC_PER_COMMIT, WAL_SYNC_INTERVAL, WAL_SYNC_NONE)
+WAL_DEFAULT_SYNC_INTERVAL_MS = 100
+
+DEFAULT_ASYNC_WORKERS = 4
+ASYNC_MAX_GROUP_OPS = 1000
+ASYNC_SCAN_CHUNK_SIZE = 256
+
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 6380
+# pipelined requests of one connection executing or waiting to be answered
+SERVER_MAX_IN_FLIGHT = 1024
+SERVER_DEFAULT_SCAN_LIMIT = 1000
+DEFAULT_CLIENT_POOL_SIZE = 8
+
+DEFAULT_NUM_SHARDS = 4
+SHARD_PARTITION_HASH = "hash"
+SHARD_PARTITION_RANGE = "range"
+SHARD_DIR_NAME_FORMAT = "shard-{:03d}"
+SHARDS_FILE_NAME = "SHARDS"
+SHARDS_TMP_FILE_NAME = "SHARDS.tmp"
+SHARD_SCAN_CHUNK_SIZE = 256
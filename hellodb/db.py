@@ -1,67 +1,453 @@
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import logging
 import os
 from queue import Queue
-from threading import Lock, Thread
+from threading import Condition, Event, Lock, Thread
 import time
 
-from hellodb.consts import FILE_START_INDEX, SST_FILE_NAME_FORMAT, TOMBSTONE_ENTRY
+from hellodb.consts import (
+    COMPACTION_SIZE_TIERED,
+    COMPRESSION_NONE,
+    DEFAULT_BLOCK_CACHE_SIZE,
+    DEFAULT_BLOOM_BITS_PER_KEY,
+    DEFAULT_FLUSH_WORKERS,
+    DEFAULT_MAX_IMMUTABLE_MEMSTORES,
+    DEFAULT_MAX_OPEN_TABLES,
+    DEFAULT_RECOVERY_THREADS,
+    DEFAULT_SST_BLOCK_SIZE,
+    DEFAULT_VALUE_LOG_FILE_SIZE,
+    DEFAULT_VALUE_LOG_GC_RATIO,
+    DEFAULT_WRITE_BUFFER_SIZE,
+    FILE_START_INDEX,
+    FLUSH_MAX_RETRIES,
+    FLUSH_RETRY_DELAY,
+    FLUSH_WAIT_INTERVAL,
+    IDX_FILE_NAME_FORMAT,
+    MEMSTORE_AVL,
+    MEMSTORE_SCAN_CHUNK_SIZE,
+    SST_FILE_NAME_FORMAT,
+    SST_TMP_FILE_NAME_FORMAT,
+    TOMBSTONE_ENTRY,
+    VALUE_LOG_GC_BATCH_BYTES,
+    VALUE_LOG_GC_FILES_PER_RUN,
+    WAL_DEFAULT_SYNC_INTERVAL_MS,
+    WAL_SYNC_PER_COMMIT,
+    WRITE_SLOWDOWN_DELAY,
+)
+from hellodb.cache.lru import LRUCache
+from hellodb.io.compression import compression_type
+from hellodb.io.encoders import check_key_length
+from hellodb.iterator import DBIterator
 from hellodb.logger import CustomAdapter, setup_logger
+from hellodb.manifest import Manifest, TableMeta, VersionEdit
 from hellodb.memstore.rw_memstore import RWMemstore
-from hellodb.sstable.sst_mngr import SSTableManager, SSTableROMngr, SSTableRWMngr
-from hellodb import utils
+from hellodb.sstable.block_sst_mngr import BlockSSTableRWMngr, FilterStats
+from hellodb.sstable.compaction import COMPACTION_POLICIES, CompactionManager
+from hellodb.sstable.sst_mngr import SSTableManager, open_sstable_reader
+from hellodb.sstable.table_cache import LazySSTable, TableCache
+from hellodb import stats, utils
+from hellodb.value_log import (
+    ValueLog,
+    ValueMovedError,
+    ValueRelocation,
+    decode_pointer,
+    encode_pointer,
+    is_value_pointer,
+)
+from hellodb.version import Version
+from hellodb.wal.group_commit import GroupCommitQueue
 from hellodb.wal.wal_mngr import WalManager
+from hellodb.write_batch import WriteBatch
 
 
 setup_logger()
 
 
+class BackgroundError(Exception):
+    """A flush failed for good, the database no longer accepts writes."""
+
+
+class PendingFlush(object):
+    """An immutable memstore queued for flushing and its SSTable, once written."""
+
+    __slots__ = ("memstore", "wal_path", "file_id", "reader")
+
+    def __init__(self, memstore, wal_path, file_id):
+        self.memstore = memstore
+        self.wal_path = wal_path
+        self.file_id = file_id
+        self.reader = None
+
+
+class RecoveryStats(object):
+    """What the last open had to recover and how long each step took."""
+
+    def __init__(self):
+        self.tables = 0
+        self.tables_opened = 0
+        self.wal_files = 0
+        self.wal_records = 0
+        self.manifest_seconds = 0.0
+        self.tables_seconds = 0.0
+        self.wal_seconds = 0.0
+        self.flush_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def to_dict(self):
+        return {
+            "tables": self.tables,
+            "tables_opened": self.tables_opened,
+            "wal_files": self.wal_files,
+            "wal_records": self.wal_records,
+            "manifest_seconds": self.manifest_seconds,
+            "tables_seconds": self.tables_seconds,
+            "wal_seconds": self.wal_seconds,
+            "flush_seconds": self.flush_seconds,
+            "total_seconds": self.total_seconds,
+        }
+
+
 class HelloDB(object):
-    def __init__(self, file_path, memstore_max_size):
+    def __init__(
+        self,
+        file_path,
+        memstore_max_size,
+        wal_sync_policy=WAL_SYNC_PER_COMMIT,
+        wal_sync_interval_ms=WAL_DEFAULT_SYNC_INTERVAL_MS,
+        memstore_type=MEMSTORE_AVL,
+        sstable_block_size=DEFAULT_SST_BLOCK_SIZE,
+        bloom_bits_per_key=DEFAULT_BLOOM_BITS_PER_KEY,
+        compaction_policy=COMPACTION_SIZE_TIERED,
+        block_cache_size=DEFAULT_BLOCK_CACHE_SIZE,
+        block_cache=None,
+        max_immutable_memstores=DEFAULT_MAX_IMMUTABLE_MEMSTORES,
+        flush_workers=DEFAULT_FLUSH_WORKERS,
+        write_buffer_size=DEFAULT_WRITE_BUFFER_SIZE,
+        write_buffer_manager=None,
+        compression=COMPRESSION_NONE,
+        binary=False,
+        statistics=None,
+        max_open_tables=DEFAULT_MAX_OPEN_TABLES,
+        recovery_threads=DEFAULT_RECOVERY_THREADS,
+        preload_tables=False,
+        value_log_threshold=None,
+        value_log_file_size=DEFAULT_VALUE_LOG_FILE_SIZE,
+        value_log_gc_ratio=DEFAULT_VALUE_LOG_GC_RATIO,
+    ):
         self.logger = CustomAdapter(
             logging.getLogger(__name__),
             {"logger": "{}".format("HelloDB")},
         )
         self._file_path = file_path
+        # keys and values are bytes everywhere below the API, in text mode
+        # they are encoded and decoded as UTF-8 here and nowhere else
+        self._binary = binary
+        # a stats.Statistics, possibly shared with other databases, or None
+        # to record nothing
+        self._statistics = statistics
+        # threads opening tables and reading WAL files at startup. Tables
+        # are opened lazily unless preload_tables fills the table cache.
+        self._recovery_threads = max(1, recovery_threads)
+        self._preload_tables = preload_tables
+        self._recovery_stats = RecoveryStats()
+        # the live tables and the next file id, a directory written before
+        # manifests is scanned once instead
+        start = time.monotonic()
+        self._manifest = Manifest(file_path)
+        self._has_manifest = self._manifest.recover()
+        self._recovery_stats.manifest_seconds = time.monotonic() - start
         self._next_id = self._get_next_id()
+        self._id_lock = Lock()
+        # the write memstore is flushed once it holds write_buffer_size
+        # bytes or, unless it is None, memstore_max_size entries
         self._memstore_max_size = memstore_max_size
+        self._write_buffer_size = write_buffer_size
+        self._write_buffer_manager = write_buffer_manager
+        self._sstable_block_size = sstable_block_size
+        self._bloom_bits_per_key = bloom_bits_per_key
+        # checked here so a bad name fails now, not in the first flush
+        compression_type(compression)
+        self._compression = compression
+        self._filter_stats = FilterStats()
+        # block_cache lets several databases share one cache
+        if block_cache is None and block_cache_size > 0:
+            block_cache = LRUCache(block_cache_size)
+        self._block_cache = block_cache
+        # tables are opened on first use, at most max_open_tables at a time
+        self._table_cache = TableCache(
+            file_path, max_open_tables, self._filter_stats, block_cache, statistics
+        )
         self._lock = Lock()
-        self._sst_mngr = SSTableManager()
-        self._rw_memstore = RWMemstore()
-        self._wal_mngr = WalManager(file_path)
+        # notified whenever flushed memstores are installed
+        self._flush_done = Condition(self._lock)
+        # orders table installs and the WAL deletes that follow them
+        self._install_lock = Lock()
+        self._max_immutable_memstores = max(1, max_immutable_memstores)
+        self._flush_workers = max(1, flush_workers)
+        self._pending_flushes = deque()
+        # set once a memstore could not be flushed. The memstores queued
+        # behind it can never be installed, so writes fail from then on
+        # instead of stalling forever.
+        self._background_error = None
+        self._sst_mngr = SSTableManager(statistics)
+        self._rw_memstore = RWMemstore(memstore_type)
+        # values of at least value_log_threshold bytes are kept in value
+        # log files, the WAL and tables hold pointers to them. Sealed files
+        # are collected once value_log_gc_ratio of them is dead.
+        self._value_log_gc_ratio = value_log_gc_ratio
+        self._gc_lock = Lock()
+        self._gc_wakeup = Event()
+        self._gc_stop = Event()
+        self._gc_cursor = -1
+        self._gc_thread = None
+        self._value_log = ValueLog(
+            file_path,
+            value_log_threshold,
+            value_log_file_size,
+            statistics,
+            on_seal=self._gc_wakeup.set,
+        )
+        self._wal_mngr = WalManager(
+            file_path,
+            sync_policy=wal_sync_policy,
+            sync_interval_ms=wal_sync_interval_ms,
+            statistics=statistics,
+            before_sync=self._value_log.sync,
+        )
+        self._write_queue = GroupCommitQueue(self._commit_records)
         self._flush_queue = Queue()
+        self._compaction_mngr = self._create_compaction_manager(compaction_policy)
+        self._version = None
         self._do_recoevery()
-        self._start_flushing_thread()
+        self._start_flushing_threads()
+        if self._compaction_mngr is not None:
+            self._compaction_mngr.start()
+            self._compaction_mngr.maybe_schedule()
+        if self._value_log.enabled:
+            self._start_value_log_gc_thread()
+
+    def _create_compaction_manager(self, compaction_policy):
+        """
+        compaction_policy is a policy name, a policy object or None to
+        disable background compaction.
+        """
+        if compaction_policy is None:
+            return None
+        if isinstance(compaction_policy, str):
+            if compaction_policy not in COMPACTION_POLICIES:
+                raise ValueError(
+                    "Unknown compaction policy {}".format(compaction_policy)
+                )
+            compaction_policy = COMPACTION_POLICIES[compaction_policy]()
+        return CompactionManager(
+            self._file_path,
+            self._sst_mngr,
+            self._allocate_file_id,
+            self._install_compaction,
+            compaction_policy,
+            self._sstable_block_size,
+            self._bloom_bits_per_key,
+            self._filter_stats,
+            self._block_cache,
+            self._compression,
+            self._statistics,
+        )
 
     def _do_recoevery(self):
+        recovery = self._recovery_stats
+        start = time.monotonic()
         self._rebuild_sstable_readers()
+        recovery.tables_seconds = time.monotonic() - start
         self._recover_by_replaying_wal_logs()
+        recovery.total_seconds = recovery.manifest_seconds + time.monotonic() - start
+        self.logger.info(
+            "Recovered {} tables, {} opened, and {} records from {} WAL files"
+            " in {:.3f}s".format(
+                recovery.tables,
+                recovery.tables_opened,
+                recovery.wal_records,
+                recovery.wal_files,
+                recovery.total_seconds,
+            )
+        )
 
     def _get_next_id(self):
+        if self._has_manifest:
+            return self._manifest.next_file_id
         sst_files = utils.get_sstfiles(self._file_path)
         if not sst_files:
             return FILE_START_INDEX
         else:
             return utils.get_file_id_from_absolute_path(sst_files[-1]) + 1
 
-    def _start_flushing_thread(self):
-        flush_th = Thread(target=self._flushing_thread)
-        flush_th.daemon = True
-        flush_th.start()
+    def _allocate_file_id(self):
+        with self._id_lock:
+            file_id = self._next_id
+            self._next_id += 1
+            return file_id
+
+    def _start_flushing_threads(self):
+        self._flush_threads = []
+        for _ in range(self._flush_workers):
+            flush_th = Thread(target=self._flushing_thread)
+            flush_th.daemon = True
+            flush_th.start()
+            self._flush_threads.append(flush_th)
+
+    def _wait_for_flushes(self):
+        # queued memstores must be installed before the manifest closes,
+        # unless flushing stopped
+        with self._lock:
+            while self._pending_flushes and self._flush_failure() is None:
+                self._flush_done.wait(FLUSH_WAIT_INTERVAL)
+
+    def _stop_flushing_threads(self):
+        # a thread that installed the last table may still be deleting its
+        # WAL, nothing of a flush may outlive close()
+        for _ in self._flush_threads:
+            self._flush_queue.put(None)
+        for flush_th in self._flush_threads:
+            flush_th.join()
+
+    def _flush_failure(self):
+        # the error that stopped flushing, None while queued memstores can
+        # still be installed
+        if self._background_error is None and not any(
+            flush_th.is_alive() for flush_th in self._flush_threads
+        ):
+            self._background_error = BackgroundError("Every flush thread died")
+        return self._background_error
+
+    def _check_background_error(self):
+        error = self._flush_failure()
+        if error is not None:
+            raise BackgroundError(
+                "Flushing failed, the database is read only: {}".format(error)
+            ) from error
+
+    def _start_value_log_gc_thread(self):
+        self._gc_thread = Thread(target=self._value_log_gc_thread)
+        self._gc_thread.daemon = True
+        self._gc_thread.start()
+        # files sealed by earlier sessions may be collectable already
+        self._gc_wakeup.set()
+
+    def _value_log_gc_thread(self):
+        # woken up whenever a value log file is sealed
+        while True:
+            self._gc_wakeup.wait()
+            if self._gc_stop.is_set():
+                return
+            self._gc_wakeup.clear()
+            try:
+                collected = self.collect_garbage(VALUE_LOG_GC_FILES_PER_RUN)
+            except Exception as ex:
+                self.logger.exception("Exception happened during value log GC")
+                self.logger.debug(
+                    "Exception {} happened collecting value log files".format(ex)
+                )
+                continue
+            if collected == VALUE_LOG_GC_FILES_PER_RUN:
+                self._gc_wakeup.set()
 
     def _flushing_thread(self):
-        try:
-            while True:
-                store_to_flush, current_wal_path = self._flush_queue.get()
-                self._flush_memstore(current_wal_path, store_to_flush)
-        except Exception as ex:
-            self.logger.exception("Exception happened during flushing")
-            self.logger.debug(
-                "Exception {} happened during flushing memstore".format(ex)
+        while True:
+            pending = self._flush_queue.get()
+            if pending is None:
+                return
+            if self._background_error is not None:
+                # nothing queued after the failed memstore can be installed
+                continue
+            try:
+                self._flush_memstore(pending)
+            except Exception as ex:
+                self.logger.exception("Exception happened during flushing")
+                with self._lock:
+                    if self._background_error is None:
+                        self._background_error = ex
+                    self._flush_done.notify_all()
+
+    def _flush_memstore(self, pending):
+        # tables are written in parallel but installed in rotation order,
+        # a newer memstore must never land in the table list before an
+        # older one
+        start = time.perf_counter()
+        # the values the memstore points to must be durable before the
+        # table is, whatever the WAL sync policy
+        for attempt in range(FLUSH_MAX_RETRIES + 1):
+            try:
+                self._value_log.sync()
+                pending.reader = self._write_sstable(
+                    pending.memstore, pending.file_id
+                )
+                break
+            except Exception as ex:
+                if attempt == FLUSH_MAX_RETRIES:
+                    raise
+                self.logger.warning(
+                    "Flushing table {} failed, retrying: {}".format(
+                        pending.file_id, ex
+                    )
+                )
+                self._remove_partial_table(pending.file_id)
+                time.sleep(FLUSH_RETRY_DELAY * (attempt + 1))
+        if self._statistics is not None:
+            self._statistics.record_tick(stats.FLUSHES)
+            self._statistics.record_tick(stats.FLUSH_BYTES, pending.reader.size)
+            self._statistics.record(
+                stats.FLUSH_MICROS, (time.perf_counter() - start) * 1e6
             )
+        # a WAL is deleted once its table is installed, and strictly after
+        # the older ones. Replaying an older WAL over a newer table would
+        # bring back overwritten values. Only the install lock holder pops
+        # _pending_flushes, so the ready prefix stays put while the edit is
+        # synced to the manifest without holding self._lock, which reads
+        # take.
+        with self._install_lock:
+            with self._lock:
+                installed = []
+                for queued in self._pending_flushes:
+                    if queued.reader is None:
+                        break
+                    installed.append(queued)
+            if not installed:
+                return
+            edit = VersionEdit(self._next_id)
+            for done in installed:
+                edit.add_table(TableMeta.from_reader(done.reader))
+            self._manifest.log_and_apply(edit)
+            with self._lock:
+                for done in installed:
+                    self._pending_flushes.popleft()
+                    self._sst_mngr.add_reader(done.reader)
+                    self._rw_memstore.remove_immutable(done.memstore)
+                    if self._write_buffer_manager is not None:
+                        self._write_buffer_manager.free(
+                            done.memstore.size_in_bytes()
+                        )
+                self._install_version()
+                self._flush_done.notify_all()
+            for done in installed:
+                if done.wal_path:
+                    self.logger.debug("Deleting wal file {}".format(done.wal_path))
+                    os.remove(done.wal_path)
+        if self._compaction_mngr is not None:
+            for done in installed:
+                self._compaction_mngr.record_flush(done.reader.size)
+            self._compaction_mngr.maybe_schedule()
+
+    def _remove_partial_table(self, file_id):
+        # table files are opened for appending, a retry must start over
+        tmp_path = os.path.join(
+            self._file_path, SST_TMP_FILE_NAME_FORMAT.format(file_id)
+        )
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-    def _flush_memstore(self, wal_path, memstore):
-        sst_file_name = self._next_id
-        self._next_id += 1
+    def _write_sstable(self, memstore, sst_file_name):
         self.logger.debug(
             "Flushing memstore to file {}".format(
                 os.path.join(
@@ -69,65 +455,676 @@ class HelloDB(object):
                 )
             )
         )
-        sst_writer = SSTableRWMngr(self._file_path, sst_file_name)
+        sst_writer = BlockSSTableRWMngr(
+            self._file_path,
+            sst_file_name,
+            self._sstable_block_size,
+            self._bloom_bits_per_key,
+            temporary=True,
+            compression=self._compression,
+        )
         for key, value in memstore.get_all_pairs():
             sst_writer.write_key_value(key, value)
-        if wal_path:
-            self.logger.debug("Deleting wal file {}".format(wal_path))
-            os.remove(wal_path)
-        reader = SSTableROMngr(self._file_path, sst_file_name)
-        self._sst_mngr.add_reader(reader)
+        sst_writer.close()
+        return self._table_cache.adopt(
+            open_sstable_reader(
+                self._file_path,
+                sst_file_name,
+                self._filter_stats,
+                self._block_cache,
+                self._statistics,
+            )
+        )
+
+    def _install_compaction(self, old_readers, new_readers):
+        new_tables = [self._table_cache.adopt(reader) for reader in new_readers]
+        # once the edit is logged the inputs are dead even if the process
+        # dies before they are deleted
+        edit = VersionEdit(self._next_id)
+        for reader in old_readers:
+            edit.delete_table(reader.file_id)
+        for table in new_tables:
+            edit.add_table(TableMeta.from_reader(table))
+        self._manifest.log_and_apply(edit)
+        with self._lock:
+            self._sst_mngr.replace_readers(old_readers, new_tables)
+            self._install_version()
+
+    def _install_version(self):
+        # must be called with self._lock held
+        self._version = Version(
+            self._rw_memstore.wo_memstore,
+            self._rw_memstore.ro_memstores,
+            self._sst_mngr.get_current_reader(),
+        )
 
     def _rotate_wal_and_flush_memstore(self):
+        # must be called with self._lock held. Stalls the writer until a
+        # flush makes room when too many memstores are waiting. If flushing
+        # stopped the memstore is kept and the next write fails.
+        if self._rw_memstore.num_immutable() >= self._max_immutable_memstores:
+            self.logger.debug("Too many immutable memstores, stalling writes")
+            start = time.perf_counter()
+            while self._rw_memstore.num_immutable() >= self._max_immutable_memstores:
+                if self._flush_failure() is not None:
+                    self._record_stall(start)
+                    return
+                self._flush_done.wait(FLUSH_WAIT_INTERVAL)
+            self._record_stall(start)
         current_wal_path = self._wal_mngr.rotate()
-        store_to_flush = self._rw_memstore.wo_memstore
+        pending = self._queue_flush(current_wal_path)
+        self._flush_queue.put(pending)
+
+    def _queue_flush(self, wal_path):
+        # must be called with self._lock held. The table id is taken at
+        # rotation so table ids follow memstore age.
+        pending = PendingFlush(
+            self._rw_memstore.wo_memstore, wal_path, self._allocate_file_id()
+        )
+        if self._write_buffer_manager is not None:
+            self._write_buffer_manager.mark_immutable(
+                pending.memstore.size_in_bytes()
+            )
+        self._pending_flushes.append(pending)
         self._rw_memstore.switch_stores()
-        self._flush_queue.put((store_to_flush, current_wal_path))
+        self._install_version()
+        return pending
 
     def _recover_by_replaying_wal_logs(self):
-        for key, value in self._wal_mngr.replay():
-            self._rw_memstore.put(key, value)
+        # files are parsed ahead in a thread pool and applied in log order
+        recovery = self._recovery_stats
+        start = time.monotonic()
+        for wal_path, records in self._wal_mngr.replay_files(self._recovery_threads):
+            for key, value in records:
+                self._rw_memstore.put(key, value)
+            recovery.wal_files += 1
+            recovery.wal_records += len(records)
+            self.logger.info(
+                "Replayed {} ({} records), {} WAL files so far".format(
+                    os.path.basename(wal_path), len(records), recovery.wal_files
+                )
+            )
+        recovery.wal_seconds = time.monotonic() - start
+        start = time.monotonic()
         if self._rw_memstore.size() > 0:
-            store_to_flush = self._rw_memstore.wo_memstore
-            self._rw_memstore.switch_stores()
-            self._flush_memstore(None, store_to_flush)
+            if self._write_buffer_manager is not None:
+                self._write_buffer_manager.reserve(
+                    self._rw_memstore.wo_memstore.size_in_bytes()
+                )
+            with self._lock:
+                pending = self._queue_flush(None)
+            self._flush_memstore(pending)
         utils.remove_all_wal_files(self._file_path)
+        recovery.flush_seconds = time.monotonic() - start
 
     def _rebuild_sstable_readers(self):
-        sst_files = utils.get_sstfiles(self._file_path)
-        for sst_file in sst_files:
-            sst_file_name = utils.get_file_id_from_absolute_path(sst_file)
-            reader = SSTableROMngr(self._file_path, sst_file_name)
-            self._sst_mngr.add_reader(reader)
+        for tmp_file in utils.get_tmp_sstfiles(self._file_path):
+            self.logger.debug("Deleting partially written table {}".format(tmp_file))
+            os.remove(tmp_file)
+        if self._has_manifest:
+            readers = self._open_live_tables()
+        else:
+            readers = [
+                self._table_cache.adopt(reader)
+                for reader in self._scan_sstable_readers()
+            ]
+            self._recovery_stats.tables_opened = len(readers)
+        self._recovery_stats.tables = len(readers)
+        with self._lock:
+            for reader in readers:
+                self._sst_mngr.add_reader(reader)
+            self._install_version()
+        self._manifest.write_snapshot(
+            [TableMeta.from_reader(reader) for reader in readers], self._next_id
+        )
+
+    def _open_live_tables(self):
+        # nothing is read here, tables are opened by their first lookup
+        live_tables = self._manifest.live_tables()
+        self._delete_obsolete_tables({meta.file_id for meta in live_tables})
+        if self._preload_tables:
+            self._recovery_stats.tables_opened = self._table_cache.preload(
+                live_tables, self._recovery_threads
+            )
+            self.logger.info(
+                "Preloaded {} of {} tables".format(
+                    self._recovery_stats.tables_opened, len(live_tables)
+                )
+            )
+        return [LazySSTable(meta, self._table_cache) for meta in live_tables]
+
+    def _delete_obsolete_tables(self, live_ids):
+        # tables written by a flush or a compaction whose edit never made
+        # it to the manifest, and compaction inputs that were not deleted
+        for sst_file in utils.get_sstfiles(self._file_path):
+            file_id = utils.get_file_id_from_absolute_path(sst_file)
+            if file_id in live_ids:
+                continue
+            self.logger.debug(
+                "Deleting table {} missing from the manifest".format(file_id)
+            )
+            os.remove(sst_file)
+            idx_file = os.path.join(
+                self._file_path, IDX_FILE_NAME_FORMAT.format(file_id)
+            )
+            if os.path.exists(idx_file):
+                os.remove(idx_file)
+
+    def _scan_sstable_readers(self):
+        def open_table(sst_file):
+            return open_sstable_reader(
+                self._file_path,
+                utils.get_file_id_from_absolute_path(sst_file),
+                self._filter_stats,
+                self._block_cache,
+                self._statistics,
+            )
+
+        # without a manifest every table is opened to learn its age
+        with ThreadPoolExecutor(self._recovery_threads) as executor:
+            readers = list(
+                executor.map(open_table, utils.get_sstfiles(self._file_path))
+            )
+        # a compacted table takes the age of its newest input
+        readers.sort(key=lambda reader: (reader.source_ids[1], reader.file_id))
+        # inputs of a compaction that crashed before deleting them are
+        # covered by a newer table holding their whole source range
+        live_readers, newer_min_source = [], None
+        for reader in reversed(readers):
+            min_source = reader.source_ids[0]
+            if newer_min_source is not None and newer_min_source <= min_source:
+                self.logger.debug(
+                    "Deleting table {} left over by compaction".format(reader.file_id)
+                )
+                reader.delete()
+                continue
+            live_readers.append(reader)
+            if newer_min_source is None or min_source < newer_min_source:
+                newer_min_source = min_source
+        return live_readers[::-1]
+
+    def _encode(self, data):
+        if self._binary:
+            if type(data) is bytes:
+                return data
+            # bytearray and memoryview are copied since the memstore keeps
+            # them. Anything else is refused, bytes(5) is five zero bytes.
+            return bytes(memoryview(data))
+        if not isinstance(data, str):
+            raise TypeError(
+                "Expected str in text mode, got {}".format(type(data).__name__)
+            )
+        return data.encode("utf-8")
+
+    def _encode_key(self, key):
+        key = self._encode(key)
+        check_key_length(key)
+        return key
+
+    def _decode(self, data):
+        return data if self._binary else data.decode("utf-8")
 
     def get(self, key):
+        if self._statistics is None:
+            return self._decode(self._get(key)[0])
+        start = time.perf_counter()
+        value, ticker = self._get(key)
+        self._statistics.record_tick(stats.GET_CALLS)
+        self._statistics.record_tick(ticker)
+        self._statistics.record(stats.GET_MICROS, (time.perf_counter() - start) * 1e6)
+        return self._decode(value)
+
+    def _get(self, key):
+        """Return the value of key, b"" if it is missing, and where it was found."""
+        key = self._encode(key)
+        value, ticker = self._lookup(key)
+        return self._resolve(key, value), ticker
+
+    def _lookup(self, key):
+        # the stored value of an encoded key, possibly a value log pointer.
+        # Only the lookup in the write memstore, which is changed in place,
+        # takes the lock. Everything else in the version is immutable.
+        version = self._version
         with self._lock:
-            memstore_val = self._rw_memstore.get(key)
-            return_value = ""
-            if memstore_val and memstore_val != TOMBSTONE_ENTRY:
-                return_value = memstore_val
-            elif memstore_val == TOMBSTONE_ENTRY:
-                pass
-            elif memstore_val is None:
-                sstable_value = self._sst_mngr.get_current_reader().get(key)
-                if sstable_value is None:
-                    pass
-                else:
-                    return_value = sstable_value
-            return return_value
+            memstore_val = version.wo_memstore.get(key)
+        if memstore_val is None:
+            for memstore in version.ro_memstores:
+                memstore_val = memstore.get(key)
+                if memstore_val is not None:
+                    break
+        if memstore_val is not None:
+            if memstore_val is TOMBSTONE_ENTRY:
+                return b"", stats.GET_MISS
+            return memstore_val, stats.GET_HIT_MEMSTORE
+        sstable_value = version.sst_collection.get(key)
+        if sstable_value is None or sstable_value is TOMBSTONE_ENTRY:
+            return b"", stats.GET_MISS
+        return sstable_value, stats.GET_HIT_SSTABLE
 
-    def put(self, key, value):
+    def multi_get(self, keys):
+        """
+        Return the values of keys in the same order, missing keys read as
+        get() returns them. The memstores are searched once for all keys,
+        the rest are looked up table by table with the blocks of a table
+        read in file order, so a page of keys costs one pass instead of a
+        get() each.
+        """
+        if self._statistics is None:
+            return [self._decode(value) for value in self._multi_get(keys)]
+        start = time.perf_counter()
+        values = self._multi_get(keys)
+        self._statistics.record_tick(stats.MULTI_GET_CALLS)
+        self._statistics.record_tick(stats.MULTI_GET_KEYS, len(values))
+        self._statistics.record(
+            stats.MULTI_GET_MICROS, (time.perf_counter() - start) * 1e6
+        )
+        return [self._decode(value) for value in values]
+
+    def _multi_get(self, keys):
+        keys = [self._encode(key) for key in keys]
+        version = self._version
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = version.wo_memstore.get(key)
+                if value is not None:
+                    found[key] = value
+        for memstore in version.ro_memstores:
+            for key in keys:
+                if key not in found:
+                    value = memstore.get(key)
+                    if value is not None:
+                        found[key] = value
+        missing = [key for key in keys if key not in found]
+        if missing:
+            found.update(version.sst_collection.multi_get(missing))
+        values = []
+        pointers = []
+        for i, key in enumerate(keys):
+            value = found.get(key)
+            if value is None or value is TOMBSTONE_ENTRY:
+                value = b""
+            elif is_value_pointer(value):
+                pointers.append((decode_pointer(value), i))
+            values.append(value)
+        # separated values are read in value log order
+        for _, i in sorted(pointers):
+            values[i] = self._resolve(keys[i], values[i])
+        return values
+
+    def _resolve(self, key, value):
+        # a pointer into a collected file was relocated before the file
+        # was deleted, looking the key up again finds where it went
+        while is_value_pointer(value):
+            try:
+                return self._value_log.read(key, value)
+            except ValueMovedError:
+                value = self._lookup(key)[0]
+        return value
+
+    def scan(self, start=None, end=None, limit=None, reverse=False):
+        """
+        Return a DBIterator over the live keys with start <= key < end,
+        merging the memstores and all SSTables. Entries are streamed, so
+        writes made while iterating may or may not be seen.
+        """
+        start = None if start is None else self._encode(start)
+        end = None if end is None else self._encode(end)
+        return DBIterator(
+            self._open_scan_sources,
+            start,
+            end,
+            limit,
+            reverse,
+            None if self._binary else "utf-8",
+            self._resolve,
+        )
+
+    def _open_scan_sources(self, start, end, reverse):
+        # legacy tables open their index file here, under the lock a
+        # compaction cannot unlink it before the scan holds it
         with self._lock:
-            self._wal_mngr.append(key, value)
-            self._rw_memstore.put(key, value)
-            if self._rw_memstore.size() + 1 > self._memstore_max_size:
+            version = self._version
+            sources = [self._memstore_range(version.wo_memstore, start, end, reverse)]
+            for memstore in version.ro_memstores:
+                sources.append(memstore.get_range(start, end, reverse))
+            for reader in reversed(version.sst_collection.readers):
+                sources.append(reader.iterate_range(start, end, reverse))
+        return sources
+
+    def _memstore_range(self, memstore, start, end, reverse):
+        # the write memstore changes under us, so read it in chunks under
+        # the lock and re-seek after the last key of each chunk
+        while True:
+            with self._lock:
+                chunk = list(
+                    islice(
+                        memstore.get_range(start, end, reverse),
+                        MEMSTORE_SCAN_CHUNK_SIZE,
+                    )
+                )
+            for key, value in chunk:
+                yield key, value
+            if len(chunk) < MEMSTORE_SCAN_CHUNK_SIZE:
+                return
+            if reverse:
+                end = chunk[-1][0]
+            else:
+                start = chunk[-1][0] + b"\0"
+
+    def _commit_records(self, records):
+        # Called by the group commit leader only, so WAL writes and memstore
+        # updates happen in the same order. The WAL write and its fsync are
+        # done without holding self._lock so readers are not blocked on it.
+        # Records were encoded and checked by their writers, an error here
+        # fails the whole group.
+        self._check_background_error()
+        if self._rw_memstore.num_immutable() >= self._max_immutable_memstores:
+            # flushes are falling behind, slow writers down before they
+            # have to stall on the next rotation
+            time.sleep(WRITE_SLOWDOWN_DELAY)
+            if self._statistics is not None:
+                self._statistics.record_tick(stats.WRITE_SLOWDOWNS)
+        if self._write_buffer_manager is not None:
+            start = time.perf_counter()
+            if self._write_buffer_manager.wait_for_room(self._flush_failure):
+                self._record_stall(start)
+            self._check_background_error()
+        if self._statistics is not None:
+            self._record_write_group(records)
+        flush = False
+        if any(isinstance(record, ValueRelocation) for record in records):
+            flush = any(
+                record.flush
+                for record in records
+                if isinstance(record, ValueRelocation)
+            )
+            records = self._resolve_relocations(records)
+        # large values go to the value log first, the WAL only logs
+        # pointers to them
+        records = self._value_log.separate(records)
+        if records:
+            self._wal_mngr.append_many(records)
+        with self._lock:
+            memstore = self._rw_memstore.wo_memstore
+            size_before = memstore.size_in_bytes()
+            for record in records:
+                if isinstance(record, WriteBatch):
+                    for key, value in record:
+                        memstore.put(key, value)
+                else:
+                    memstore.put(*record)
+            if self._write_buffer_manager is not None:
+                self._write_buffer_manager.reserve(
+                    memstore.size_in_bytes() - size_before
+                )
+            if self._memstore_full(memstore) or (flush and memstore.size() > 0):
                 self.logger.debug(
-                    "Inserted key {} Current size {} of memstore  or equals maximum val {}".format(
-                        key, self._rw_memstore.size(), self._memstore_max_size
+                    "Inserted {} keys, memstore holds {} keys in {} bytes".format(
+                        len(records), memstore.size(), memstore.size_in_bytes()
                     )
                 )
                 self._rotate_wal_and_flush_memstore()
 
+    def _resolve_relocations(self, records):
+        # the values garbage collection moves become plain puts, but only
+        # for keys still pointing at the entry being collected. A key
+        # written since, in an earlier commit or earlier in this group,
+        # keeps its newer value.
+        resolved = []
+        written = set()
+        for record in records:
+            if isinstance(record, ValueRelocation):
+                for key, pointer, value in record.entries:
+                    if key not in written and self._lookup(key)[0] == pointer:
+                        resolved.append((key, value))
+                continue
+            if isinstance(record, WriteBatch):
+                written.update(key for key, _ in record)
+            else:
+                written.add(record[0])
+            resolved.append(record)
+        return resolved
+
+    def _record_stall(self, start):
+        if self._statistics is not None:
+            self._statistics.record_tick(stats.WRITE_STALLS)
+            self._statistics.record(
+                stats.WRITE_STALL_MICROS, (time.perf_counter() - start) * 1e6
+            )
+
+    def _record_write_group(self, records):
+        keys, size = 0, 0
+        for record in records:
+            if isinstance(record, ValueRelocation):
+                continue
+            for key, value in record if isinstance(record, WriteBatch) else (record,):
+                keys += 1
+                size += len(key) + len(value)
+        self._statistics.record_tick(stats.WRITE_GROUPS)
+        self._statistics.record_tick(stats.KEYS_WRITTEN, keys)
+        self._statistics.record_tick(stats.BYTES_WRITTEN, size)
+        self._statistics.record(stats.WRITE_GROUP_SIZE, len(records))
+
+    def _memstore_full(self, memstore):
+        if memstore.size_in_bytes() >= self._write_buffer_size:
+            return True
+        if (
+            self._memstore_max_size is not None
+            and memstore.size() + 1 > self._memstore_max_size
+        ):
+            return True
+        # over the shared budget, flush the memstore taking the write
+        return (
+            self._write_buffer_manager is not None
+            and self._write_buffer_manager.should_flush()
+            and memstore.size() > 0
+        )
+
+    def _commit(self, records):
+        if self._statistics is None:
+            self._write_queue.commit(records)
+            return
+        start = time.perf_counter()
+        self._write_queue.commit(records)
+        self._statistics.record(
+            stats.WRITE_MICROS, (time.perf_counter() - start) * 1e6
+        )
+
+    def put(self, key, value):
+        self._commit([(self._encode_key(key), self._encode(value))])
+
+    def delete(self, key):
+        self._commit([(self._encode_key(key), TOMBSTONE_ENTRY)])
+
+    def write(self, batch):
+        """
+        Atomically apply all operations of a WriteBatch. The batch is
+        logged as one WAL record and applied under one lock acquisition.
+        """
+        if len(batch) == 0:
+            return
+        self._commit([batch.encoded(self._encode_key, self._encode)])
+
+    def collect_garbage(self, max_files=None):
+        """
+        Collect sealed value log files at least value_log_gc_ratio dead,
+        checking up to max_files of them round robin. Live values are
+        rewritten through the write path, the memstores holding them are
+        flushed and only then are the files deleted, so a table or WAL
+        never points into a missing file. Returns the number of files
+        deleted.
+        """
+        with self._gc_lock:
+            file_ids = self._value_log.sealed_file_ids()
+            first = bisect_right(file_ids, self._gc_cursor)
+            file_ids = file_ids[first:] + file_ids[:first]
+            if max_files is not None:
+                file_ids = file_ids[:max_files]
+            collectable = []
+            for file_id in file_ids:
+                if self._gc_stop.is_set():
+                    break
+                self._gc_cursor = file_id
+                if self._relocate_live_values(file_id):
+                    collectable.append(file_id)
+            if not collectable:
+                return 0
+            # the overwrites that made the rest dead must be durable too
+            self._commit([ValueRelocation([], flush=True)])
+            if not self._wait_for_installed():
+                return 0
+            for file_id in collectable:
+                size = self._value_log.file_size(file_id)
+                self._value_log.delete(file_id)
+                self._value_log.stats.gc_files_collected += 1
+                self._value_log.stats.gc_bytes_reclaimed += size
+            return len(collectable)
+
+    def _relocate_live_values(self, file_id):
+        # returns False when too little of the file is dead to collect it
+        value_log = self._value_log
+        file_size = value_log.file_size(file_id)
+        live, live_bytes = [], 0
+        for offset, size, key, _ in value_log.read_entries(file_id):
+            if self._lookup(key)[0] == encode_pointer(file_id, offset, size):
+                live.append((offset, size, key))
+                live_bytes += size
+        value_log.stats.gc_files_checked += 1
+        dead_bytes = file_size - live_bytes
+        if file_size and dead_bytes < file_size * self._value_log_gc_ratio:
+            return False
+        self.logger.debug(
+            "Collecting value log file {}, {} of {} bytes live".format(
+                file_id, live_bytes, file_size
+            )
+        )
+        batch, batch_bytes = [], 0
+        for offset, size, key in live:
+            _, value = value_log.read_entry(file_id, offset, size)
+            batch.append((key, encode_pointer(file_id, offset, size), value))
+            batch_bytes += size
+            if batch_bytes >= VALUE_LOG_GC_BATCH_BYTES:
+                self._commit([ValueRelocation(batch)])
+                batch, batch_bytes = [], 0
+        if batch:
+            self._commit([ValueRelocation(batch)])
+        value_log.stats.gc_bytes_relocated += live_bytes
+        return True
+
+    def _wait_for_installed(self):
+        # waits for the memstores queued so far to be installed. False if
+        # the database is closing or flushing stopped first.
+        with self._lock:
+            if not self._pending_flushes:
+                return True
+            last = self._pending_flushes[-1]
+            while last in self._pending_flushes:
+                if self._gc_stop.is_set() or self._flush_failure() is not None:
+                    return False
+                self._flush_done.wait(FLUSH_WAIT_INTERVAL)
+        return True
+
+    def get_filter_stats(self):
+        return self._filter_stats.to_dict()
+
+    def get_block_cache_stats(self):
+        if self._block_cache is None:
+            return {}
+        return self._block_cache.to_dict()
+
+    def get_recovery_stats(self):
+        return self._recovery_stats.to_dict()
+
+    def get_table_cache_stats(self):
+        return self._table_cache.to_dict()
+
+    def get_write_buffer_stats(self):
+        if self._write_buffer_manager is None:
+            return {}
+        return self._write_buffer_manager.to_dict()
+
+    def get_compaction_stats(self):
+        if self._compaction_mngr is None:
+            return {}
+        return self._compaction_mngr.stats.to_dict()
+
+    def get_value_log_stats(self):
+        if not self._value_log.in_use():
+            return {}
+        return self._value_log.to_dict()
+
+    def get_stats(self):
+        """
+        Everything the database measures, as a dict. Tickers and histograms
+        are only there when the database was opened with statistics.
+        """
+        readers = self._sst_mngr.get_readers()
+        result = {
+            "gauges": {
+                "memstore_bytes": self._rw_memstore.wo_memstore.size_in_bytes(),
+                "memstore_entries": self._rw_memstore.size(),
+                "immutable_memstores": self._rw_memstore.num_immutable(),
+                "flush_queue_depth": self._flush_queue.qsize(),
+                "pending_flushes": len(self._pending_flushes),
+                "sstables": len(readers),
+                "sstable_bytes": sum(reader.size for reader in readers),
+            },
+            "filter": self.get_filter_stats(),
+            "block_cache": self.get_block_cache_stats(),
+            "table_cache": self.get_table_cache_stats(),
+            "recovery": self.get_recovery_stats(),
+            "write_buffer": self.get_write_buffer_stats(),
+            "compaction": self.get_compaction_stats(),
+            "value_log": self.get_value_log_stats(),
+        }
+        if self._statistics is not None:
+            result.update(self._statistics.to_dict())
+        return result
+
+    def dump_stats(self):
+        """Human readable version of get_stats()."""
+        stats_dict = self.get_stats()
+        lines = []
+        for section in (
+            "gauges",
+            "filter",
+            "block_cache",
+            "table_cache",
+            "recovery",
+            "write_buffer",
+            "compaction",
+            "value_log",
+        ):
+            if not stats_dict[section]:
+                continue
+            lines.append("** {} **".format(section))
+            for name, value in stats_dict[section].items():
+                lines.append("{:<28}{:>16}".format(name, round(value, 3)))
+        if self._statistics is not None:
+            lines.append("** statistics **")
+            lines.append(self._statistics.to_string())
+        return "\n".join(lines)
+
+    def close(self):
+        if self._gc_thread is not None:
+            self._gc_stop.set()
+            self._gc_wakeup.set()
+            self._gc_thread.join()
+        self._wait_for_flushes()
+        self._stop_flushing_threads()
+        if self._compaction_mngr is not None:
+            self._compaction_mngr.stop()
+        if self._write_buffer_manager is not None:
+            # queued memstores give their bytes back once they are flushed
+            self._write_buffer_manager.free(
+                self._rw_memstore.wo_memstore.size_in_bytes(), immutable=False
+            )
+        self._wal_mngr.close()
+        self._value_log.close()
+        self._manifest.close()
+        self._table_cache.close()
+
 
 if __name__ == "__main__":
     db = HelloDB(".", 100)
@@ -0,0 +1,146 @@
+import os
+import struct
+
+from hellodb.consts import (
+    BLOCK_ENTRY_HEADER_FORMAT,
+    BLOCK_ENTRY_HEADER_SIZE,
+    BLOCK_NO_COMPRESSION,
+    BLOCK_SST_FOOTER_FORMAT,
+    BLOCK_SST_FOOTER_SIZE,
+    BLOCK_SST_MAGIC,
+    BLOCK_TRAILER_FORMAT,
+    BLOCK_TRAILER_SIZE,
+)
+from hellodb.io.compression import decompress_block
+from hellodb.io.disk_file import DiskFile
+from hellodb.io.encoders import BlockEncoder
+from hellodb.utils import FileIOException
+
+
+class BlockSSTFile(DiskFile):
+    """
+    SSTable made of data blocks followed by a properties block, a sparse
+    index block and a fixed size footer:
+
+        [data block][trailer] ... [properties][trailer] [index][trailer] [footer]
+
+    A block handle is the (offset, size) of a block without its trailer.
+    The trailer holds the compression type of the block and the CRC of
+    the stored bytes, read_block() returns blocks decompressed. The file is
+    synced once, when the footer is written.
+    """
+
+    def __init__(
+        self, file_name, read_only, os_sync=True, use_mmap=False, buffer_size=-1
+    ):
+        super().__init__(
+            file_name,
+            read_only,
+            os_sync,
+            use_mmap,
+            buffer_size,
+        )
+        self._encoder = BlockEncoder(
+            BLOCK_ENTRY_HEADER_FORMAT, BLOCK_ENTRY_HEADER_SIZE, BLOCK_TRAILER_FORMAT
+        )
+
+    @property
+    def encoder(self):
+        return self._encoder
+
+    def append_block(self, block, compression=BLOCK_NO_COMPRESSION):
+        if self._wfh is None:
+            raise FileIOException(
+                "File {} is not opened in write mode".format(self.name)
+            )
+        block_offset = self._offset
+        trailer = self._encoder.encode_trailer(block, compression)
+        data_len = self._wfh.write(block)
+        data_len += self._wfh.write(trailer)
+        self._offset += data_len
+        return block_offset, len(block)
+
+    def write_footer(self, index_handle, properties_handle):
+        if self._wfh is None:
+            raise FileIOException(
+                "File {} is not opened in write mode".format(self.name)
+            )
+        footer = struct.pack(
+            BLOCK_SST_FOOTER_FORMAT,
+            index_handle[0],
+            index_handle[1],
+            properties_handle[0],
+            properties_handle[1],
+            BLOCK_SST_MAGIC,
+        )
+        self._offset += self._wfh.write(footer)
+        self._wfh.flush()
+        if self._os_sync:
+            self.sync()
+
+    def read_footer(self):
+        if self._offset < BLOCK_SST_FOOTER_SIZE:
+            raise FileIOException("File {} is too small".format(self.name))
+        if self._view is not None:
+            footer = self._view[self._offset - BLOCK_SST_FOOTER_SIZE : self._offset]
+        else:
+            footer = os.pread(
+                self.file_handler.fileno(),
+                BLOCK_SST_FOOTER_SIZE,
+                self._offset - BLOCK_SST_FOOTER_SIZE,
+            )
+        (
+            index_offset,
+            index_size,
+            properties_offset,
+            properties_size,
+            magic,
+        ) = struct.unpack(BLOCK_SST_FOOTER_FORMAT, footer)
+        if magic != BLOCK_SST_MAGIC:
+            raise FileIOException("File {} is not a block SSTable".format(self.name))
+        return (index_offset, index_size), (properties_offset, properties_size)
+
+    def read_block(self, offset, size):
+        if self._view is not None:
+            return self._read_mapped_block(offset, size)
+        # positional reads, concurrent readers do not share a file position
+        data = os.pread(self.file_handler.fileno(), size + BLOCK_TRAILER_SIZE, offset)
+        return self._decode_block(data, size)
+
+    def read_blocks(self, handles):
+        """
+        Read a run of adjacent blocks, sorted by offset, with a single read.
+        Every block is verified and decompressed as by read_block().
+        """
+        if self._view is not None:
+            return [self._read_mapped_block(*handle) for handle in handles]
+        start = handles[0][0]
+        end = handles[-1][0] + handles[-1][1] + BLOCK_TRAILER_SIZE
+        data = os.pread(self.file_handler.fileno(), end - start, start)
+        return [
+            self._decode_block(
+                data[offset - start : offset - start + size + BLOCK_TRAILER_SIZE],
+                size,
+            )
+            for offset, size in handles
+        ]
+
+    def _decode_block(self, data, size):
+        block, trailer = data[:size], data[size:]
+        compression, crc = self._encoder.decode_trailer(trailer)
+        if self._encoder.calculate_checksum(block, compression) != crc:
+            raise FileIOException("Mismatching CRC")
+        return decompress_block(block, compression)
+
+    def _read_mapped_block(self, offset, size):
+        block = self._view[offset : offset + size]
+        compression, crc = self._encoder.decode_trailer(
+            self._view[offset + size : offset + size + BLOCK_TRAILER_SIZE]
+        )
+        if self._encoder.calculate_checksum(block, compression) != crc:
+            raise FileIOException("Mismatching CRC")
+        # copied out of the mapping once, so callers can keep the block
+        # after the file is closed. Decompressing makes the copy.
+        if compression == BLOCK_NO_COMPRESSION:
+            return bytes(block)
+        return decompress_block(block, compression)
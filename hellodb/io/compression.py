@@ -0,0 +1,56 @@
+import bz2
+import lzma
+import zlib
+
+from hellodb.consts import (
+    BLOCK_BZ2_COMPRESSION,
+    BLOCK_COMPRESSION_MIN_SAVING,
+    BLOCK_LZMA_COMPRESSION,
+    BLOCK_NO_COMPRESSION,
+    BLOCK_ZLIB_COMPRESSION,
+    COMPRESSION_BZ2,
+    COMPRESSION_LZMA,
+    COMPRESSION_NONE,
+    COMPRESSION_ZLIB,
+)
+from hellodb.utils import FileIOException
+
+COMPRESSION_TYPES = {
+    COMPRESSION_NONE: BLOCK_NO_COMPRESSION,
+    COMPRESSION_ZLIB: BLOCK_ZLIB_COMPRESSION,
+    COMPRESSION_LZMA: BLOCK_LZMA_COMPRESSION,
+    COMPRESSION_BZ2: BLOCK_BZ2_COMPRESSION,
+}
+
+_CODECS = {
+    BLOCK_ZLIB_COMPRESSION: (zlib.compress, zlib.decompress),
+    BLOCK_LZMA_COMPRESSION: (lzma.compress, lzma.decompress),
+    BLOCK_BZ2_COMPRESSION: (bz2.compress, bz2.decompress),
+}
+
+
+def compression_type(name):
+    if name not in COMPRESSION_TYPES:
+        raise ValueError("Unknown compression {}".format(name))
+    return COMPRESSION_TYPES[name]
+
+
+def compress_block(block, compression):
+    """
+    Return (data, compression) to store for block. Blocks that do not
+    shrink enough are kept uncompressed, reading them back is cheaper.
+    """
+    if compression == BLOCK_NO_COMPRESSION:
+        return block, BLOCK_NO_COMPRESSION
+    data = _CODECS[compression][0](block)
+    if len(data) > len(block) - len(block) // BLOCK_COMPRESSION_MIN_SAVING:
+        return block, BLOCK_NO_COMPRESSION
+    return data, compression
+
+
+def decompress_block(data, compression):
+    if compression == BLOCK_NO_COMPRESSION:
+        return data
+    if compression not in _CODECS:
+        raise FileIOException("Unknown block compression {}".format(compression))
+    return _CODECS[compression][1](data)
@@ -1,23 +1,35 @@
+import mmap
 import os
 
 from hellodb.utils import FileIOException
 
 
 class DiskFile(object):
-    def __init__(self, file_name, read_only, os_sync=True):
+    def __init__(
+        self, file_name, read_only, os_sync=True, use_mmap=False, buffer_size=-1
+    ):
         self._wfh, self._rfh = None, None
-        self._open(file_name, read_only)
+        self._mmap, self._view = None, None
+        self._open(file_name, read_only, buffer_size)
         self._os_sync = os_sync
         self._offset = os.stat(self.name).st_size
+        if read_only and use_mmap and self._offset > 0:
+            self._map()
 
-    def _open(self, file_name, read_only):
+    def _open(self, file_name, read_only, buffer_size=-1):
         if not read_only:
-            self._wfh = open(file_name, "a+b")
+            self._wfh = open(file_name, "a+b", buffering=buffer_size)
         else:
             if not os.path.exists(file_name):
                 raise FileIOException("file {} not found".format(file_name))
             self._rfh = open(file_name, "r+b")
 
+    def _map(self):
+        # immutable files are mapped once, reads then slice the mapping
+        # without seeking a shared file position or issuing syscalls
+        self._mmap = mmap.mmap(self._rfh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
     @property
     def file_handler(self):
         return self._wfh if self._wfh is not None else self._rfh
@@ -39,6 +51,10 @@ class DiskFile(object):
         return self._offset
 
     def close(self):
+        if self._mmap is not None:
+            self._view.release()
+            self._mmap.close()
+            self._mmap, self._view = None, None
         if self._wfh is not None:
             self._wfh.close()
         else:
@@ -46,4 +62,5 @@ class DiskFile(object):
 
     def sync(self):
         if self._wfh is not None:
+            self._wfh.flush()
             os.fsync(self._wfh.fileno())
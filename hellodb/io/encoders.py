@@ -4,25 +4,77 @@ import struct
 from hellodb import consts
 
 
+def check_key_length(key):
+    """Keys are logged with a 16 bit length and 0xFFFF marks a batch record."""
+    if len(key) >= consts.WAL_BATCH_KEY_LEN:
+        raise ValueError(
+            "Keys must be shorter than {} bytes, got {}".format(
+                consts.WAL_BATCH_KEY_LEN, len(key)
+            )
+        )
+
+
 class WalFileEncoder(object):
+    """Keys and values are bytes, they are written without transcoding."""
+
     def __init__(self, wal_header_format, wal_header_size, crc_format):
         self.header_format = wal_header_format
         self.header_size = wal_header_size
         self.crc_format = crc_format
 
     def encode(self, key, value):
+        check_key_length(key)
         header = struct.pack(self.header_format, 0, len(key), len(value))
-        key = str.encode(key)
-        value = str.encode(value)
         crc = self.calculate_checksum(header, key, value)
         return struct.pack(self.crc_format, crc) + header[4:] + key + value
 
+    def encode_batch(self, ops):
+        """
+        Encode (operation, key, value) tuples as one WAL record. The record
+        uses the reserved key length WAL_BATCH_KEY_LEN and carries the
+        operations as its value, so they share a single CRC.
+        """
+        parts = [struct.pack(consts.WAL_BATCH_COUNT_FORMAT, len(ops))]
+        for operation, key, value in ops:
+            check_key_length(key)
+            if operation == consts.DEL_OPERATION:
+                value = b""
+            parts.append(
+                struct.pack(consts.WAL_BATCH_OP_FORMAT, operation, len(key), len(value))
+            )
+            parts.append(key)
+            parts.append(value)
+        payload = b"".join(parts)
+        header = struct.pack(
+            self.header_format, 0, consts.WAL_BATCH_KEY_LEN, len(payload)
+        )
+        crc = self.calculate_checksum(header, b"", payload)
+        return struct.pack(self.crc_format, crc) + header[4:] + payload
+
     def decode(self, value_bytes):
         crc, key_len, value_len = struct.unpack(
             self.header_format, value_bytes[: self.header_size]
         )
         return crc, key_len, value_len
 
+    def decode_batch(self, payload):
+        (count,) = struct.unpack_from(consts.WAL_BATCH_COUNT_FORMAT, payload)
+        offset = consts.WAL_BATCH_COUNT_SIZE
+        ops = []
+        for _ in range(count):
+            operation, key_len, value_len = struct.unpack_from(
+                consts.WAL_BATCH_OP_FORMAT, payload, offset
+            )
+            offset += consts.WAL_BATCH_OP_SIZE
+            key = payload[offset : offset + key_len]
+            offset += key_len
+            value = payload[offset : offset + value_len]
+            offset += value_len
+            if operation == consts.DEL_OPERATION:
+                value = consts.TOMBSTONE_ENTRY
+            ops.append((operation, key, value))
+        return ops
+
     def calculate_checksum(self, header, key, value):
         crc = binascii.crc32(
             header[consts.CRC_SIZE :]
@@ -40,7 +92,6 @@ class SSTFileEncoder(object):
 
     def encode(self, value):
         header = struct.pack(self.header_format, 0, len(value))
-        value = str.encode(value)
         crc = self.calculate_checksum(header, value)
         return struct.pack(self.crc_format, crc) + header[4:] + value
 
@@ -50,6 +101,10 @@ class SSTFileEncoder(object):
         )
         return crc, value_len
 
+    def decode_from(self, buffer, offset):
+        crc, value_len = struct.unpack_from(self.header_format, buffer, offset)
+        return crc, value_len
+
     def calculate_checksum(self, header, value):
         crc = binascii.crc32(
             header[consts.CRC_SIZE :]
@@ -60,3 +115,80 @@ class SSTFileEncoder(object):
 
 class IndexFileEncoder(WalFileEncoder):
     pass
+
+
+class BlockEncoder(object):
+    """
+    Encodes the entries of an SSTable block and the trailer that follows
+    every block on disk. Keys and values are handled as bytes.
+    """
+
+    def __init__(self, entry_header_format, entry_header_size, trailer_format):
+        self.entry_header_format = entry_header_format
+        self.entry_header_size = entry_header_size
+        self.trailer_format = trailer_format
+        self._entry_header = struct.Struct(entry_header_format)
+
+    def encode_entry(self, key, value):
+        if value is consts.TOMBSTONE_ENTRY:
+            header = self._entry_header.pack(len(key), consts.BLOCK_ENTRY_DELETE_FLAG)
+            return header + key
+        return self._entry_header.pack(len(key), len(value)) + key + value
+
+    def decode_entries(self, block):
+        """
+        Yield (key, value) for every entry of a block. Keys are bytes so
+        they can be ordered, values are memoryview slices of the block or
+        TOMBSTONE_ENTRY for a delete.
+        """
+        block = memoryview(block)
+        offset, block_len = 0, len(block)
+        while offset < block_len:
+            key_len, value_len = struct.unpack_from(
+                self.entry_header_format, block, offset
+            )
+            offset += self.entry_header_size
+            key = bytes(block[offset : offset + key_len])
+            offset += key_len
+            if value_len & consts.BLOCK_ENTRY_DELETE_FLAG:
+                yield key, consts.TOMBSTONE_ENTRY
+                continue
+            value = block[offset : offset + value_len]
+            offset += value_len
+            yield key, value
+
+    def find_entry(self, block, key):
+        """
+        Return the value of key in a sorted block as a memoryview,
+        TOMBSTONE_ENTRY for a delete or None. Entries are compared without
+        decoding the ones that are skipped.
+        """
+        offset, block_len = 0, len(block)
+        while offset < block_len:
+            key_len, value_len = struct.unpack_from(
+                self.entry_header_format, block, offset
+            )
+            offset += self.entry_header_size
+            entry_key = block[offset : offset + key_len]
+            deleted = value_len & consts.BLOCK_ENTRY_DELETE_FLAG
+            if entry_key == key:
+                if deleted:
+                    return consts.TOMBSTONE_ENTRY
+                offset += key_len
+                return memoryview(block)[offset : offset + value_len]
+            if entry_key > key:
+                return None
+            offset += key_len + (0 if deleted else value_len)
+        return None
+
+    def encode_trailer(self, block, compression):
+        crc = self.calculate_checksum(block, compression)
+        return struct.pack(self.trailer_format, compression, crc)
+
+    def decode_trailer(self, trailer):
+        compression, crc = struct.unpack(self.trailer_format, trailer)
+        return compression, crc
+
+    def calculate_checksum(self, block, compression):
+        crc = binascii.crc32(block)
+        return binascii.crc32(bytes([compression]), crc)
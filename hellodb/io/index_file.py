@@ -18,7 +18,7 @@ class IndexFile(WalFile):
         self._encoder = IndexFileEncoder(IDX_HEADER_FORMAT, IDX_HEADER_SIZE, CRC_FORMAT)
 
     def append(self, key, offset):
-        offset = str(offset)
+        offset = str.encode(str(offset))
         return super().append(key, offset)
 
     def read_all_entries(self):
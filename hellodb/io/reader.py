@@ -1,5 +1,9 @@
+import weakref
+
+from hellodb.io.block_sst_file import BlockSSTFile
 from hellodb.io.index_file import IndexFile
 from hellodb.io.sst_file import SSTFile
+from hellodb.io.value_log_file import ValueLogFile
 from hellodb.io.wal_file import WalFile
 
 
@@ -58,10 +62,11 @@ class IndexReader(object):
 
 
 class SSTReader(object):
-    def __init__(self, file_path):
+    def __init__(self, file_path, use_mmap=True):
         self._file = SSTFile(
             file_path,
             True,
+            use_mmap=use_mmap,
         )
 
     @property
@@ -81,3 +86,73 @@ class SSTReader(object):
 
     def read(self, offset):
         return self._file.read(offset)
+
+
+class ValueLogReader(object):
+    def __init__(self, file_path):
+        self._file = ValueLogFile(
+            file_path,
+            True,
+        )
+
+    @property
+    def name(self):
+        return self._file.name
+
+    @property
+    def basename(self):
+        return self._file.basename
+
+    @property
+    def size(self):
+        return self._file.size
+
+    def close(self):
+        self._file.close()
+
+    def read_entry(self, offset, size):
+        return self._file.read_entry(offset, size)
+
+    def read_entries(self):
+        return self._file.read_entries()
+
+    def release(self):
+        """Close the file once the last read using it is done."""
+        weakref.finalize(self, self._file.close)
+
+
+class BlockSSTReader(object):
+    def __init__(self, file_path, use_mmap=True):
+        self._file = BlockSSTFile(
+            file_path,
+            True,
+            use_mmap=use_mmap,
+        )
+
+    @property
+    def name(self):
+        return self._file.name
+
+    @property
+    def basename(self):
+        return self._file.basename
+
+    @property
+    def size(self):
+        return self._file.size
+
+    @property
+    def encoder(self):
+        return self._file.encoder
+
+    def close(self):
+        self._file.close()
+
+    def read_footer(self):
+        return self._file.read_footer()
+
+    def read_block(self, offset, size):
+        return self._file.read_block(offset, size)
+
+    def read_blocks(self, handles):
+        return self._file.read_blocks(handles)
@@ -1,8 +1,9 @@
+import os
+
 from hellodb.consts import (
     CRC_FORMAT,
     SST_HEADER_FORMAT,
     SST_HEADER_SIZE,
-    WHENCE_BEGINING,
 )
 from hellodb.io.disk_file import DiskFile
 from hellodb.io.encoders import SSTFileEncoder
@@ -10,11 +11,12 @@ from hellodb.utils import FileIOException
 
 
 class SSTFile(DiskFile):
-    def __init__(self, file_name, read_only, os_sync=True):
+    def __init__(self, file_name, read_only, os_sync=True, use_mmap=False):
         super().__init__(
             file_name,
             read_only,
             os_sync,
+            use_mmap,
         )
         self._encoder = SSTFileEncoder(SST_HEADER_FORMAT, SST_HEADER_SIZE, CRC_FORMAT)
 
@@ -26,19 +28,31 @@ class SSTFile(DiskFile):
         entry_offset = self._offset
         entry = self._encoder.encode(value)
         data_len = self._wfh.write(entry)
-        self._wfh.flush()
         if self._os_sync:
             self.sync()
         self._offset += data_len
         return entry_offset
 
     def read(self, offset):
-        fh = self._wfh if self._wfh is not None else self._rfh
-        fh.seek(offset, WHENCE_BEGINING)
-        header = fh.read(self._encoder.header_size)
+        if self._view is not None:
+            return self._read_mapped(offset)
+        # positional reads, concurrent readers do not share a file position
+        fileno = self.file_handler.fileno()
+        header = os.pread(fileno, self._encoder.header_size, offset)
         crc, value_len = self._encoder.decode(header)
-        value = fh.read(value_len)
+        value = os.pread(fileno, value_len, offset + self._encoder.header_size)
         new_crc = self._encoder.calculate_checksum(header, value)
         if new_crc != crc:
             raise FileIOException("Mismatching CRC")
-        return value.decode("utf-8")
+        return value
+
+    def _read_mapped(self, offset):
+        crc, value_len = self._encoder.decode_from(self._view, offset)
+        value_offset = offset + self._encoder.header_size
+        header = self._view[offset:value_offset]
+        value = self._view[value_offset : value_offset + value_len]
+        if self._encoder.calculate_checksum(header, value) != crc:
+            raise FileIOException("Mismatching CRC")
+        # copied out of the mapping, callers can keep the value after the
+        # file is closed
+        return bytes(value)
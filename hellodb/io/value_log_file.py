@@ -0,0 +1,78 @@
+import os
+
+from hellodb.consts import CRC_FORMAT, WAL_HEADER_FORMAT, WAL_HEADER_SIZE
+from hellodb.io.disk_file import DiskFile
+from hellodb.io.encoders import WalFileEncoder
+from hellodb.utils import FileIOException
+
+
+class ValueLogFile(DiskFile):
+    """
+    Append only file of (key, value) entries, framed like WAL records. An
+    entry is addressed by its (offset, size). The key is stored with the
+    value so garbage collection can tell whether the database still points
+    at the entry. Reads are positional, the file being appended to can be
+    read while it is written.
+    """
+
+    def __init__(self, file_name, read_only, os_sync=False):
+        super().__init__(
+            file_name,
+            read_only,
+            os_sync,
+        )
+        self._encoder = WalFileEncoder(WAL_HEADER_FORMAT, WAL_HEADER_SIZE, CRC_FORMAT)
+
+    def append_many(self, entries):
+        """Write (key, value) entries and return the (offset, size) of each."""
+        if self._wfh is None:
+            raise FileIOException(
+                "File {} is not opened in write mode".format(self.name)
+            )
+        handles = []
+        for key, value in entries:
+            entry = self._encoder.encode(key, value)
+            handles.append((self._offset, len(entry)))
+            self._offset += self._wfh.write(entry)
+        # readers use pread, the entries must reach the OS before the
+        # pointers to them are published
+        self._wfh.flush()
+        if self._os_sync:
+            self.sync()
+        return handles
+
+    def read_entry(self, offset, size):
+        data = os.pread(self.file_handler.fileno(), size, offset)
+        if len(data) < size:
+            raise FileIOException("Truncated value log entry at {}".format(offset))
+        return self._decode_entry(data)
+
+    def _decode_entry(self, data):
+        header_size = self._encoder.header_size
+        crc, key_len, value_len = self._encoder.decode(data)
+        if header_size + key_len + value_len != len(data):
+            raise FileIOException("Malformed value log entry")
+        key = data[header_size : header_size + key_len]
+        value = data[header_size + key_len :]
+        if self._encoder.calculate_checksum(data[:header_size], key, value) != crc:
+            raise FileIOException("Mismatching CRC")
+        return key, value
+
+    def read_entries(self):
+        """
+        Yield (offset, size, key, value) for every entry in file order. An
+        entry cut short by a crash ends the file.
+        """
+        fileno = self.file_handler.fileno()
+        header_size = self._encoder.header_size
+        offset = 0
+        while offset + header_size <= self._offset:
+            _, key_len, value_len = self._encoder.decode(
+                os.pread(fileno, header_size, offset)
+            )
+            size = header_size + key_len + value_len
+            if offset + size > self._offset:
+                return
+            key, value = self.read_entry(offset, size)
+            yield offset, size, key, value
+            offset += size
@@ -1,5 +1,10 @@
 from hellodb.consts import (
     CRC_FORMAT,
+    DEL_OPERATION,
+    LEGACY_TOMBSTONE_VALUE,
+    PUT_OPERATION,
+    TOMBSTONE_ENTRY,
+    WAL_BATCH_KEY_LEN,
     WAL_HEADER_FORMAT,
     WAL_HEADER_SIZE,
     WHENCE_BEGINING,
@@ -7,6 +12,7 @@ from hellodb.consts import (
 from hellodb.io.disk_file import DiskFile
 from hellodb.io.encoders import WalFileEncoder
 from hellodb.utils import FileIOException
+from hellodb.write_batch import WriteBatch
 
 
 class WalFile(DiskFile):
@@ -24,7 +30,7 @@ class WalFile(DiskFile):
                 "File {} is not opened in write mode".format(self.name)
             )
         entry_offset = self._offset
-        entry = self._encoder.encode(key, value)
+        entry = self._encode_record((key, value))
         data_len = self._wfh.write(entry)
         self._wfh.flush()
         if self._os_sync:
@@ -32,15 +38,57 @@ class WalFile(DiskFile):
         self._offset += data_len
         return entry_offset
 
+    def _encode_record(self, record):
+        if isinstance(record, WriteBatch):
+            return self._encoder.encode_batch(record.ops)
+        key, value = record
+        # a delete is a typed operation. So is a put of the value deletes
+        # used to be logged as, a plain record holding it is an old delete.
+        if value is TOMBSTONE_ENTRY:
+            return self._encoder.encode_batch([(DEL_OPERATION, key, b"")])
+        if value == LEGACY_TOMBSTONE_VALUE:
+            return self._encoder.encode_batch([(PUT_OPERATION, key, value)])
+        return self._encoder.encode(key, value)
+
+    def append_many(self, records, sync=True):
+        if self._wfh is None:
+            raise FileIOException(
+                "File {} is not opened in write mode".format(self.name)
+            )
+        entry_offset = self._offset
+        entries = b"".join(self._encode_record(record) for record in records)
+        data_len = self._wfh.write(entries)
+        self._wfh.flush()
+        if sync and self._os_sync:
+            self.sync()
+        self._offset += data_len
+        return entry_offset
+
     def read_all_entries(self):
         fh = self._wfh if self._wfh is not None else self._rfh
         header = fh.read(self._encoder.header_size)
         while header:
+            if len(header) < self._encoder.header_size:
+                # torn write at the tail of the log, the record was never
+                # acknowledged so stop here
+                return
             existing_crc, key_size, value_size = self._encoder.decode(header)
-            key = self._rfh.read(key_size)
-            value = self._rfh.read(value_size)
+            is_batch = key_size == WAL_BATCH_KEY_LEN
+            if is_batch:
+                key_size = 0
+            key = fh.read(key_size)
+            value = fh.read(value_size)
+            if len(key) < key_size or len(value) < value_size:
+                return
             crc = self._encoder.calculate_checksum(header, key, value)
             if crc != existing_crc:
                 raise FileIOException("Mismatching CRC")
-            yield key.decode("utf-8"), value.decode("utf-8")
-            header = self._rfh.read(self._encoder.header_size)
+            if is_batch:
+                # the whole batch was verified by a single CRC above
+                for _, batch_key, batch_value in self._encoder.decode_batch(value):
+                    yield batch_key, batch_value
+            elif value == LEGACY_TOMBSTONE_VALUE:
+                yield key, TOMBSTONE_ENTRY
+            else:
+                yield key, value
+            header = fh.read(self._encoder.header_size)
@@ -1,14 +1,19 @@
+import weakref
+
+from hellodb.consts import BLOCK_NO_COMPRESSION, SST_WRITE_BUFFER_SIZE
+from hellodb.io.block_sst_file import BlockSSTFile
 from hellodb.io.index_file import IndexFile
 from hellodb.io.sst_file import SSTFile
+from hellodb.io.value_log_file import ValueLogFile
 from hellodb.io.wal_file import WalFile
 
 
 class WalWriter(object):
-    def __init__(self, file_name):
+    def __init__(self, file_name, os_sync=True):
         self._file = WalFile(
             file_name,
             False,
-            True,
+            os_sync,
         )
 
     @property
@@ -30,13 +35,19 @@ class WalWriter(object):
         offset = self._file.append(key, value)
         return offset
 
+    def append_many(self, records, sync=True):
+        return self._file.append_many(records, sync)
+
+    def sync(self):
+        self._file.sync()
+
 
 class IndexWriter(object):
-    def __init__(self, file_name):
+    def __init__(self, file_name, os_sync=True):
         self._file = IndexFile(
             file_name,
             False,
-            True,
+            os_sync,
         )
 
     @property
@@ -58,13 +69,16 @@ class IndexWriter(object):
         offset = self._file.append(key, value)
         return offset
 
+    def sync(self):
+        self._file.sync()
+
 
 class SSTWriter(object):
-    def __init__(self, file_name):
+    def __init__(self, file_name, os_sync=True):
         self._file = SSTFile(
             file_name,
             False,
-            True,
+            os_sync,
         )
 
     @property
@@ -85,3 +99,82 @@ class SSTWriter(object):
     def append(self, value):
         offset = self._file.append(value)
         return offset
+
+    def sync(self):
+        self._file.sync()
+
+
+class ValueLogWriter(object):
+    """The value log file being appended to, readable while it is written."""
+
+    def __init__(self, file_name):
+        self._file = ValueLogFile(
+            file_name,
+            False,
+        )
+
+    @property
+    def name(self):
+        return self._file.name
+
+    @property
+    def basename(self):
+        return self._file.basename
+
+    @property
+    def size(self):
+        return self._file.size
+
+    def close(self):
+        self._file.close()
+
+    def append_many(self, entries):
+        return self._file.append_many(entries)
+
+    def read_entry(self, offset, size):
+        return self._file.read_entry(offset, size)
+
+    def read_entries(self):
+        return self._file.read_entries()
+
+    def release(self):
+        """Close the file once the last read using it is done."""
+        weakref.finalize(self, self._file.close)
+
+    def sync(self):
+        self._file.sync()
+
+
+class BlockSSTWriter(object):
+    def __init__(self, file_name):
+        self._file = BlockSSTFile(
+            file_name,
+            False,
+            True,
+            buffer_size=SST_WRITE_BUFFER_SIZE,
+        )
+
+    @property
+    def name(self):
+        return self._file.name
+
+    @property
+    def basename(self):
+        return self._file.basename
+
+    @property
+    def size(self):
+        return self._file.size
+
+    @property
+    def encoder(self):
+        return self._file.encoder
+
+    def close(self):
+        self._file.close()
+
+    def append_block(self, block, compression=BLOCK_NO_COMPRESSION):
+        return self._file.append_block(block, compression)
+
+    def write_footer(self, index_handle, properties_handle):
+        self._file.write_footer(index_handle, properties_handle)
@@ -0,0 +1,110 @@
+import heapq
+
+from hellodb.consts import TOMBSTONE_ENTRY
+
+
+def _tag(source, rank):
+    for key, value in source:
+        yield key, rank, value
+
+
+def merge_sources(sources, reverse=False):
+    """
+    K-way merge of sorted (key, value) iterators given newest first. Only
+    the newest version of each key is kept and deleted keys are skipped.
+    """
+    if reverse:
+        # heapq picks the largest tuple first, negate the rank so the
+        # newest source still wins for equal keys
+        merged = heapq.merge(
+            *[_tag(source, -rank) for rank, source in enumerate(sources)],
+            reverse=True
+        )
+    else:
+        merged = heapq.merge(
+            *[_tag(source, rank) for rank, source in enumerate(sources)]
+        )
+    last_key = None
+    for key, _, value in merged:
+        if key == last_key:
+            continue
+        last_key = key
+        if value is TOMBSTONE_ENTRY:
+            continue
+        yield key, value
+
+
+class DBIterator(object):
+    """
+    Streaming iterator over start <= key < end, in key order or in reverse.
+    open_sources(start, end, reverse) returns the sorted sources, newest
+    first. seek() repositions the iterator, forward iterators continue at
+    the first key >= target and reverse ones at the last key <= target.
+    The limit counts the entries returned since the last seek. Keys and
+    values are bytes, with an encoding seek() targets are encoded and the
+    entries returned are decoded. resolve(key, value), when given, maps
+    the merged values to the ones returned.
+    """
+
+    def __init__(
+        self,
+        open_sources,
+        start=None,
+        end=None,
+        limit=None,
+        reverse=False,
+        encoding=None,
+        resolve=None,
+    ):
+        self._open_sources = open_sources
+        self._resolve = resolve
+        self._encoding = encoding
+        self._start = start
+        self._end = end
+        self._limit = limit
+        self._reverse = reverse
+        self._merged = None
+        self._returned = 0
+        self._position(start, end)
+
+    def _position(self, start, end):
+        if self._merged is not None:
+            self._merged.close()
+        self._returned = 0
+        if start is not None and end is not None and start >= end:
+            self._merged = merge_sources([], self._reverse)
+            return
+        self._merged = merge_sources(
+            self._open_sources(start, end, self._reverse), self._reverse
+        )
+
+    def seek(self, key):
+        if self._encoding is not None:
+            key = key.encode(self._encoding)
+        if not self._reverse:
+            start = key if self._start is None else max(key, self._start)
+            self._position(start, self._end)
+        else:
+            # the smallest string greater than key, so key itself is included
+            end = key + b"\0"
+            end = end if self._end is None else min(end, self._end)
+            self._position(self._start, end)
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._limit is not None and self._returned >= self._limit:
+            raise StopIteration
+        key, value = next(self._merged)
+        self._returned += 1
+        if self._resolve is not None:
+            value = self._resolve(key, value)
+        if self._encoding is not None:
+            return key.decode(self._encoding), value.decode(self._encoding)
+        return key, value
+
+    def close(self):
+        if self._merged is not None:
+            self._merged.close()
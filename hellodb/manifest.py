@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+from threading import Lock
+
+from hellodb.consts import (
+    CURRENT_FILE_NAME,
+    CURRENT_TMP_FILE_NAME,
+    FILE_START_INDEX,
+    MANIFEST_EDIT_KEY,
+    MANIFEST_FILE_NAME_FORMAT,
+)
+from hellodb.io import reader, writer
+from hellodb.logger import CustomAdapter
+from hellodb import utils
+
+
+class TableMeta(object):
+    """What the manifest records about a live table."""
+
+    __slots__ = (
+        "file_id",
+        "size",
+        "num_entries",
+        "smallest_key",
+        "largest_key",
+        "source_ids",
+        "legacy",
+    )
+
+    def __init__(
+        self,
+        file_id,
+        size,
+        num_entries,
+        smallest_key,
+        largest_key,
+        source_ids,
+        legacy=False,
+    ):
+        self.file_id = file_id
+        self.size = size
+        self.num_entries = num_entries
+        self.smallest_key = smallest_key
+        self.largest_key = largest_key
+        self.source_ids = tuple(source_ids)
+        self.legacy = legacy
+
+    @classmethod
+    def from_reader(cls, sst_reader):
+        return cls(
+            sst_reader.file_id,
+            sst_reader.size,
+            sst_reader.num_entries,
+            sst_reader.smallest_key,
+            sst_reader.largest_key,
+            sst_reader.source_ids,
+            sst_reader.legacy,
+        )
+
+    def to_dict(self):
+        # keys are bytes, they are stored as hex to fit in JSON
+        return {
+            "file_id": self.file_id,
+            "size": self.size,
+            "num_entries": self.num_entries,
+            "smallest_key": self.smallest_key.hex(),
+            "largest_key": self.largest_key.hex(),
+            "source_ids": list(self.source_ids),
+            "legacy": self.legacy,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["file_id"],
+            data["size"],
+            data["num_entries"],
+            bytes.fromhex(data["smallest_key"]),
+            bytes.fromhex(data["largest_key"]),
+            data["source_ids"],
+            data["legacy"],
+        )
+
+
+class VersionEdit(object):
+    """
+    One change to the set of live tables: the tables a flush or a
+    compaction added, the tables a compaction deleted and the next free
+    file id.
+    """
+
+    def __init__(self, next_file_id=None):
+        self.added = []
+        self.deleted = []
+        self.next_file_id = next_file_id
+
+    def add_table(self, meta):
+        self.added.append(meta)
+
+    def delete_table(self, file_id):
+        self.deleted.append(file_id)
+
+    def encode(self):
+        return str.encode(
+            json.dumps(
+                {
+                    "added": [meta.to_dict() for meta in self.added],
+                    "deleted": self.deleted,
+                    "next_file_id": self.next_file_id,
+                }
+            )
+        )
+
+    @classmethod
+    def decode(cls, data):
+        fields = json.loads(bytes(data).decode("utf-8"))
+        edit = cls(fields["next_file_id"])
+        edit.added = [TableMeta.from_dict(meta) for meta in fields["added"]]
+        edit.deleted = fields["deleted"]
+        return edit
+
+
+class Manifest(object):
+    """
+    Log of version edits, one CRC checked record per edit in the WAL
+    format. CURRENT names the manifest in use and replaying it gives the
+    live tables and the next file id. Every open starts a new manifest
+    holding the live set as a single edit and points CURRENT at it with a
+    rename, so the log only grows by the edits of one run.
+    """
+
+    def __init__(self, file_path):
+        self.logger = CustomAdapter(
+            logging.getLogger(__name__),
+            {"logger": "{}".format("MANIFEST")},
+        )
+        self._file_path = file_path
+        self._lock = Lock()
+        self._manifest_writer = None
+        self._manifest_id = None
+        self._closed = False
+        self.tables = {}
+        self.next_file_id = FILE_START_INDEX
+
+    def recover(self):
+        """
+        Replay the manifest CURRENT points to. Returns False when there is
+        none, for a new database or one written before manifests.
+        """
+        current_path = os.path.join(self._file_path, CURRENT_FILE_NAME)
+        if not os.path.exists(current_path):
+            return False
+        with open(current_path) as current_file:
+            manifest_name = current_file.read().strip()
+        self._manifest_id = utils.get_manifest_id_from_name(manifest_name)
+        self.logger.debug("Recovering from {}".format(manifest_name))
+        manifest_reader = reader.WalReader(os.path.join(self._file_path, manifest_name))
+        try:
+            for key, value in manifest_reader.read_all():
+                if key == MANIFEST_EDIT_KEY:
+                    self._apply(VersionEdit.decode(value))
+        finally:
+            manifest_reader.close()
+        return True
+
+    def _apply(self, edit):
+        for file_id in edit.deleted:
+            self.tables.pop(file_id, None)
+        for meta in edit.added:
+            self.tables[meta.file_id] = meta
+            self.next_file_id = max(self.next_file_id, meta.file_id + 1)
+        if edit.next_file_id is not None:
+            self.next_file_id = max(self.next_file_id, edit.next_file_id)
+
+    def live_tables(self):
+        # a compacted table takes the age of its newest input
+        return sorted(
+            self.tables.values(), key=lambda meta: (meta.source_ids[1], meta.file_id)
+        )
+
+    def write_snapshot(self, tables, next_file_id):
+        """Start a new manifest holding tables and switch CURRENT to it."""
+        with self._lock:
+            manifest_id = 0 if self._manifest_id is None else self._manifest_id + 1
+            manifest_name = MANIFEST_FILE_NAME_FORMAT.format(manifest_id)
+            manifest_path = os.path.join(self._file_path, manifest_name)
+            # left over by a crash before CURRENT was switched to it
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+            edit = VersionEdit(next_file_id)
+            for meta in tables:
+                edit.add_table(meta)
+            manifest_writer = writer.WalWriter(manifest_path)
+            manifest_writer.append(MANIFEST_EDIT_KEY, edit.encode())
+            self._set_current(manifest_name)
+            if self._manifest_writer is not None:
+                self._manifest_writer.close()
+            self._manifest_writer = manifest_writer
+            self._manifest_id = manifest_id
+            self.tables = {}
+            self._apply(edit)
+        for old_manifest in utils.get_manifest_files(self._file_path):
+            if old_manifest != manifest_path:
+                self.logger.debug("Deleting old manifest {}".format(old_manifest))
+                os.remove(old_manifest)
+
+    def _set_current(self, manifest_name):
+        # CURRENT is replaced by a rename, a crash leaves it naming either
+        # the old or the new manifest
+        tmp_path = os.path.join(self._file_path, CURRENT_TMP_FILE_NAME)
+        with open(tmp_path, "w") as current_file:
+            current_file.write(manifest_name + "\n")
+            current_file.flush()
+            os.fsync(current_file.fileno())
+        os.replace(tmp_path, os.path.join(self._file_path, CURRENT_FILE_NAME))
+        utils.fsync_directory(self._file_path)
+
+    def log_and_apply(self, edit):
+        """Append edit to the manifest, synced, then apply it to the live set."""
+        with self._lock:
+            if self._closed or self._manifest_writer is None:
+                raise utils.FileIOException("Manifest is not open for writing")
+            self._manifest_writer.append(MANIFEST_EDIT_KEY, edit.encode())
+            self._apply(edit)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._manifest_writer is not None:
+                self._manifest_writer.close()
+                self._manifest_writer = None
@@ -2,6 +2,22 @@ from abc import ABC, abstractmethod
 
 
 class MemStore(ABC):
+    # approximate memory taken by one entry besides its key and value
+    # bytes: the tree node or dict slot and the key and value objects
+    entry_overhead = 0
+
+    def __init__(self):
+        self._size_in_bytes = 0
+
+    def _account_put(self, key, value, old_value):
+        if old_value is None:
+            self._size_in_bytes += len(key) + len(value) + self.entry_overhead
+        else:
+            self._size_in_bytes += len(value) - len(old_value)
+
+    def _account_delete(self, key, old_value):
+        self._size_in_bytes -= len(key) + len(old_value) + self.entry_overhead
+
     @abstractmethod
     def put(self, key, value):
         pass
@@ -22,10 +38,18 @@ class MemStore(ABC):
     def size(self):
         pass
 
-    @abstractmethod
     def size_in_bytes(self):
-        pass
+        """
+        Memory used by the entries, updated on every put and delete. Keys
+        and values count for their len(), plus entry_overhead per entry.
+        """
+        return self._size_in_bytes
 
     @abstractmethod
     def get_all_pairs(self):
         pass
+
+    @abstractmethod
+    def get_range(self, start=None, end=None, reverse=False):
+        """Yield (key, value) pairs with start <= key < end in key order."""
+        pass
@@ -0,0 +1,51 @@
+from hellodb.consts import MEMSTORE_TREE_ENTRY_OVERHEAD
+from hellodb.search_ds.avl import AVLTree
+from hellodb.search_ds.tree_range import range_nodes
+from hellodb.memstore import MemStore
+
+
+class AVLMemStore(MemStore):
+    entry_overhead = MEMSTORE_TREE_ENTRY_OVERHEAD
+
+    def __init__(self):
+        super().__init__()
+        self._store = AVLTree()
+
+    def put(self, key, value):
+        self._account_put(key, value, self._store.insert(key, value))
+
+    def get(self, key):
+        node = self._store.find(key)
+        if node is not None:
+            return node.value
+        else:
+            return None
+
+    def delete(self, key):
+        node = self._store.find(key)
+        if node is None:
+            return False
+        self._account_delete(key, node.value)
+        return self._store.delete(key)
+
+    def contains(self, key):
+        return self._store.find(key) is not None
+
+    def size(self):
+        return self._store.size
+
+    def get_all_pairs(self):
+        for node in self._store.inorder():
+            yield node.key, node.value
+
+    def get_range(self, start=None, end=None, reverse=False):
+        for node in range_nodes(self._store.root, start, end, reverse):
+            yield node.key, node.value
+
+
+if __name__ == "__main__":
+    mem_store = AVLMemStore()
+    for i in range(10):
+        mem_store.put("user{:04d}".format(i), str(i))
+    print(mem_store.size())
+    print(list(mem_store.get_all_pairs()))
@@ -1,16 +1,18 @@
-import sys
-
+from hellodb.consts import MEMSTORE_TREE_ENTRY_OVERHEAD
 from hellodb.search_ds.bst import BSTree
+from hellodb.search_ds.tree_range import range_nodes
 from hellodb.memstore import MemStore
 
 
 class BSTMemStore(MemStore):
+    entry_overhead = MEMSTORE_TREE_ENTRY_OVERHEAD
+
     def __init__(self):
         super().__init__()
         self._store = BSTree()
 
     def put(self, key, value):
-        self._store.insert(key, value)
+        self._account_put(key, value, self._store.insert(key, value))
 
     def get(self, key):
         node = self._store.find(key)
@@ -20,6 +22,10 @@ class BSTMemStore(MemStore):
             return None
 
     def delete(self, key):
+        node = self._store.find(key)
+        if node is None:
+            return False
+        self._account_delete(key, node.value)
         return self._store.delete(key)
 
     def contains(self, key):
@@ -28,13 +34,14 @@ class BSTMemStore(MemStore):
     def size(self):
         return self._store.size
 
-    def size_in_bytes(self):
-        return sys.getsizeof(self._store)
-
     def get_all_pairs(self):
         for node in self._store.inorder(self._store.root):
             yield node.key, node.value
 
+    def get_range(self, start=None, end=None, reverse=False):
+        for node in range_nodes(self._store.root, start, end, reverse):
+            yield node.key, node.value
+
 
 if __name__ == "__main__":
     mem_store = BSTMemStore()
@@ -1,17 +1,41 @@
+from hellodb.consts import MEMSTORE_AVL, MEMSTORE_BST, MEMSTORE_SIMPLE
+from hellodb.memstore.avl import AVLMemStore
 from hellodb.memstore.bst import BSTMemStore
+from hellodb.memstore.simple import SimpleMemStore
+
+MEMSTORE_TYPES = {
+    MEMSTORE_AVL: AVLMemStore,
+    MEMSTORE_BST: BSTMemStore,
+    MEMSTORE_SIMPLE: SimpleMemStore,
+}
 
 
 class RWMemstore(object):
-    def __init__(self):
-        self.ro_memstore = BSTMemStore()
-        self.wo_memstore = BSTMemStore()
+    """
+    One writable memstore and the immutable memstores waiting to be
+    flushed, newest first. The list is replaced, never changed in place, so
+    a reference to it stays a consistent snapshot.
+    """
+
+    def __init__(self, memstore_type=MEMSTORE_AVL):
+        if memstore_type not in MEMSTORE_TYPES:
+            raise ValueError("Unknown memstore type {}".format(memstore_type))
+        self._memstore_cls = MEMSTORE_TYPES[memstore_type]
+        self.ro_memstores = ()
+        self.wo_memstore = self._memstore_cls()
 
     def contains(self, key):
-        return self.wo_memstore.contains(key) or self.ro_memstore.contains(key)
+        return self.get(key) is not None
 
     def get(self, key):
         value = self.wo_memstore.get(key)
-        return value if value else self.ro_memstore.get(key)
+        if value is not None:
+            return value
+        for memstore in self.ro_memstores:
+            value = memstore.get(key)
+            if value is not None:
+                return value
+        return None
 
     def put(self, key, value):
         return self.wo_memstore.put(key, value)
@@ -23,6 +47,14 @@ class RWMemstore(object):
     def size(self):
         return self.wo_memstore.size()
 
+    def num_immutable(self):
+        return len(self.ro_memstores)
+
     def switch_stores(self):
-        self.ro_memstore = self.wo_memstore
-        self.wo_memstore = BSTMemStore()
+        self.ro_memstores = (self.wo_memstore,) + self.ro_memstores
+        self.wo_memstore = self._memstore_cls()
+
+    def remove_immutable(self, memstore):
+        self.ro_memstores = tuple(
+            store for store in self.ro_memstores if store is not memstore
+        )
@@ -1,22 +1,30 @@
-import sys
+from bisect import bisect_left
 
 
+from hellodb.consts import MEMSTORE_DICT_ENTRY_OVERHEAD
 from hellodb.memstore import MemStore
 
 
 class SimpleMemStore(MemStore):
+    entry_overhead = MEMSTORE_DICT_ENTRY_OVERHEAD
+
     def __init__(self):
         super().__init__()
         self._store = {}
 
     def put(self, key, value):
+        self._account_put(key, value, self._store.get(key))
         self._store[key] = value
 
     def get(self, key):
         return self._store.get(key)
 
     def delete(self, key):
-        return False if self._store.pop(key, None) is None else True
+        value = self._store.pop(key, None)
+        if value is None:
+            return False
+        self._account_delete(key, value)
+        return True
 
     def contains(self, key):
         return key in self._store
@@ -24,14 +32,21 @@ class SimpleMemStore(MemStore):
     def size(self):
         return len(self._store.keys())
 
-    def size_in_bytes(self):
-        return sys.getsizeof(self._store)
-
     def get_all_pairs(self):
         sorted_memstore = sorted(self._store.items(), key=lambda x: x[0])
         for key, value in sorted_memstore:
             yield key, value
 
+    def get_range(self, start=None, end=None, reverse=False):
+        keys = sorted(self._store.keys())
+        low = 0 if start is None else bisect_left(keys, start)
+        high = len(keys) if end is None else bisect_left(keys, end)
+        keys = keys[low:high]
+        if reverse:
+            keys.reverse()
+        for key in keys:
+            yield key, self._store[key]
+
 
 if __name__ == "__main__":
     mem_store = SimpleMemStore()
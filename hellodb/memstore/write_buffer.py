@@ -0,0 +1,74 @@
+from threading import Condition, Lock
+
+from hellodb.consts import FLUSH_WAIT_INTERVAL
+
+
+class WriteBufferManager(object):
+    """
+    Caps the memstore memory of every HelloDB sharing this manager. Each
+    database reserves the bytes its memstores grow by and frees them once
+    they are flushed. Past buffer_size, the database being written to
+    flushes its write memstore and writers stall until flushes running in
+    any of the databases bring the usage back under the limit.
+    """
+
+    def __init__(self, buffer_size):
+        self._buffer_size = buffer_size
+        self._cond = Condition(Lock())
+        self._usage = 0
+        self._immutable_usage = 0
+        self.stalls = 0
+
+    @property
+    def buffer_size(self):
+        return self._buffer_size
+
+    @property
+    def usage(self):
+        return self._usage
+
+    def reserve(self, size):
+        with self._cond:
+            self._usage += size
+
+    def mark_immutable(self, size):
+        # the bytes of a rotated memstore, they are given back by free()
+        # once its table is installed
+        with self._cond:
+            self._immutable_usage += size
+
+    def free(self, size, immutable=True):
+        with self._cond:
+            self._usage -= size
+            if immutable:
+                self._immutable_usage -= size
+            self._cond.notify_all()
+
+    def should_flush(self):
+        return self._usage >= self._buffer_size
+
+    def wait_for_room(self, interrupted=None):
+        # only flushes in progress free memory, do not stall when all of
+        # the usage sits in write memstores. Returns whether it stalled.
+        # The wait ends early once interrupted() returns something, the
+        # flushes it waits for may never finish.
+        with self._cond:
+            if self._usage < self._buffer_size or self._immutable_usage <= 0:
+                return False
+            self.stalls += 1
+            while self._usage >= self._buffer_size and self._immutable_usage > 0:
+                if interrupted is None:
+                    self._cond.wait()
+                elif interrupted() is not None:
+                    break
+                else:
+                    self._cond.wait(FLUSH_WAIT_INTERVAL)
+            return True
+
+    def to_dict(self):
+        return {
+            "buffer_size": self._buffer_size,
+            "usage": self._usage,
+            "immutable_usage": self._immutable_usage,
+            "stalls": self.stalls,
+        }
@@ -0,0 +1,105 @@
+"""
+The subset of the Redis serialization protocol (RESP 2) spoken by
+hellodb.server and hellodb.client. Commands are arrays of bulk strings,
+replies are simple strings, errors, integers, bulk strings, nil or arrays
+of those.
+"""
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class ResponseError(Exception):
+    """An error reply sent by the server."""
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, int):
+        return str(value).encode()
+    return value.encode("utf-8")
+
+
+def encode_command(*args):
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        arg = _to_bytes(arg)
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def encode_simple(message):
+    return b"+%s\r\n" % _to_bytes(message)
+
+
+def encode_error(message):
+    return b"-%s\r\n" % _to_bytes(message).replace(b"\r\n", b" ")
+
+
+def encode_integer(value):
+    return b":%d\r\n" % value
+
+
+def encode_bulk(value):
+    """value is bytes, None is sent as nil."""
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def encode_array(items):
+    """items are bytes or None, sent as bulk strings."""
+    return b"*%d\r\n" % len(items) + b"".join(encode_bulk(item) for item in items)
+
+
+async def read_command(reader):
+    """
+    Read one command from an asyncio StreamReader as a list of bytes.
+    Returns None once the client has closed the connection.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*") or not line.endswith(b"\r\n"):
+        raise ProtocolError("Expected an array of bulk strings")
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readline()
+        if not header.startswith(b"$"):
+            raise ProtocolError("Expected a bulk string")
+        data = await reader.readexactly(int(header[1:-2]) + 2)
+        args.append(data[:-2])
+    return args
+
+
+def read_response(fh):
+    """
+    Read one reply from a buffered binary file. Error replies are returned
+    as ResponseError instances for the caller to raise.
+    """
+    line = fh.readline()
+    if not line.endswith(b"\r\n"):
+        raise ProtocolError("Connection closed")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode("utf-8")
+    if kind == b"-":
+        return ResponseError(payload.decode("utf-8"))
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = fh.read(length + 2)
+        if len(data) < length + 2:
+            raise ProtocolError("Connection closed")
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [read_response(fh) for _ in range(length)]
+    raise ProtocolError("Unknown reply type {!r}".format(kind))
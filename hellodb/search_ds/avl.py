@@ -0,0 +1,178 @@
+class Node(object):
+    def __init__(self, key, value, left_child=None, right_child=None):
+        self.key = key
+        self.value = value
+        self.left_child = left_child
+        self.right_child = right_child
+        self.height = 1
+
+    def __repr__(self):
+        return "Node({})".format(self.key)
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def _height(node):
+    return node.height if node is not None else 0
+
+
+class AVLTree(object):
+    """
+    Self balancing binary search tree. Height is kept within ~1.44 log(n),
+    so find, insert and delete are O(log n) in the worst case, including
+    for monotonically increasing keys.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def _update_height(self, node):
+        node.height = 1 + max(_height(node.left_child), _height(node.right_child))
+
+    def _rotate_right(self, node):
+        pivot = node.left_child
+        node.left_child = pivot.right_child
+        pivot.right_child = node
+        self._update_height(node)
+        self._update_height(pivot)
+        return pivot
+
+    def _rotate_left(self, node):
+        pivot = node.right_child
+        node.right_child = pivot.left_child
+        pivot.left_child = node
+        self._update_height(node)
+        self._update_height(pivot)
+        return pivot
+
+    def _rebalance(self, node):
+        left_height = _height(node.left_child)
+        right_height = _height(node.right_child)
+        node.height = 1 + (left_height if left_height > right_height else right_height)
+        balance = left_height - right_height
+        if balance > 1:
+            if _height(node.left_child.left_child) < _height(
+                node.left_child.right_child
+            ):
+                node.left_child = self._rotate_left(node.left_child)
+            return self._rotate_right(node)
+        if balance < -1:
+            if _height(node.right_child.right_child) < _height(
+                node.right_child.left_child
+            ):
+                node.right_child = self._rotate_right(node.right_child)
+            return self._rotate_left(node)
+        return node
+
+    def _rebalance_path(self, path, stop_early=True):
+        # walk back up the insert/delete path fixing heights and re-linking
+        # rotated subtrees into their parents. Deletes can require a rotation
+        # at every level, inserts can stop once a subtree height is unchanged
+        for index in range(len(path) - 1, -1, -1):
+            node = path[index]
+            old_height = node.height
+            new_node = self._rebalance(node)
+            if index == 0:
+                self.root = new_node
+            elif path[index - 1].left_child is node:
+                path[index - 1].left_child = new_node
+            else:
+                path[index - 1].right_child = new_node
+            if stop_early and new_node is node and node.height == old_height:
+                break
+
+    def find(self, key):
+        current = self.root
+        while current is not None:
+            if key == current.key:
+                return current
+            current = current.left_child if key < current.key else current.right_child
+        return None
+
+    def insert(self, key, value):
+        """Insert or overwrite key, return the value it replaced or None."""
+        if self.root is None:
+            self.root = Node(key, value)
+            self.size += 1
+            return None
+        path = []
+        current = self.root
+        while True:
+            path.append(current)
+            if key == current.key:
+                old_value, current.value = current.value, value
+                return old_value
+            elif key < current.key:
+                if current.left_child is None:
+                    current.left_child = Node(key, value)
+                    break
+                current = current.left_child
+            else:
+                if current.right_child is None:
+                    current.right_child = Node(key, value)
+                    break
+                current = current.right_child
+        self.size += 1
+        self._rebalance_path(path)
+        return None
+
+    def delete(self, key):
+        path = []
+        current = self.root
+        while current is not None and current.key != key:
+            path.append(current)
+            current = current.left_child if key < current.key else current.right_child
+        if current is None:
+            return False
+        if current.left_child is not None and current.right_child is not None:
+            # copy the in-order successor into this node and delete the
+            # successor instead, it has at most one child
+            path.append(current)
+            successor = current.right_child
+            while successor.left_child is not None:
+                path.append(successor)
+                successor = successor.left_child
+            current.key, current.value = successor.key, successor.value
+            current = successor
+        child = current.left_child
+        if child is None:
+            child = current.right_child
+        if not path:
+            self.root = child
+        elif path[-1].left_child is current:
+            path[-1].left_child = child
+        else:
+            path[-1].right_child = child
+        self.size -= 1
+        self._rebalance_path(path, stop_early=False)
+        return True
+
+    def inorder(self, node=None):
+        """Non recursive in-order traversal starting at node or the root."""
+        stack = []
+        current = self.root if node is None else node
+        while stack or current is not None:
+            while current is not None:
+                stack.append(current)
+                current = current.left_child
+            current = stack.pop()
+            yield current
+            current = current.right_child
+
+    def max(self):
+        current = self.root
+        previous = None
+        while current is not None:
+            previous = current
+            current = current.right_child
+        return previous
+
+    def min(self):
+        current = self.root
+        previous = None
+        while current is not None:
+            previous = current
+            current = current.left_child
+        return previous
@@ -0,0 +1,58 @@
+import zlib
+
+
+class BloomFilter(object):
+    """
+    Bloom filter over bytes keys using double hashing derived from a single
+    crc32, as done by LevelDB. The serialized form is the bit array followed
+    by one byte holding the number of probes.
+    """
+
+    def __init__(self, bits, num_probes):
+        self._bits = bits
+        self._num_bits = len(bits) * 8
+        self._num_probes = num_probes
+
+    @classmethod
+    def create(cls, num_keys, bits_per_key):
+        num_bits = max(64, num_keys * bits_per_key)
+        # ln(2) * bits_per_key probes minimise the false positive rate
+        num_probes = min(30, max(1, int(bits_per_key * 0.69)))
+        return cls(bytearray((num_bits + 7) // 8), num_probes)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(bytes(data[:-1]), data[-1])
+
+    def to_bytes(self):
+        return bytes(self._bits) + bytes([self._num_probes])
+
+    def _probes(self, key):
+        hash_value = zlib.crc32(key)
+        delta = ((hash_value >> 17) | (hash_value << 15)) & 0xFFFFFFFF
+        for _ in range(self._num_probes):
+            yield hash_value % self._num_bits
+            hash_value = (hash_value + delta) & 0xFFFFFFFF
+
+    def add(self, key):
+        for bit in self._probes(key):
+            self._bits[bit >> 3] |= 1 << (bit & 7)
+
+    def add_all(self, keys):
+        # add() with the probe loop inlined, used when building a table
+        bits, num_bits = self._bits, self._num_bits
+        for key in keys:
+            hash_value = zlib.crc32(key)
+            delta = ((hash_value >> 17) | (hash_value << 15)) & 0xFFFFFFFF
+            for _ in range(self._num_probes):
+                bit = hash_value % num_bits
+                bits[bit >> 3] |= 1 << (bit & 7)
+                hash_value = (hash_value + delta) & 0xFFFFFFFF
+
+    def may_contain(self, key):
+        if self._num_bits == 0:
+            return True
+        for bit in self._probes(key):
+            if not self._bits[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
@@ -39,6 +39,7 @@ class BSTree(object):
         return self._find(key)[0]
 
     def insert(self, key, value):
+        """Insert or overwrite key, return the value it replaced or None."""
         if self.root is None:
             self.root = Node(key, value)
             self.size += 1
@@ -48,8 +49,8 @@ class BSTree(object):
             while True:
                 parent = current
                 if key == current.key:
-                    current.value = value
-                    break
+                    old_value, current.value = current.value, value
+                    return old_value
                 elif key < current.key:
                     current = current.left_child
                     if current is None:
@@ -62,6 +63,7 @@ class BSTree(object):
                         parent.right_child = Node(key, value)
                         self.size += 1
                         break
+        return None
 
     def inorder(self, node):
         if node is not None:
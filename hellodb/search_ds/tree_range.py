@@ -0,0 +1,40 @@
+def range_nodes(root, start=None, end=None, reverse=False):
+    """
+    Iterate the nodes of a binary search tree with start <= key < end in
+    key order, or in reverse key order. A bound of None is unbounded. Uses
+    an explicit stack so the depth of the tree does not matter.
+    """
+    stack = []
+    node = root
+    if not reverse:
+        while node is not None:
+            if start is None or node.key >= start:
+                stack.append(node)
+                node = node.left_child
+            else:
+                node = node.right_child
+        while stack:
+            node = stack.pop()
+            if end is not None and node.key >= end:
+                return
+            yield node
+            child = node.right_child
+            while child is not None:
+                stack.append(child)
+                child = child.left_child
+    else:
+        while node is not None:
+            if end is None or node.key < end:
+                stack.append(node)
+                node = node.right_child
+            else:
+                node = node.left_child
+        while stack:
+            node = stack.pop()
+            if start is not None and node.key < start:
+                return
+            yield node
+            child = node.left_child
+            while child is not None:
+                stack.append(child)
+                child = child.right_child
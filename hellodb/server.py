@@ -0,0 +1,229 @@
+"""
+Serves a HelloDB over TCP with a Redis compatible protocol, so processes
+other than the one owning the database can use it.
+
+    python -m hellodb.server /path/to/db --port 6380
+
+Commands, keys and values are binary safe:
+
+    PING
+    GET key                     bulk string, nil when missing
+    SET key value / PUT ...     +OK
+    DEL key [key ...]           number of the keys that existed
+    MGET key [key ...]          array of bulk strings or nil
+    SCAN start end [limit]      array of key, value, key, value, ...
+                                an empty start or end is unbounded
+
+Requests may be pipelined. Consecutive writes of a connection run
+together and are committed with the writes of every other connection in
+a single WAL record, a read waits for the writes sent before it.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+
+from hellodb.async_db import AsyncHelloDB
+from hellodb.consts import (
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
+    SERVER_DEFAULT_SCAN_LIMIT,
+    SERVER_MAX_IN_FLIGHT,
+    WAL_SYNC_PER_COMMIT,
+    WAL_SYNC_POLICIES,
+)
+from hellodb.logger import CustomAdapter
+from hellodb import resp
+
+WRITE_COMMANDS = frozenset((b"SET", b"PUT", b"DEL"))
+
+
+class HelloDBServer(object):
+    def __init__(self, async_db, host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT):
+        self.logger = CustomAdapter(
+            logging.getLogger(__name__),
+            {"logger": "{}".format("SERVER")},
+        )
+        self._db = async_db
+        self._host = host
+        self._port = port
+        self._server = None
+        # name: (handler, min args, max args or None)
+        self._commands = {
+            b"PING": (self._ping, 0, 0),
+            b"GET": (self._get, 1, 1),
+            b"SET": (self._put, 2, 2),
+            b"PUT": (self._put, 2, 2),
+            b"DEL": (self._delete, 1, None),
+            b"MGET": (self._mget, 1, None),
+            b"SCAN": (self._scan, 2, 3),
+        }
+
+    @property
+    def port(self):
+        if self._server is not None and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle_connection, self._host, self._port
+        )
+        self.logger.info("Listening on {}:{}".format(self._host, self.port))
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        # replies go out in request order, the queue bounds how many
+        # requests of a pipeline are in flight
+        replies = asyncio.Queue(SERVER_MAX_IN_FLIGHT)
+        reply_task = asyncio.ensure_future(self._write_replies(replies, writer))
+        in_flight, in_flight_run = set(), False
+        try:
+            while True:
+                try:
+                    command = await resp.read_command(reader)
+                except (resp.ProtocolError, ValueError) as ex:
+                    await replies.put(resp.encode_error("ERR {}".format(ex)))
+                    break
+                if command is None:
+                    break
+                if not command:
+                    continue
+                name = command[0].upper()
+                # a run of writes, or of reads, executes concurrently. The
+                # previous run completes first so reads see earlier writes
+                # and writes do not overtake earlier reads. DEL reads the
+                # keys it deletes, so it runs alone.
+                run = None if name == b"DEL" else name in WRITE_COMMANDS
+                if in_flight and (run is None or run != in_flight_run):
+                    await asyncio.wait(in_flight)
+                    in_flight = set()
+                in_flight_run = run
+                task = asyncio.ensure_future(self._execute(command))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                await replies.put(task)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await replies.put(None)
+            await reply_task
+            writer.close()
+
+    async def _write_replies(self, replies, writer):
+        while True:
+            reply = await replies.get()
+            if reply is None:
+                break
+            if not isinstance(reply, bytes):
+                reply = await reply
+            try:
+                writer.write(reply)
+                if replies.empty():
+                    await writer.drain()
+            except ConnectionError:
+                # keep draining so the reader is not blocked on the queue
+                continue
+
+    async def _execute(self, command):
+        name, args = command[0].upper(), command[1:]
+        if name not in self._commands:
+            return resp.encode_error(
+                "ERR unknown command '{}'".format(name.decode("utf-8", "replace"))
+            )
+        handler, min_args, max_args = self._commands[name]
+        if len(args) < min_args or (max_args is not None and len(args) > max_args):
+            return resp.encode_error(
+                "ERR wrong number of arguments for '{}'".format(name.decode())
+            )
+        try:
+            return await handler(*args)
+        except Exception as ex:
+            self.logger.exception("Exception happened executing {}".format(name))
+            return resp.encode_error("ERR {}".format(ex))
+
+    async def _ping(self):
+        return resp.encode_simple("PONG")
+
+    async def _get(self, key):
+        value = await self._db.get(key)
+        return resp.encode_bulk(value if value else None)
+
+    async def _put(self, key, value):
+        await self._db.put(key, value)
+        return resp.encode_simple("OK")
+
+    async def _delete(self, *keys):
+        # like GET, an empty value counts as missing
+        values = await self._db.multi_get(keys)
+        await asyncio.gather(*[self._db.delete(key) for key in keys])
+        existing = {key for key, value in zip(keys, values) if value}
+        return resp.encode_integer(len(existing))
+
+    async def _mget(self, *keys):
+        values = await self._db.multi_get(keys)
+        return resp.encode_array([value if value else None for value in values])
+
+    async def _scan(self, start, end, limit=None):
+        limit = SERVER_DEFAULT_SCAN_LIMIT if limit is None else int(limit)
+        items = []
+        async for key, value in self._db.scan(start or None, end or None, limit):
+            items.append(key)
+            items.append(value)
+        return resp.encode_array(items)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m hellodb.server", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("path", help="database directory")
+    parser.add_argument("--host", default=DEFAULT_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT)
+    parser.add_argument(
+        "--wal_sync_policy", choices=WAL_SYNC_POLICIES, default=WAL_SYNC_PER_COMMIT
+    )
+    parser.add_argument(
+        "--log_level", default="INFO", help="DEBUG logs every database operation"
+    )
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    os.makedirs(args.path, exist_ok=True)
+    async_db = await AsyncHelloDB.open(
+        args.path, None, wal_sync_policy=args.wal_sync_policy, binary=True
+    )
+    server = HelloDBServer(async_db, args.host, args.port)
+    # SIGTERM shuts down like Ctrl-C, the database is closed cleanly
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, asyncio.current_task().cancel
+    )
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        await async_db.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger().setLevel(args.log_level.upper())
+    try:
+        asyncio.run(serve(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
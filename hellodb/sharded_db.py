@@ -0,0 +1,513 @@
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import Future
+import heapq
+from itertools import chain, islice
+import json
+import logging
+import multiprocessing
+import os
+import signal
+from threading import Lock, Thread
+import zlib
+
+from hellodb.consts import (
+    DEFAULT_NUM_SHARDS,
+    DEL_OPERATION,
+    PUT_OPERATION,
+    SHARD_DIR_NAME_FORMAT,
+    SHARD_PARTITION_HASH,
+    SHARD_PARTITION_RANGE,
+    SHARD_SCAN_CHUNK_SIZE,
+    SHARDS_FILE_NAME,
+    SHARDS_TMP_FILE_NAME,
+)
+from hellodb.db import HelloDB
+from hellodb.logger import CustomAdapter
+from hellodb import utils
+from hellodb.wal.group_commit import GroupCommitQueue
+from hellodb.write_batch import WriteBatch
+
+# objects shared by the shards of one process, they cannot be handed to
+# shard processes
+SHARED_OPTIONS = ("block_cache", "write_buffer_manager", "statistics")
+
+
+def _key_bytes(key):
+    return key.encode("utf-8") if isinstance(key, str) else bytes(key)
+
+
+class ShardLayout(object):
+    """
+    How keys are spread over the shards, recorded next to them so a
+    database is always reopened with the layout it was written with.
+    """
+
+    def __init__(self, num_shards, boundaries=None):
+        self.boundaries = None
+        if boundaries is not None:
+            self.boundaries = [_key_bytes(key) for key in boundaries]
+            if self.boundaries != sorted(set(self.boundaries)):
+                raise ValueError("Shard boundaries must be sorted and distinct")
+            num_shards = len(self.boundaries) + 1
+        if num_shards < 1:
+            raise ValueError("A sharded database needs at least one shard")
+        self.num_shards = num_shards
+
+    @property
+    def partitioning(self):
+        if self.boundaries is None:
+            return SHARD_PARTITION_HASH
+        return SHARD_PARTITION_RANGE
+
+    def shard_of(self, key):
+        key = _key_bytes(key)
+        if self.boundaries is None:
+            # crc32 rather than hash(), which is salted per process
+            return zlib.crc32(key) % self.num_shards
+        return bisect_right(self.boundaries, key)
+
+    def to_dict(self):
+        layout = {"partitioning": self.partitioning, "num_shards": self.num_shards}
+        if self.boundaries is not None:
+            layout["boundaries"] = [key.hex() for key in self.boundaries]
+        return layout
+
+    @classmethod
+    def from_dict(cls, layout):
+        boundaries = layout.get("boundaries")
+        if boundaries is not None:
+            boundaries = [bytes.fromhex(key) for key in boundaries]
+        return cls(layout["num_shards"], boundaries)
+
+    def __eq__(self, other):
+        return self.to_dict() == other.to_dict()
+
+
+class ShardedHelloDB(object):
+    """
+    Keys partitioned over num_shards independent HelloDBs, each in its own
+    subdirectory with its own WAL, memstores and flush threads, so writes
+    to different shards do not contend on one lock or one WAL. Keys are
+    hashed to a shard, or with boundaries, sorted split keys, shard i
+    holds the keys in [boundaries[i - 1], boundaries[i]).
+
+    With processes=True every shard runs in a worker process and is driven
+    over a pipe, so shards also use separate cores for encoding, CRCs and
+    memstore inserts. Shared block caches, write buffer managers and
+    statistics are not available then. Worker processes are spawned, so
+    the main module of the program must be guarded by
+    if __name__ == "__main__".
+
+    write() is atomic within each shard only. multi_get() sends one request
+    per shard and scan() merges the shards in key order.
+    """
+
+    def __init__(
+        self,
+        file_path,
+        memstore_max_size,
+        num_shards=DEFAULT_NUM_SHARDS,
+        boundaries=None,
+        processes=False,
+        **kwargs
+    ):
+        self.logger = CustomAdapter(
+            logging.getLogger(__name__),
+            {"logger": "{}".format("ShardedHelloDB")},
+        )
+        if processes:
+            shared = [name for name in SHARED_OPTIONS if kwargs.get(name) is not None]
+            if shared:
+                raise ValueError(
+                    "{} cannot be shared with shard processes".format(
+                        ", ".join(shared)
+                    )
+                )
+        self._file_path = file_path
+        self._layout = self._load_layout(ShardLayout(num_shards, boundaries))
+        self._processes = processes
+        self._shards = []
+        try:
+            for shard_id in range(self._layout.num_shards):
+                shard_path = os.path.join(
+                    file_path, SHARD_DIR_NAME_FORMAT.format(shard_id)
+                )
+                os.makedirs(shard_path, exist_ok=True)
+                if processes:
+                    shard = ShardProcess(shard_path, memstore_max_size, kwargs)
+                else:
+                    shard = HelloDB(shard_path, memstore_max_size, **kwargs)
+                self._shards.append(shard)
+        except Exception:
+            for shard in self._shards:
+                shard.close()
+            raise
+        self.logger.info(
+            "Opened {} {} partitioned shards{}".format(
+                self._layout.num_shards,
+                self._layout.partitioning,
+                " in worker processes" if processes else "",
+            )
+        )
+
+    def _load_layout(self, layout):
+        layout_path = os.path.join(self._file_path, SHARDS_FILE_NAME)
+        if os.path.exists(layout_path):
+            with open(layout_path) as fh:
+                stored = ShardLayout.from_dict(json.load(fh))
+            if stored != layout:
+                raise ValueError(
+                    "Database was written with {}, not {}".format(
+                        stored.to_dict(), layout.to_dict()
+                    )
+                )
+            return stored
+        os.makedirs(self._file_path, exist_ok=True)
+        tmp_path = os.path.join(self._file_path, SHARDS_TMP_FILE_NAME)
+        with open(tmp_path, "w") as fh:
+            json.dump(layout.to_dict(), fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.rename(tmp_path, layout_path)
+        utils.fsync_directory(self._file_path)
+        return layout
+
+    @property
+    def num_shards(self):
+        return self._layout.num_shards
+
+    def shard_of(self, key):
+        return self._layout.shard_of(key)
+
+    def _call_many(self, calls):
+        """
+        Run (shard_id, method, args) calls, sorted by shard_id, and return
+        their results. Shard processes work on them concurrently.
+        """
+        if not self._processes:
+            return [
+                getattr(self._shards[shard_id], method)(*args)
+                for shard_id, method, args in calls
+            ]
+        replies = []
+        try:
+            for shard_id, method, args in calls:
+                replies.append(self._shards[shard_id].submit(method, *args))
+        finally:
+            results, error = [], None
+            for reply in replies:
+                try:
+                    results.append(reply.result())
+                except Exception as ex:
+                    error = error or ex
+            if error is not None:
+                raise error
+        return results
+
+    def get(self, key):
+        return self._shards[self.shard_of(key)].get(key)
+
+    def put(self, key, value):
+        self._shards[self.shard_of(key)].put(key, value)
+
+    def delete(self, key):
+        self._shards[self.shard_of(key)].delete(key)
+
+    def write(self, batch):
+        """Apply a WriteBatch, atomically within each shard it touches."""
+        batches = {}
+        for operation, key, value in batch.ops:
+            shard_batch = batches.setdefault(self.shard_of(key), WriteBatch())
+            if operation == PUT_OPERATION:
+                shard_batch.put(key, value)
+            else:
+                shard_batch.delete(key)
+        self._call_many(
+            [(shard_id, "write", (batches[shard_id],)) for shard_id in sorted(batches)]
+        )
+
+    def multi_get(self, keys):
+        keys = list(keys)
+        positions = {}
+        for position, key in enumerate(keys):
+            positions.setdefault(self.shard_of(key), []).append(position)
+        shard_ids = sorted(positions)
+        results = self._call_many(
+            [
+                (shard_id, "multi_get", ([keys[p] for p in positions[shard_id]],))
+                for shard_id in shard_ids
+            ]
+        )
+        values = [None] * len(keys)
+        for shard_id, shard_values in zip(shard_ids, results):
+            for position, value in zip(positions[shard_id], shard_values):
+                values[position] = value
+        return values
+
+    def scan(self, start=None, end=None, limit=None, reverse=False):
+        """
+        Iterate start <= key < end over all shards in key order. Range
+        partitioned shards are read one after the other, hash partitioned
+        ones are merged.
+        """
+        shard_ids = list(range(self.num_shards))
+        boundaries = self._layout.boundaries
+        if boundaries is not None:
+            # only the shards overlapping the range
+            first = 0 if start is None else bisect_right(boundaries, _key_bytes(start))
+            last = len(boundaries)
+            if end is not None:
+                last = bisect_left(boundaries, _key_bytes(end))
+            shard_ids = shard_ids[first : last + 1]
+            if reverse:
+                shard_ids.reverse()
+        iterators = [
+            self._shards[shard_id].scan(start, end, limit, reverse)
+            for shard_id in shard_ids
+        ]
+        if boundaries is not None:
+            merged = chain(*iterators)
+        else:
+            merged = heapq.merge(*iterators, reverse=reverse)
+        return ShardedIterator(iterators, merged, limit)
+
+    def get_stats(self):
+        return {
+            "layout": self._layout.to_dict(),
+            "shards": self._call_many(
+                [(shard_id, "get_stats", ()) for shard_id in range(self.num_shards)]
+            ),
+        }
+
+    def close(self):
+        for shard in self._shards:
+            shard.close()
+        self._shards = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ShardedIterator(object):
+    def __init__(self, iterators, merged, limit=None):
+        self._iterators = iterators
+        self._merged = merged if limit is None else islice(merged, limit)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._merged)
+
+    def close(self):
+        for iterator in self._iterators:
+            iterator.close()
+
+
+class ShardProcess(object):
+    """
+    A HelloDB running in a worker process, driven over a pipe. Requests
+    are pipelined: submit() sends one and returns a Future, any number of
+    them can be in flight and a reader thread hands the replies, which the
+    worker sends in request order, to their futures. Puts, deletes and
+    writes go through a GroupCommitQueue, those queued while a write is in
+    flight are sent together as one WriteBatch, one round trip and one
+    commit in the worker.
+    """
+
+    def __init__(self, file_path, memstore_max_size, kwargs):
+        # spawned, forking a process with running threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        # futures of the requests sent, in the order they were sent
+        self._replies = deque()
+        self._send_lock = Lock()
+        self._broken = None
+        self._write_queue = GroupCommitQueue(self._send_writes)
+        self._process = context.Process(
+            target=_run_shard,
+            args=(
+                child_conn,
+                file_path,
+                memstore_max_size,
+                kwargs,
+                logging.getLogger().level,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._reader = Thread(target=self._read_replies)
+        self._reader.daemon = True
+        self._reader.start()
+        # raises if the database failed to open
+        self.call("ping")
+
+    def submit(self, method, *args):
+        reply = Future()
+        with self._send_lock:
+            if self._broken is not None:
+                raise self._broken
+            self._replies.append(reply)
+            try:
+                self._conn.send((method, args))
+            except BaseException:
+                self._replies.pop()
+                raise
+        return reply
+
+    def _read_replies(self):
+        while True:
+            try:
+                ok, result = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            reply = self._replies.popleft()
+            if ok:
+                reply.set_result(result)
+            else:
+                reply.set_exception(result)
+        # the worker exited, nothing in flight will be answered
+        with self._send_lock:
+            self._broken = EOFError("Shard process exited")
+            while self._replies:
+                self._replies.popleft().set_exception(self._broken)
+
+    def call(self, method, *args):
+        return self.submit(method, *args).result()
+
+    def _send_writes(self, ops):
+        # called by the group commit leader with the ops of every writer
+        # in the group
+        batch = WriteBatch()
+        for operation, key, value in ops:
+            if operation == PUT_OPERATION:
+                batch.put(key, value)
+            else:
+                batch.delete(key)
+        self.call("write", batch)
+
+    def get(self, key):
+        return self.call("get", key)
+
+    def put(self, key, value):
+        self._write_queue.commit([(PUT_OPERATION, key, value)])
+
+    def delete(self, key):
+        self._write_queue.commit([(DEL_OPERATION, key, None)])
+
+    def write(self, batch):
+        if len(batch) > 0:
+            self._write_queue.commit(list(batch.ops))
+
+    def multi_get(self, keys):
+        return self.call("multi_get", keys)
+
+    def scan(self, start=None, end=None, limit=None, reverse=False):
+        return ShardProcessIterator(self, (start, end, limit, reverse))
+
+    def get_stats(self):
+        return self.call("get_stats")
+
+    def close(self):
+        if self._process.is_alive():
+            try:
+                self.call("close")
+            except (EOFError, OSError):
+                pass
+        self._process.join()
+        self._reader.join()
+        self._conn.close()
+
+
+class ShardProcessIterator(object):
+    """A scan in a shard process, fetched SHARD_SCAN_CHUNK_SIZE entries at a time."""
+
+    def __init__(self, shard, scan_args):
+        self._shard = shard
+        self._scan_id = shard.call("scan", *scan_args)
+        self._chunk = iter(())
+        self._exhausted = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        entry = next(self._chunk, None)
+        if entry is not None:
+            return entry
+        if self._exhausted:
+            raise StopIteration
+        chunk = self._shard.call("scan_next", self._scan_id, SHARD_SCAN_CHUNK_SIZE)
+        if len(chunk) < SHARD_SCAN_CHUNK_SIZE:
+            # the shard closed the scan already
+            self._exhausted = True
+        if not chunk:
+            raise StopIteration
+        self._chunk = iter(chunk)
+        return next(self._chunk)
+
+    def close(self):
+        if not self._exhausted:
+            self._exhausted = True
+            self._shard.call("scan_close", self._scan_id)
+
+
+def _run_shard(conn, file_path, memstore_max_size, kwargs, log_level):
+    # the parent decides when shards shut down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.getLogger().setLevel(log_level)
+    try:
+        db = HelloDB(file_path, memstore_max_size, **kwargs)
+    except Exception as ex:
+        _send_error(conn, ex)
+        return
+    scans, next_scan_id = {}, 0
+    closed = False
+    try:
+        while True:
+            method, args = conn.recv()
+            if method == "close":
+                closed = True
+                break
+            try:
+                if method == "ping":
+                    result = None
+                elif method == "scan":
+                    result, next_scan_id = next_scan_id, next_scan_id + 1
+                    scans[result] = db.scan(*args)
+                elif method == "scan_next":
+                    scan_id, count = args
+                    result = list(islice(scans[scan_id], count))
+                    if len(result) < count:
+                        scans.pop(scan_id).close()
+                elif method == "scan_close":
+                    scans.pop(args[0]).close()
+                    result = None
+                else:
+                    result = getattr(db, method)(*args)
+            except Exception as ex:
+                _send_error(conn, ex)
+                continue
+            conn.send((True, result))
+    except EOFError:
+        # the parent went away without closing the shard
+        pass
+    finally:
+        for scan in scans.values():
+            scan.close()
+        db.close()
+    if closed:
+        conn.send((True, None))
+
+
+def _send_error(conn, ex):
+    try:
+        conn.send((False, ex))
+    except Exception:
+        # the exception does not pickle, send what it said
+        conn.send((False, RuntimeError(repr(ex))))
@@ -0,0 +1,445 @@
+from bisect import bisect_left
+import os
+import struct
+import weakref
+
+from hellodb.consts import (
+    BLOCK_HANDLE_FORMAT,
+    BLOCK_TRAILER_SIZE,
+    COMPRESSION_NONE,
+    DEFAULT_BLOOM_BITS_PER_KEY,
+    DEFAULT_SST_BLOCK_SIZE,
+    LEGACY_TOMBSTONE_VALUE,
+    MULTI_GET_MAX_READ_SIZE,
+    SST_FILE_NAME_FORMAT,
+    SST_TMP_FILE_NAME_FORMAT,
+    SST_TYPED_DELETES_PROPERTY,
+    TOMBSTONE_ENTRY,
+)
+from hellodb.io import reader, writer
+from hellodb.io.compression import compress_block, compression_type
+from hellodb.search_ds.bloom import BloomFilter
+from hellodb import stats, utils
+
+
+class FilterStats(object):
+    """
+    Bloom filter counters shared by the readers of one database. A lookup is
+    "useful" when the filter rules the key out, and a "false positive" when
+    the filter lets it through but the table does not hold the key.
+    """
+
+    def __init__(self):
+        self.useful = 0
+        self.false_positive = 0
+
+    def to_dict(self):
+        return {
+            "filter_useful": self.useful,
+            "filter_false_positive": self.false_positive,
+        }
+
+
+class BlockSSTableROMngr(object):
+    """
+    Reader for block based SSTables. Only the sparse index, one key per
+    data block, is kept in memory. A lookup binary searches it and then
+    reads and scans a single data block.
+    """
+
+    legacy = False
+
+    def __init__(
+        self,
+        sst_file_path,
+        sst_file_name,
+        filter_stats=None,
+        block_cache=None,
+        statistics=None,
+        cache_id=None,
+    ):
+        self.file_id = sst_file_name
+        self._statistics = statistics
+        self._sst_path = os.path.join(
+            sst_file_path, SST_FILE_NAME_FORMAT.format(sst_file_name)
+        )
+        self._sst_reader = reader.BlockSSTReader(self._sst_path)
+        self._encoder = self._sst_reader.encoder
+        self._index_keys = []
+        self._index_handles = []
+        self._filter = None
+        self._filter_stats = filter_stats if filter_stats is not None else FilterStats()
+        self._block_cache = block_cache
+        # a table opened again keeps its id so its cached blocks stay valid
+        if cache_id is None and block_cache is not None:
+            cache_id = block_cache.new_id()
+        self.cache_id = cache_id
+        self.properties = {}
+        self.smallest_key = b""
+        self.largest_key = b""
+        self._load_index()
+        # tables written before deletes were flagged store them as a value
+        self._untyped_deletes = SST_TYPED_DELETES_PROPERTY not in self.properties
+
+    def _load_index(self):
+        index_handle, properties_handle = self._sst_reader.read_footer()
+        for key, value in self._encoder.decode_entries(
+            self._sst_reader.read_block(*index_handle)
+        ):
+            self._index_keys.append(key)
+            self._index_handles.append(struct.unpack(BLOCK_HANDLE_FORMAT, value))
+        for key, value in self._encoder.decode_entries(
+            self._sst_reader.read_block(*properties_handle)
+        ):
+            # keys may be binary, they are only informational here
+            self.properties[key.decode("utf-8")] = str(
+                value, "utf-8", "backslashreplace"
+            )
+            if key == b"smallest_key":
+                self.smallest_key = bytes(value)
+            elif key == b"largest_key":
+                self.largest_key = bytes(value)
+        if "filter_offset" in self.properties:
+            self._filter = BloomFilter.from_bytes(
+                self._sst_reader.read_block(
+                    int(self.properties["filter_offset"]),
+                    int(self.properties["filter_size"]),
+                )
+            )
+
+    @property
+    def size(self):
+        return self._sst_reader.size
+
+    @property
+    def num_entries(self):
+        return int(self.properties.get("num_entries", 0))
+
+    @property
+    def source_ids(self):
+        """
+        Range of flushed table ids whose data this table holds. Tables are
+        ordered by it, so a compacted table keeps the age of its inputs.
+        """
+        return (
+            int(self.properties.get("min_source_id", self.file_id)),
+            int(self.properties.get("max_source_id", self.file_id)),
+        )
+
+    def _find_block(self, key):
+        # index keys are the last key of each block
+        position = bisect_left(self._index_keys, key)
+        if position == len(self._index_keys):
+            return None
+        return self._index_handles[position]
+
+    def _read_block(self, handle):
+        # cached blocks were verified when they were read, a hit skips both
+        # the read and the CRC
+        if self._block_cache is None:
+            return self._load_block(handle)
+        cache_key = (self.cache_id, handle[0])
+        block = self._block_cache.get(cache_key)
+        if block is None:
+            block = self._load_block(handle)
+            self._block_cache.put(cache_key, block, len(block))
+        return block
+
+    def _load_block(self, handle):
+        if self._statistics is not None:
+            self._statistics.record_tick(stats.SST_BLOCK_READS)
+            self._statistics.record_tick(stats.SST_BYTES_READ, handle[1])
+        return self._sst_reader.read_block(*handle)
+
+    def _find_value(self, key):
+        if self._filter is not None and not self._filter.may_contain(key):
+            self._filter_stats.useful += 1
+            return None
+        handle = self._find_block(key)
+        if handle is None:
+            if self._filter is not None:
+                self._filter_stats.false_positive += 1
+            return None
+        value = self._encoder.find_entry(self._read_block(handle), key)
+        if value is not None:
+            return value
+        if self._filter is not None:
+            self._filter_stats.false_positive += 1
+        return None
+
+    def _value(self, value):
+        # a copy of the block slice, or TOMBSTONE_ENTRY for a delete
+        if value is TOMBSTONE_ENTRY:
+            return value
+        value = bytes(value)
+        if self._untyped_deletes and value == LEGACY_TOMBSTONE_VALUE:
+            return TOMBSTONE_ENTRY
+        return value
+
+    def contains(self, key):
+        return self._find_value(key) is not None
+
+    def get(self, key):
+        value = self._find_value(key)
+        if value is not None:
+            return self._value(value)
+        else:
+            return None
+
+    def multi_get(self, keys):
+        """
+        Return {key: value} for the keys found in this table. Keys are
+        grouped by data block, the blocks missing from the cache are read
+        in file order and runs of adjacent blocks with a single read.
+        """
+        keys_by_block = {}
+        for key in keys:
+            if self._filter is not None and not self._filter.may_contain(key):
+                self._filter_stats.useful += 1
+                continue
+            handle = self._find_block(key)
+            if handle is None:
+                if self._filter is not None:
+                    self._filter_stats.false_positive += 1
+                continue
+            keys_by_block.setdefault(handle, []).append(key)
+        found = {}
+        for handle, block in self._read_blocks(sorted(keys_by_block)):
+            for key in keys_by_block[handle]:
+                value = self._encoder.find_entry(block, key)
+                if value is not None:
+                    found[key] = self._value(value)
+                elif self._filter is not None:
+                    self._filter_stats.false_positive += 1
+        return found
+
+    def _read_blocks(self, handles):
+        """Yield (handle, block) for handles sorted by offset."""
+        missing = []
+        for handle in handles:
+            block = None
+            if self._block_cache is not None:
+                block = self._block_cache.get((self.cache_id, handle[0]))
+            if block is None:
+                missing.append(handle)
+            else:
+                yield handle, block
+        for run in self._adjacent_runs(missing):
+            blocks = self._sst_reader.read_blocks(run)
+            if self._statistics is not None:
+                self._statistics.record_tick(stats.SST_MULTI_GET_READS)
+                self._statistics.record_tick(stats.SST_BLOCK_READS, len(run))
+                self._statistics.record_tick(
+                    stats.SST_BYTES_READ, sum(size for _, size in run)
+                )
+            for handle, block in zip(run, blocks):
+                if self._block_cache is not None:
+                    self._block_cache.put((self.cache_id, handle[0]), block, len(block))
+                yield handle, block
+
+    @staticmethod
+    def _adjacent_runs(handles):
+        run, run_end = [], None
+        for offset, size in handles:
+            if run and (
+                offset != run_end
+                or offset + size - run[0][0] > MULTI_GET_MAX_READ_SIZE
+            ):
+                yield run
+                run = []
+            run.append((offset, size))
+            run_end = offset + size + BLOCK_TRAILER_SIZE
+        if run:
+            yield run
+
+    def get_all_pairs(self):
+        return self.iterate_range()
+
+    def iterate_range(self, start=None, end=None, reverse=False):
+        """
+        Yield (key, value) pairs with start <= key < end, one block at a
+        time. Scans bypass the block cache.
+        """
+        first = 0 if start is None else bisect_left(self._index_keys, start)
+        last = len(self._index_handles) - 1
+        if end is not None:
+            last = min(last, bisect_left(self._index_keys, end))
+        positions = range(first, last + 1)
+        for position in reversed(positions) if reverse else positions:
+            entries = self._encoder.decode_entries(
+                self._load_block(self._index_handles[position])
+            )
+            if reverse:
+                entries = reversed(list(entries))
+            for key, value in entries:
+                if start is not None and key < start:
+                    if reverse:
+                        return
+                    continue
+                if end is not None and key >= end:
+                    if reverse:
+                        continue
+                    return
+                yield key, self._value(value)
+
+    def close(self):
+        if self._block_cache is not None:
+            self._block_cache.erase_owner(self.cache_id)
+        self._sst_reader.close()
+
+    def delete(self):
+        self.close()
+        os.remove(self._sst_path)
+
+    def retire(self):
+        """
+        Delete a table that lookups may still be using. The file is
+        unlinked now, the handle is closed once the last reference to this
+        reader is gone.
+        """
+        if self._block_cache is not None:
+            self._block_cache.erase_owner(self.cache_id)
+        os.remove(self._sst_path)
+        weakref.finalize(self, self._sst_reader.close)
+
+    def release(self):
+        """
+        Close the file once the last lookup using this reader is done. The
+        cached blocks are kept, the table may be opened again.
+        """
+        weakref.finalize(self, self._sst_reader.close)
+
+
+class BlockSSTableRWMngr(object):
+    """
+    Writes sorted key/values into data blocks of roughly block_size bytes.
+    Keys must be written in increasing order. close() writes the bloom
+    filter, the properties block, the index and the footer. A
+    bloom_bits_per_key of 0 disables the filter. Data blocks are
+    compressed with the given codec, the filter, properties and index
+    blocks never are. With temporary=True the table is written under a .tmp
+    name and renamed into place by close(), so a partially written table is
+    never opened.
+    """
+
+    def __init__(
+        self,
+        sst_file_path,
+        sst_file_name,
+        block_size=DEFAULT_SST_BLOCK_SIZE,
+        bloom_bits_per_key=DEFAULT_BLOOM_BITS_PER_KEY,
+        extra_properties=None,
+        temporary=False,
+        compression=COMPRESSION_NONE,
+    ):
+        self._sst_file_path = sst_file_path
+        self._compression = compression
+        self._compression_type = compression_type(compression)
+        self._sst_path = os.path.join(
+            sst_file_path, SST_FILE_NAME_FORMAT.format(sst_file_name)
+        )
+        self._tmp_path = (
+            os.path.join(sst_file_path, SST_TMP_FILE_NAME_FORMAT.format(sst_file_name))
+            if temporary
+            else None
+        )
+        self._sst_writer = writer.BlockSSTWriter(
+            self._tmp_path if temporary else self._sst_path
+        )
+        self._encoder = self._sst_writer.encoder
+        self._block_size = block_size
+        self._bloom_bits_per_key = bloom_bits_per_key
+        self._filter_keys = []
+        self._block_entries = []
+        self._block_bytes = 0
+        self._last_key = None
+        self._index_entries = []
+        self._num_entries = 0
+        self._smallest_key = None
+        self._extra_properties = extra_properties or {}
+        self._closed = False
+
+    @property
+    def size(self):
+        return self._sst_writer.size
+
+    @property
+    def num_entries(self):
+        return self._num_entries
+
+    def _flush_block(self):
+        if not self._block_entries:
+            return
+        handle = self._sst_writer.append_block(
+            *compress_block(b"".join(self._block_entries), self._compression_type)
+        )
+        self._index_entries.append(
+            self._encoder.encode_entry(
+                self._last_key, struct.pack(BLOCK_HANDLE_FORMAT, *handle)
+            )
+        )
+        self._block_entries = []
+        self._block_bytes = 0
+
+    def write_key_value(self, key, value):
+        entry = self._encoder.encode_entry(key, value)
+        self._block_entries.append(entry)
+        self._block_bytes += len(entry)
+        self._last_key = key
+        if self._bloom_bits_per_key > 0:
+            self._filter_keys.append(key)
+        if self._smallest_key is None:
+            self._smallest_key = key
+        self._num_entries += 1
+        if self._block_bytes >= self._block_size:
+            self._flush_block()
+
+    def _write_filter(self):
+        bloom_filter = BloomFilter.create(
+            len(self._filter_keys), self._bloom_bits_per_key
+        )
+        bloom_filter.add_all(self._filter_keys)
+        self._filter_keys = []
+        return self._sst_writer.append_block(bloom_filter.to_bytes())
+
+    def _properties(self, filter_handle):
+        properties = {
+            "block_size": str(self._block_size),
+            "compression": self._compression,
+            "largest_key": self._last_key or b"",
+            "num_blocks": str(len(self._index_entries)),
+            "num_entries": str(self._num_entries),
+            "smallest_key": self._smallest_key or b"",
+            SST_TYPED_DELETES_PROPERTY: "1",
+        }
+        if filter_handle is not None:
+            properties["bloom_bits_per_key"] = str(self._bloom_bits_per_key)
+            properties["filter_offset"] = str(filter_handle[0])
+            properties["filter_size"] = str(filter_handle[1])
+        for name, value in self._extra_properties.items():
+            properties[name] = str(value)
+        return b"".join(
+            self._encoder.encode_entry(
+                str.encode(name),
+                value if isinstance(value, bytes) else str.encode(value),
+            )
+            for name, value in sorted(properties.items())
+        )
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_block()
+        filter_handle = None
+        if self._bloom_bits_per_key > 0:
+            filter_handle = self._write_filter()
+        properties_handle = self._sst_writer.append_block(
+            self._properties(filter_handle)
+        )
+        index_handle = self._sst_writer.append_block(b"".join(self._index_entries))
+        self._sst_writer.write_footer(index_handle, properties_handle)
+        self._sst_writer.close()
+        if self._tmp_path is not None:
+            os.rename(self._tmp_path, self._sst_path)
+            utils.fsync_directory(self._sst_file_path)
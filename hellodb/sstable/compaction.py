@@ -0,0 +1,248 @@
+import heapq
+import logging
+from threading import Event, Thread
+import time
+
+from hellodb.consts import (
+    COMPACTION_BUCKET_HIGH,
+    COMPACTION_BUCKET_LOW,
+    COMPACTION_MAX_THRESHOLD,
+    COMPACTION_MIN_SSTABLE_SIZE,
+    COMPACTION_MIN_THRESHOLD,
+    COMPACTION_SIZE_TIERED,
+    COMPRESSION_NONE,
+    DEFAULT_BLOOM_BITS_PER_KEY,
+    DEFAULT_SST_BLOCK_SIZE,
+    TOMBSTONE_ENTRY,
+)
+from hellodb.logger import CustomAdapter
+from hellodb.sstable.block_sst_mngr import BlockSSTableRWMngr
+from hellodb.sstable.sst_mngr import open_sstable_reader
+
+
+class CompactionStats(object):
+    def __init__(self):
+        self.compactions = 0
+        self.tables_compacted = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.flush_bytes_written = 0
+        self.duration = 0.0
+        self.last_duration = 0.0
+
+    @property
+    def write_amplification(self):
+        """Bytes written to SSTables by flushes and compactions per flushed byte."""
+        if self.flush_bytes_written == 0:
+            return 0.0
+        return (self.flush_bytes_written + self.bytes_written) / float(
+            self.flush_bytes_written
+        )
+
+    def to_dict(self):
+        return {
+            "compactions": self.compactions,
+            "tables_compacted": self.tables_compacted,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "flush_bytes_written": self.flush_bytes_written,
+            "write_amplification": self.write_amplification,
+            "duration": self.duration,
+            "last_duration": self.last_duration,
+        }
+
+
+class SizeTieredCompactionPolicy(object):
+    """
+    Groups runs of adjacent tables, in age order, whose sizes are within
+    [bucket_low, bucket_high] times the run average. Tables smaller than
+    min_sstable_size always fall in the same bucket. The bucket with the
+    smallest tables holding at least min_threshold tables is compacted,
+    capped to max_threshold tables. Only adjacent tables are merged so the
+    output can take the place of its inputs in the table order.
+    """
+
+    def __init__(
+        self,
+        min_threshold=COMPACTION_MIN_THRESHOLD,
+        max_threshold=COMPACTION_MAX_THRESHOLD,
+        bucket_low=COMPACTION_BUCKET_LOW,
+        bucket_high=COMPACTION_BUCKET_HIGH,
+        min_sstable_size=COMPACTION_MIN_SSTABLE_SIZE,
+    ):
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.bucket_low = bucket_low
+        self.bucket_high = bucket_high
+        self.min_sstable_size = min_sstable_size
+
+    def _is_similar(self, size, average):
+        if size < self.min_sstable_size and average < self.min_sstable_size:
+            return True
+        return average * self.bucket_low <= size <= average * self.bucket_high
+
+    def pick(self, readers):
+        buckets = []
+        bucket, total = [], 0
+        for reader in readers:
+            size = reader.size
+            if bucket and not self._is_similar(size, total / len(bucket)):
+                buckets.append((total / len(bucket), bucket))
+                bucket, total = [], 0
+            bucket.append(reader)
+            total += size
+        if bucket:
+            buckets.append((total / len(bucket), bucket))
+        candidates = [
+            (average, bucket)
+            for average, bucket in buckets
+            if len(bucket) >= self.min_threshold
+        ]
+        if not candidates:
+            return None
+        _, bucket = min(candidates, key=lambda candidate: candidate[0])
+        return bucket[: self.max_threshold]
+
+
+COMPACTION_POLICIES = {
+    COMPACTION_SIZE_TIERED: SizeTieredCompactionPolicy,
+}
+
+
+def merge_sstables(readers, sst_writer, drop_tombstones):
+    """
+    K-way merge readers, oldest first, into sst_writer keeping only the
+    newest version of every key.
+    """
+
+    def tagged_pairs(reader, rank):
+        for key, value in reader.get_all_pairs():
+            yield key, rank, value
+
+    # newer tables get a lower rank so their version sorts first
+    merged = heapq.merge(
+        *[tagged_pairs(reader, -age) for age, reader in enumerate(readers)]
+    )
+    last_key = None
+    for key, _, value in merged:
+        if key == last_key:
+            continue
+        last_key = key
+        if drop_tombstones and value is TOMBSTONE_ENTRY:
+            continue
+        sst_writer.write_key_value(key, value)
+
+
+class CompactionManager(object):
+    def __init__(
+        self,
+        file_path,
+        sst_mngr,
+        allocate_file_id,
+        install_fn,
+        policy,
+        block_size=DEFAULT_SST_BLOCK_SIZE,
+        bloom_bits_per_key=DEFAULT_BLOOM_BITS_PER_KEY,
+        filter_stats=None,
+        block_cache=None,
+        compression=COMPRESSION_NONE,
+        statistics=None,
+    ):
+        self.logger = CustomAdapter(
+            logging.getLogger(__name__),
+            {"logger": "{}".format("COMPACTION")},
+        )
+        self._file_path = file_path
+        self._sst_mngr = sst_mngr
+        self._allocate_file_id = allocate_file_id
+        self._install_fn = install_fn
+        self._policy = policy
+        self._block_size = block_size
+        self._bloom_bits_per_key = bloom_bits_per_key
+        self._filter_stats = filter_stats
+        self._block_cache = block_cache
+        self._compression = compression
+        self._statistics = statistics
+        self._wakeup = Event()
+        self._stop = Event()
+        self._thread = None
+        self.stats = CompactionStats()
+
+    def start(self):
+        self._thread = Thread(target=self._compaction_thread)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def maybe_schedule(self):
+        self._wakeup.set()
+
+    def record_flush(self, bytes_written):
+        self.stats.flush_bytes_written += bytes_written
+
+    def _compaction_thread(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                while not self._stop.is_set() and self.compact_once():
+                    pass
+            except Exception as ex:
+                self.logger.exception("Exception happened during compaction")
+                self.logger.debug(
+                    "Exception {} happened during compaction".format(ex)
+                )
+
+    def compact_once(self):
+        readers = self._sst_mngr.get_readers()
+        inputs = self._policy.pick(readers)
+        if not inputs:
+            return False
+        start = time.monotonic()
+        # tombstones only shadow older tables, if the oldest table is part
+        # of the compaction nothing older is left for them to shadow
+        drop_tombstones = readers.index(inputs[0]) == 0
+        file_id = self._allocate_file_id()
+        sst_writer = BlockSSTableRWMngr(
+            self._file_path,
+            file_id,
+            self._block_size,
+            self._bloom_bits_per_key,
+            extra_properties={
+                "min_source_id": min(reader.source_ids[0] for reader in inputs),
+                "max_source_id": max(reader.source_ids[1] for reader in inputs),
+            },
+            temporary=True,
+            compression=self._compression,
+        )
+        merge_sstables(inputs, sst_writer, drop_tombstones)
+        sst_writer.close()
+        output = open_sstable_reader(
+            self._file_path,
+            file_id,
+            self._filter_stats,
+            self._block_cache,
+            self._statistics,
+        )
+        self._install_fn(inputs, [output])
+        for reader in inputs:
+            reader.retire()
+
+        duration = time.monotonic() - start
+        self.stats.compactions += 1
+        self.stats.tables_compacted += len(inputs)
+        self.stats.bytes_read += sum(reader.size for reader in inputs)
+        self.stats.bytes_written += output.size
+        self.stats.duration += duration
+        self.stats.last_duration = duration
+        self.logger.debug(
+            "Compacted tables {} into {} in {:.3f}s".format(
+                [reader.file_id for reader in inputs], file_id, duration
+            )
+        )
+        return True
@@ -1,26 +1,70 @@
 import os
 from threading import RLock
+import weakref
 
-from hellodb.consts import IDX_FILE_NAME_FORMAT, SST_FILE_NAME_FORMAT
+from hellodb.consts import (
+    IDX_FILE_NAME_FORMAT,
+    LEGACY_TOMBSTONE_VALUE,
+    SST_FILE_NAME_FORMAT,
+    TOMBSTONE_ENTRY,
+)
 from hellodb.index import bst
 from hellodb.io import reader, writer
-from hellodb import utils
+from hellodb.sstable.block_sst_mngr import BlockSSTableROMngr
+from hellodb import stats, utils
+
+
+def _close_readers(*readers):
+    for file_reader in readers:
+        file_reader.close()
 
 
 class SSTableROMngr(object):
-    def __init__(self, sst_file_path, sst_file_name):
+    legacy = True
+
+    def __init__(
+        self,
+        sst_file_path,
+        sst_file_name,
+        block_cache=None,
+        statistics=None,
+        cache_id=None,
+    ):
+        self.file_id = sst_file_name
+        self._statistics = statistics
+        self._block_cache = block_cache
+        if cache_id is None and block_cache is not None:
+            cache_id = block_cache.new_id()
+        self.cache_id = cache_id
         self._index = bst.BSTIndex()
-        self._sst_reader = reader.SSTReader(
-            os.path.join(sst_file_path, SST_FILE_NAME_FORMAT.format(sst_file_name)),
+        self.num_entries = 0
+        self.smallest_key = b""
+        self.largest_key = b""
+        self._sst_path = os.path.join(
+            sst_file_path, SST_FILE_NAME_FORMAT.format(sst_file_name)
         )
-        self._index_reader = reader.IndexReader(
-            os.path.join(sst_file_path, IDX_FILE_NAME_FORMAT.format(sst_file_name))
+        self._index_path = os.path.join(
+            sst_file_path, IDX_FILE_NAME_FORMAT.format(sst_file_name)
         )
+        self._sst_reader = reader.SSTReader(self._sst_path)
+        self._index_reader = reader.IndexReader(self._index_path)
         self._load_index()
 
+    @property
+    def size(self):
+        return self._sst_reader.size + self._index_reader.size
+
+    @property
+    def source_ids(self):
+        return self.file_id, self.file_id
+
     def _load_index(self):
         for key, offset in self._index_reader.read_all():
             self._index.put(key, int(offset))
+            if self.num_entries == 0:
+                self.smallest_key = key
+            self.largest_key = key
+            self.num_entries += 1
 
     def contains(self, key):
         return self._index.contains(key)
@@ -28,38 +72,165 @@ class SSTableROMngr(object):
     def get(self, key):
         offset = self._index.get(key)
         if offset is not None:
-            value = self._sst_reader.read(offset)
-            return value
+            return self._read_value(offset)
         else:
             return None
 
+    def _read_value(self, offset):
+        # legacy tables have no blocks, values are cached by their offset
+        if self._block_cache is None:
+            return self._load_value(offset)
+        cache_key = (self.cache_id, offset)
+        value = self._block_cache.get(cache_key)
+        if value is None:
+            value = self._load_value(offset)
+            self._block_cache.put(cache_key, value, len(value))
+        return value
+
+    def multi_get(self, keys):
+        """
+        Return {key: value} for the keys found in this table, values are
+        read in file order.
+        """
+        offsets = []
+        for key in keys:
+            offset = self._index.get(key)
+            if offset is not None:
+                offsets.append((offset, key))
+        return {key: self._read_value(offset) for offset, key in sorted(offsets)}
+
+    def _load_value(self, offset):
+        value = self._sst_reader.read(offset)
+        if self._statistics is not None:
+            self._statistics.record_tick(stats.SST_BLOCK_READS)
+            self._statistics.record_tick(stats.SST_BYTES_READ, len(value))
+        # the legacy format has no entry types, deletes are stored as a value
+        if value == LEGACY_TOMBSTONE_VALUE:
+            return TOMBSTONE_ENTRY
+        return value
+
+    def get_all_pairs(self):
+        return self.iterate_range()
+
+    def iterate_range(self, start=None, end=None, reverse=False):
+        """
+        Yield (key, value) pairs with start <= key < end. The index file is
+        read sequentially, a reverse scan keeps the matching index entries
+        of this table in memory.
+        """
+        index_reader = reader.IndexReader(self._index_path)
+        return self._iterate_index(index_reader, start, end, reverse)
+
+    def _iterate_index(self, index_reader, start, end, reverse):
+        try:
+            entries = []
+            for key, offset in index_reader.read_all():
+                if start is not None and key < start:
+                    continue
+                if end is not None and key >= end:
+                    break
+                if reverse:
+                    entries.append((key, offset))
+                else:
+                    yield key, self._load_value(offset)
+            for key, offset in reversed(entries):
+                yield key, self._load_value(offset)
+        finally:
+            index_reader.close()
+
     def close(self):
+        if self._block_cache is not None:
+            self._block_cache.erase_owner(self.cache_id)
         self._index_reader.close()
         self._sst_reader.close()
 
+    def delete(self):
+        self.close()
+        os.remove(self._index_path)
+        os.remove(self._sst_path)
+
+    def retire(self):
+        """
+        Delete a table that lookups may still be using. The files are
+        unlinked now, the handles are closed once the last reference to
+        this reader is gone.
+        """
+        if self._block_cache is not None:
+            self._block_cache.erase_owner(self.cache_id)
+        os.remove(self._index_path)
+        os.remove(self._sst_path)
+        weakref.finalize(self, _close_readers, self._index_reader, self._sst_reader)
+
+    def release(self):
+        """
+        Close the files once the last lookup using this reader is done. The
+        cached values are kept, the table may be opened again.
+        """
+        weakref.finalize(self, _close_readers, self._index_reader, self._sst_reader)
+
 
 class SSTableRWMngr(object):
     def __init__(self, sst_file_path, sst_file_name):
         self._index = bst.BSTIndex()
+        # entries are buffered, both files are synced once by close()
         self._sst_writer = writer.SSTWriter(
             os.path.join(sst_file_path, SST_FILE_NAME_FORMAT.format(sst_file_name)),
+            os_sync=False,
         )
         self._index_writer = writer.IndexWriter(
-            os.path.join(sst_file_path, IDX_FILE_NAME_FORMAT.format(sst_file_name))
+            os.path.join(sst_file_path, IDX_FILE_NAME_FORMAT.format(sst_file_name)),
+            os_sync=False,
         )
 
     def write_key_value(self, key, value):
+        if value is TOMBSTONE_ENTRY:
+            value = LEGACY_TOMBSTONE_VALUE
         offset = self._sst_writer.append(value)
         self._index_writer.append(key, offset)
 
     def close(self):
+        self._sst_writer.sync()
+        self._index_writer.sync()
         self._index_writer.close()
         self._sst_writer.close()
 
 
+def open_sstable_reader(
+    sst_file_path,
+    sst_file_name,
+    filter_stats=None,
+    block_cache=None,
+    statistics=None,
+    legacy=None,
+    cache_id=None,
+):
+    """
+    Open a table in whichever format it was written. Tables written before
+    the block format have a separate .idx file next to the .sst file and
+    no bloom filter. legacy says which format the table is in when it is
+    already known, otherwise the .idx file is looked for.
+    """
+    if legacy is None:
+        legacy = os.path.exists(
+            os.path.join(sst_file_path, IDX_FILE_NAME_FORMAT.format(sst_file_name))
+        )
+    if legacy:
+        return SSTableROMngr(
+            sst_file_path, sst_file_name, block_cache, statistics, cache_id
+        )
+    return BlockSSTableROMngr(
+        sst_file_path, sst_file_name, filter_stats, block_cache, statistics, cache_id
+    )
+
+
 class SSTableCollection(object):
-    def __init__(self, sst_readers):
+    def __init__(self, sst_readers, statistics=None):
         self._sst_readers = sst_readers
+        self._statistics = statistics
+
+    @property
+    def readers(self):
+        return list(self._sst_readers)
 
     def contains(self, key):
         for index in range(len(self._sst_readers) - 1, -1, -1):
@@ -68,22 +239,81 @@ class SSTableCollection(object):
         return False
 
     def get(self, key):
+        if self._statistics is not None:
+            return self._get_counting_probes(key)
         for index in range(len(self._sst_readers) - 1, -1, -1):
             value = self._sst_readers[index].get(key)
             if value is not None:
                 return value
 
+    def _get_counting_probes(self, key):
+        probes, value = 0, None
+        for index in range(len(self._sst_readers) - 1, -1, -1):
+            probes += 1
+            value = self._sst_readers[index].get(key)
+            if value is not None:
+                break
+        self._statistics.record_tick(stats.SST_TABLES_PROBED, probes)
+        self._statistics.record(stats.SST_TABLES_PER_GET, probes)
+        return value
+
+    def multi_get(self, keys):
+        """
+        Return {key: value} for the keys found, newest table first. Every
+        table is asked once, for the keys not found in a newer one.
+        """
+        found, remaining = {}, sorted(set(keys))
+        probes = 0
+        for index in range(len(self._sst_readers) - 1, -1, -1):
+            if not remaining:
+                break
+            probes += len(remaining)
+            values = self._sst_readers[index].multi_get(remaining)
+            if values:
+                found.update(values)
+                remaining = [key for key in remaining if key not in values]
+        if self._statistics is not None:
+            self._statistics.record_tick(stats.SST_TABLES_PROBED, probes)
+        return found
+
 
 class SSTableManager(object):
-    def __init__(self):
+    def __init__(self, statistics=None):
         self._lock = RLock()
+        self._statistics = statistics
         self._all_sst_readers = []
-        self._current_reader = SSTableCollection([])
+        self._current_reader = SSTableCollection([], statistics)
 
     def add_reader(self, sst_reader):
         with self._lock:
-            self._all_sst_readers.append(sst_reader)
-            self._current_reader = SSTableCollection(self._all_sst_readers)
+            # copy, collections handed out to lookups must not change
+            self._all_sst_readers = self._all_sst_readers + [sst_reader]
+            self._current_reader = SSTableCollection(
+                self._all_sst_readers, self._statistics
+            )
+
+    def get_readers(self):
+        with self._lock:
+            return list(self._all_sst_readers)
+
+    def replace_readers(self, old_readers, new_readers):
+        """
+        Swap a contiguous run of readers, oldest first, for new_readers. A
+        new collection is published so lookups that already hold the old
+        one are not affected.
+        """
+        with self._lock:
+            start = self._all_sst_readers.index(old_readers[0])
+            if self._all_sst_readers[start : start + len(old_readers)] != old_readers:
+                raise ValueError("Readers to replace are not contiguous")
+            self._all_sst_readers = (
+                self._all_sst_readers[:start]
+                + list(new_readers)
+                + self._all_sst_readers[start + len(old_readers) :]
+            )
+            self._current_reader = SSTableCollection(
+                self._all_sst_readers, self._statistics
+            )
 
     def clear_reders(self):
         with self._lock:
@@ -0,0 +1,219 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import weakref
+
+from hellodb.consts import DEFAULT_MAX_OPEN_TABLES
+from hellodb.manifest import TableMeta
+from hellodb.sstable.sst_mngr import open_sstable_reader
+
+
+class TableCache(object):
+    """
+    LRU of open SSTable readers, keyed by file id and bounded by the number
+    of open tables. A table is opened on its first lookup. Evicted readers
+    close their files, and drop their index and filter, once the last
+    lookup still using them is done. Their cached blocks stay valid, a table
+    opened again keeps its block cache id.
+    """
+
+    def __init__(
+        self,
+        file_path,
+        max_open_tables=DEFAULT_MAX_OPEN_TABLES,
+        filter_stats=None,
+        block_cache=None,
+        statistics=None,
+    ):
+        self._file_path = file_path
+        self._max_open_tables = max(1, max_open_tables)
+        self._filter_stats = filter_stats
+        self._block_cache = block_cache
+        self._statistics = statistics
+        # opening under the lock keeps a table that is being retired from
+        # being opened again after its file is unlinked
+        self._lock = Lock()
+        self._readers = OrderedDict()
+        self._cache_ids = {}
+        # retired tables lookups may still reach, kept alive by their handle
+        self._retired = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_open_tables(self):
+        return self._max_open_tables
+
+    def get(self, meta):
+        with self._lock:
+            sst_reader = self._readers.get(meta.file_id)
+            if sst_reader is not None:
+                self._readers.move_to_end(meta.file_id)
+                self.hits += 1
+                return sst_reader
+            sst_reader = self._retired.get(meta.file_id)
+            if sst_reader is not None:
+                return sst_reader
+            self.misses += 1
+            sst_reader = self._open(meta)
+            self._insert(sst_reader)
+            return sst_reader
+
+    def _open(self, meta):
+        # called with self._lock held, except by preload()
+        return open_sstable_reader(
+            self._file_path,
+            meta.file_id,
+            self._filter_stats,
+            self._block_cache,
+            self._statistics,
+            legacy=meta.legacy,
+            cache_id=self._cache_ids.get(meta.file_id),
+        )
+
+    def _insert(self, sst_reader):
+        # must be called with self._lock held
+        self._readers[sst_reader.file_id] = sst_reader
+        self._cache_ids[sst_reader.file_id] = sst_reader.cache_id
+        while len(self._readers) > self._max_open_tables:
+            _, evicted = self._readers.popitem(last=False)
+            evicted.release()
+            self.evictions += 1
+
+    def preload(self, metas, threads=1):
+        """
+        Open the newest of metas, as many as fit, in a thread pool so the
+        first lookups find them open. Only used at startup, before any
+        table can be retired.
+        """
+        metas = list(metas)[-self._max_open_tables :]
+        with ThreadPoolExecutor(max(1, threads)) as executor:
+            sst_readers = list(executor.map(self._open, metas))
+        with self._lock:
+            for sst_reader in sst_readers:
+                self._insert(sst_reader)
+        return len(sst_readers)
+
+    def adopt(self, sst_reader):
+        """
+        Take a reader opened elsewhere, a table that was just written, and
+        return its handle.
+        """
+        meta = TableMeta.from_reader(sst_reader)
+        with self._lock:
+            self._insert(sst_reader)
+        return LazySSTable(meta, self)
+
+    def retire(self, meta):
+        """
+        Take a table out of the cache for deletion and return its reader,
+        opened if it was not, so lookups holding the handle can finish.
+        """
+        with self._lock:
+            sst_reader = self._readers.pop(meta.file_id, None)
+            if sst_reader is None:
+                sst_reader = self._retired.get(meta.file_id)
+            if sst_reader is None:
+                sst_reader = self._open(meta)
+            self._retired[meta.file_id] = sst_reader
+            self._cache_ids.pop(meta.file_id, None)
+            return sst_reader
+
+    def close(self):
+        with self._lock:
+            for sst_reader in self._readers.values():
+                sst_reader.release()
+            self._readers = OrderedDict()
+
+    def to_dict(self):
+        return {
+            "max_open_tables": self._max_open_tables,
+            "open_tables": len(self._readers),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class LazySSTable(object):
+    """
+    A live table as the table list sees it: the metadata recorded in the
+    manifest, with the reader fetched from the table cache on every use.
+    Lookups outside the key range of the table never open it.
+    """
+
+    def __init__(self, meta, table_cache):
+        self.file_id = meta.file_id
+        self._meta = meta
+        self._table_cache = table_cache
+        self._retired_reader = None
+
+    @property
+    def size(self):
+        return self._meta.size
+
+    @property
+    def num_entries(self):
+        return self._meta.num_entries
+
+    @property
+    def smallest_key(self):
+        return self._meta.smallest_key
+
+    @property
+    def largest_key(self):
+        return self._meta.largest_key
+
+    @property
+    def source_ids(self):
+        return self._meta.source_ids
+
+    @property
+    def legacy(self):
+        return self._meta.legacy
+
+    def _reader(self):
+        if self._retired_reader is not None:
+            return self._retired_reader
+        return self._table_cache.get(self._meta)
+
+    def _may_contain(self, key):
+        return (
+            self._meta.num_entries > 0
+            and self._meta.smallest_key <= key <= self._meta.largest_key
+        )
+
+    def contains(self, key):
+        return self._may_contain(key) and self._reader().contains(key)
+
+    def get(self, key):
+        if not self._may_contain(key):
+            return None
+        return self._reader().get(key)
+
+    def multi_get(self, keys):
+        keys = [key for key in keys if self._may_contain(key)]
+        if not keys:
+            return {}
+        return self._reader().multi_get(keys)
+
+    def get_all_pairs(self):
+        return self.iterate_range()
+
+    def iterate_range(self, start=None, end=None, reverse=False):
+        if self._meta.num_entries == 0:
+            return iter(())
+        if start is not None and start > self._meta.largest_key:
+            return iter(())
+        if end is not None and end <= self._meta.smallest_key:
+            return iter(())
+        return self._reader().iterate_range(start, end, reverse)
+
+    def retire(self):
+        """
+        Delete the table. Lookups that still hold this handle keep using
+        the open reader, its files are closed once the handle is gone.
+        """
+        self._retired_reader = self._table_cache.retire(self._meta)
+        self._retired_reader.retire()
@@ -0,0 +1,165 @@
+from bisect import bisect_left
+from threading import Lock
+
+# tickers
+GET_CALLS = "db.get.calls"
+GET_HIT_MEMSTORE = "db.get.hit.memstore"
+GET_HIT_SSTABLE = "db.get.hit.sstable"
+GET_MISS = "db.get.miss"
+MULTI_GET_CALLS = "db.multiget.calls"
+MULTI_GET_KEYS = "db.multiget.keys"
+KEYS_WRITTEN = "db.keys.written"
+BYTES_WRITTEN = "db.bytes.written"
+WRITE_GROUPS = "db.write.groups"
+WRITE_SLOWDOWNS = "db.write.slowdowns"
+WRITE_STALLS = "db.write.stalls"
+FLUSHES = "db.flushes"
+FLUSH_BYTES = "db.flush.bytes"
+WAL_RECORDS = "wal.records"
+WAL_BYTES = "wal.bytes"
+WAL_SYNCS = "wal.syncs"
+SST_TABLES_PROBED = "sst.tables.probed"
+SST_BLOCK_READS = "sst.block.reads"
+SST_BYTES_READ = "sst.bytes.read"
+# file reads issued by multi_get, each covering one or more adjacent blocks
+SST_MULTI_GET_READS = "sst.multiget.reads"
+VALUE_LOG_WRITES = "vlog.values.written"
+VALUE_LOG_BYTES_WRITTEN = "vlog.bytes.written"
+VALUE_LOG_READS = "vlog.values.read"
+VALUE_LOG_BYTES_READ = "vlog.bytes.read"
+
+# histograms
+GET_MICROS = "db.get.micros"
+MULTI_GET_MICROS = "db.multiget.micros"
+WRITE_MICROS = "db.write.micros"
+WRITE_GROUP_SIZE = "db.write.group.size"
+WRITE_STALL_MICROS = "db.write.stall.micros"
+FLUSH_MICROS = "db.flush.micros"
+WAL_SYNC_MICROS = "wal.sync.micros"
+SST_TABLES_PER_GET = "sst.tables.per.get"
+
+
+def _bucket_limits():
+    # 1, 2, 3, ... growing by ~1.5x, like LevelDB's histogram buckets
+    limits, limit = [], 1.0
+    while limit < 1e12:
+        limits.append(limit)
+        limit = max(limit + 1, int(limit * 1.5))
+    limits.append(float("inf"))
+    return limits
+
+
+BUCKET_LIMITS = _bucket_limits()
+
+
+class Histogram(object):
+    """
+    Counts of values in exponentially growing buckets. Percentiles are
+    interpolated inside the bucket they fall in.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKET_LIMITS)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, value):
+        self.buckets[bisect_left(BUCKET_LIMITS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        if self.count == 0:
+            return 0.0
+        threshold = self.count * percent / 100.0
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= threshold:
+                low = BUCKET_LIMITS[index - 1] if index > 0 else 0.0
+                high = min(BUCKET_LIMITS[index], self.max)
+                position = (threshold - (seen - bucket_count)) / bucket_count
+                return max(self.min, low + (high - low) * position)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "p99.9": self.percentile(99.9),
+        }
+
+
+class Statistics(object):
+    """
+    Tickers and histograms, shared by every component of one or more
+    databases. Components are handed None when statistics are disabled and
+    skip recording altogether.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._tickers = {}
+        self._histograms = {}
+
+    def record_tick(self, name, count=1):
+        with self._lock:
+            self._tickers[name] = self._tickers.get(name, 0) + count
+
+    def record(self, name, value):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(value)
+
+    def get_ticker(self, name):
+        return self._tickers.get(name, 0)
+
+    def reset(self):
+        with self._lock:
+            self._tickers = {}
+            self._histograms = {}
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "tickers": dict(sorted(self._tickers.items())),
+                "histograms": {
+                    name: histogram.to_dict()
+                    for name, histogram in sorted(self._histograms.items())
+                },
+            }
+
+    def to_string(self):
+        stats = self.to_dict()
+        lines = [
+            "{:<28}{:>16}".format(name, count)
+            for name, count in stats["tickers"].items()
+        ]
+        for name, histogram in stats["histograms"].items():
+            lines.append(
+                "{:<28} count {} avg {:.1f} p50 {:.1f} p99 {:.1f} "
+                "p99.9 {:.1f} max {:.1f}".format(
+                    name,
+                    histogram["count"],
+                    histogram["avg"],
+                    histogram["p50"],
+                    histogram["p99"],
+                    histogram["p99.9"],
+                    histogram["max"],
+                )
+            )
+        return "\n".join(lines)
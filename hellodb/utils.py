@@ -17,6 +17,22 @@ def get_sstfiles(file_path):
     )
 
 
+def get_tmp_sstfiles(file_path):
+    return glob.glob(
+        os.path.join(file_path, consts.SST_TMP_FILE_NAME_FORMAT.format("*"))
+    )
+
+
+def get_manifest_files(file_path):
+    return glob.glob(
+        os.path.join(file_path, consts.MANIFEST_FILE_NAME_FORMAT.format("*"))
+    )
+
+
+def get_manifest_id_from_name(manifest_name):
+    return int(manifest_name.split("-")[-1])
+
+
 def get_walfiles(file_path):
     return sorted(
         glob.glob(os.path.join(file_path, consts.WAL_FILE_NAME_FORMAT.format("*"))),
@@ -24,6 +40,15 @@ def get_walfiles(file_path):
     )
 
 
+def get_value_log_files(file_path):
+    return sorted(
+        glob.glob(
+            os.path.join(file_path, consts.VALUE_LOG_FILE_NAME_FORMAT.format("*"))
+        ),
+        key=lambda x: int(os.path.basename(x).split(".")[0]),
+    )
+
+
 def get_file_id_from_name(filename):
     return int(filename.split(".")[0])
 
@@ -37,3 +62,11 @@ def remove_all_wal_files(file_path):
     wal_files = get_walfiles(file_path)
     for wal_file in wal_files:
         os.remove(wal_file)
+
+
+def fsync_directory(file_path):
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,273 @@
+import logging
+import os
+import struct
+from threading import Lock
+
+from hellodb.consts import (
+    DEFAULT_VALUE_LOG_FILE_SIZE,
+    FILE_START_INDEX,
+    PUT_OPERATION,
+    TOMBSTONE_ENTRY,
+    VALUE_LOG_FILE_NAME_FORMAT,
+    VALUE_POINTER_FORMAT,
+    VALUE_POINTER_MAGIC,
+    VALUE_POINTER_SIZE,
+)
+from hellodb.io import reader, writer
+from hellodb.logger import CustomAdapter
+from hellodb import stats, utils
+from hellodb.write_batch import WriteBatch
+
+
+class ValueMovedError(Exception):
+    """The value log file of a pointer was garbage collected."""
+
+
+def is_value_pointer(value):
+    return len(value) == VALUE_POINTER_SIZE and value.startswith(VALUE_POINTER_MAGIC)
+
+
+def encode_pointer(file_id, offset, size):
+    return VALUE_POINTER_MAGIC + struct.pack(
+        VALUE_POINTER_FORMAT, file_id, offset, size
+    )
+
+
+def decode_pointer(value):
+    """Return the (file id, offset, size) a value pointer refers to."""
+    return struct.unpack_from(VALUE_POINTER_FORMAT, value, len(VALUE_POINTER_MAGIC))
+
+
+class ValueRelocation(object):
+    """
+    Live entries of a value log file being collected, as (key, pointer,
+    value). They are committed through the write queue so a value is only
+    moved if its key still points at it. flush has the write memstore
+    flushed by the same commit.
+    """
+
+    def __init__(self, entries, flush=False):
+        self.entries = entries
+        self.flush = flush
+
+
+class ValueLogStats(object):
+    def __init__(self):
+        self.values_written = 0
+        self.bytes_written = 0
+        self.gc_files_checked = 0
+        self.gc_files_collected = 0
+        self.gc_bytes_relocated = 0
+        self.gc_bytes_reclaimed = 0
+
+
+class ValueLog(object):
+    """
+    Key-value separation: values of at least threshold bytes are written
+    once to append only .vlog files and the WAL, memstores and tables only
+    store a VALUE_POINTER_SIZE pointer to them, so flushes and compactions
+    no longer copy them. A threshold of None keeps every value inline, the
+    log is still read when earlier sessions wrote to it.
+
+    Values that look like a pointer always go to the log, whatever their
+    size, so an inline value is never mistaken for one.
+    """
+
+    def __init__(
+        self,
+        file_path,
+        threshold=None,
+        file_size=DEFAULT_VALUE_LOG_FILE_SIZE,
+        statistics=None,
+        on_seal=None,
+    ):
+        self.logger = CustomAdapter(
+            logging.getLogger(__name__),
+            {"logger": "{}".format("VALUELOG")},
+        )
+        self._file_path = file_path
+        self._threshold = threshold
+        self._file_size = file_size
+        self._statistics = statistics
+        # called when a file is sealed and becomes a candidate for
+        # garbage collection
+        self._on_seal = on_seal
+        self._lock = Lock()
+        # every file by id, the one being written included
+        self._files = {}
+        for vlog_path in utils.get_value_log_files(file_path):
+            self._files[utils.get_file_id_from_absolute_path(vlog_path)] = (
+                reader.ValueLogReader(vlog_path)
+            )
+        # a session always starts a new file, the files of earlier ones
+        # are sealed
+        self._next_id = max(self._files) + 1 if self._files else FILE_START_INDEX
+        self._writer = None
+        self._active_id = None
+        self._dirty = False
+        self.stats = ValueLogStats()
+
+    @property
+    def enabled(self):
+        return self._threshold is not None
+
+    def in_use(self):
+        with self._lock:
+            return self.enabled or bool(self._files)
+
+    def _separates(self, value):
+        if value is TOMBSTONE_ENTRY:
+            return False
+        if self._threshold is not None and len(value) >= self._threshold:
+            return True
+        return is_value_pointer(value)
+
+    def separate(self, records):
+        """
+        Return the records, tuples or WriteBatches, with the values that go
+        to the log written to it and replaced by pointers. Called by the
+        commit leader only, before the records are written to the WAL.
+        """
+        entries = []
+        for record in records:
+            for key, value in record if isinstance(record, WriteBatch) else (record,):
+                if self._separates(value):
+                    entries.append((key, value))
+        if not entries:
+            return records
+        pointers = iter(self._append(entries))
+        separated = []
+        for record in records:
+            if isinstance(record, WriteBatch):
+                batch = WriteBatch()
+                for operation, key, value in record.ops:
+                    if operation != PUT_OPERATION:
+                        batch.delete(key)
+                    elif self._separates(value):
+                        batch.put(key, next(pointers))
+                    else:
+                        batch.put(key, value)
+                separated.append(batch)
+            elif self._separates(record[1]):
+                separated.append((record[0], next(pointers)))
+            else:
+                separated.append(record)
+        return separated
+
+    def _append(self, entries):
+        with self._lock:
+            if self._writer is None or self._writer.size >= self._file_size:
+                self._rotate()
+            file_id = self._active_id
+            handles = self._writer.append_many(entries)
+            self._dirty = True
+        size = sum(size for _, size in handles)
+        self.stats.values_written += len(entries)
+        self.stats.bytes_written += size
+        if self._statistics is not None:
+            self._statistics.record_tick(stats.VALUE_LOG_WRITES, len(entries))
+            self._statistics.record_tick(stats.VALUE_LOG_BYTES_WRITTEN, size)
+        return [encode_pointer(file_id, offset, size) for offset, size in handles]
+
+    def _rotate(self):
+        # must be called with self._lock held. A sealed file is synced
+        # whatever the WAL sync policy, WAL records synced later may point
+        # into it.
+        sealed = self._writer is not None
+        if sealed and self._dirty:
+            self._writer.sync()
+            self._dirty = False
+        self._active_id = self._next_id
+        self._next_id += 1
+        self._writer = writer.ValueLogWriter(
+            os.path.join(
+                self._file_path, VALUE_LOG_FILE_NAME_FORMAT.format(self._active_id)
+            )
+        )
+        utils.fsync_directory(self._file_path)
+        self._files[self._active_id] = self._writer
+        self.logger.debug("Writing values to {}".format(self._writer.name))
+        if sealed and self._on_seal is not None:
+            self._on_seal()
+
+    def sync(self):
+        """Sync the file being written, before the WAL pointing into it is."""
+        with self._lock:
+            if self._dirty:
+                self._writer.sync()
+                self._dirty = False
+
+    def read(self, key, pointer):
+        file_id, offset, size = decode_pointer(pointer)
+        with self._lock:
+            vlog_file = self._files.get(file_id)
+        if vlog_file is None:
+            raise ValueMovedError(
+                "Value log file {} was garbage collected".format(file_id)
+            )
+        entry_key, value = vlog_file.read_entry(offset, size)
+        if entry_key != key:
+            raise utils.FileIOException(
+                "Value log entry at {}:{} does not belong to its key".format(
+                    file_id, offset
+                )
+            )
+        if self._statistics is not None:
+            self._statistics.record_tick(stats.VALUE_LOG_READS)
+            self._statistics.record_tick(stats.VALUE_LOG_BYTES_READ, size)
+        return value
+
+    def sealed_file_ids(self):
+        with self._lock:
+            return sorted(
+                file_id for file_id in self._files if file_id != self._active_id
+            )
+
+    def file_size(self, file_id):
+        with self._lock:
+            return self._files[file_id].size
+
+    def read_entries(self, file_id):
+        """Yield (offset, size, key, value) of the entries of a sealed file."""
+        with self._lock:
+            vlog_file = self._files[file_id]
+        return vlog_file.read_entries()
+
+    def read_entry(self, file_id, offset, size):
+        with self._lock:
+            vlog_file = self._files[file_id]
+        return vlog_file.read_entry(offset, size)
+
+    def delete(self, file_id):
+        """
+        Delete a sealed file. Reads already holding it finish, its handle
+        is closed once the last of them is done.
+        """
+        with self._lock:
+            vlog_file = self._files.pop(file_id)
+        os.remove(vlog_file.name)
+        vlog_file.release()
+        self.logger.debug("Deleted value log file {}".format(vlog_file.name))
+
+    def to_dict(self):
+        with self._lock:
+            files = list(self._files.values())
+        return {
+            "files": len(files),
+            "bytes": sum(vlog_file.size for vlog_file in files),
+            "values_written": self.stats.values_written,
+            "bytes_written": self.stats.bytes_written,
+            "gc_files_checked": self.stats.gc_files_checked,
+            "gc_files_collected": self.stats.gc_files_collected,
+            "gc_bytes_relocated": self.stats.gc_bytes_relocated,
+            "gc_bytes_reclaimed": self.stats.gc_bytes_reclaimed,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None and self._dirty:
+                self._writer.sync()
+            for vlog_file in self._files.values():
+                vlog_file.close()
+            self._files = {}
+            self._writer = None
@@ -0,0 +1,15 @@
+class Version(object):
+    """
+    Snapshot of the stores a lookup consults, newest first. A new version is
+    published whenever the memstores rotate or the SSTable set changes, so
+    readers take the current one without locking and see a consistent set
+    of stores for the whole lookup. The write memstore keeps changing, it
+    is still read under HelloDB._lock.
+    """
+
+    __slots__ = ("wo_memstore", "ro_memstores", "sst_collection")
+
+    def __init__(self, wo_memstore, ro_memstores, sst_collection):
+        self.wo_memstore = wo_memstore
+        self.ro_memstores = ro_memstores
+        self.sst_collection = sst_collection
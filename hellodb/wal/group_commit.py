@@ -0,0 +1,62 @@
+from collections import deque
+from threading import Condition
+
+
+class _Writer(object):
+    def __init__(self, records):
+        self.records = records
+        self.done = False
+        self.error = None
+
+
+class GroupCommitQueue(object):
+    """
+    Leader/follower write queue. Concurrent writers enqueue their records,
+    the writer at the head of the queue becomes the leader and commits the
+    records of every queued writer with a single call to `commit_fn`, then
+    acknowledges all of them. Writers queued while a commit is in progress
+    form the next group. An exception from `commit_fn` fails the whole
+    group, so records must be validated before they are committed.
+    """
+
+    def __init__(self, commit_fn, max_group_records=1000):
+        self._commit_fn = commit_fn
+        self._max_group_records = max_group_records
+        self._cond = Condition()
+        self._writers = deque()
+
+    def _build_group(self):
+        group, records = [], []
+        for writer in self._writers:
+            if records and len(records) + len(writer.records) > self._max_group_records:
+                break
+            group.append(writer)
+            records.extend(writer.records)
+        return group, records
+
+    def commit(self, records):
+        writer = _Writer(records)
+        with self._cond:
+            self._writers.append(writer)
+            while not writer.done and self._writers[0] is not writer:
+                self._cond.wait()
+            if writer.done:
+                if writer.error is not None:
+                    raise writer.error
+                return
+            group, group_records = self._build_group()
+
+        error = None
+        try:
+            self._commit_fn(group_records)
+        except Exception as ex:
+            error = ex
+
+        with self._cond:
+            for member in group:
+                self._writers.popleft()
+                member.error = error
+                member.done = True
+            self._cond.notify_all()
+        if error is not None:
+            raise error
@@ -1,29 +1,61 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import os
-from threading import Lock
+from threading import Event, Lock, Thread
+import time
 
 from hellodb.consts import (
+    WAL_DEFAULT_SYNC_INTERVAL_MS,
     WAL_FILE_NAME_FORMAT,
+    WAL_SYNC_INTERVAL,
+    WAL_SYNC_NONE,
+    WAL_SYNC_PER_COMMIT,
+    WAL_SYNC_POLICIES,
     FILE_START_INDEX,
 )
 from hellodb.logger import CustomAdapter
 from hellodb.io import reader, writer
-from hellodb import utils
+from hellodb import stats, utils
 
 
 class WalManager(object):
-    def __init__(self, file_path, max_entries=5000):
+    """
+    Writes the WAL. A file holds the records of exactly one memstore, it is
+    only switched by rotate() when that memstore is rotated, so flushing
+    the memstore makes the whole file obsolete.
+    """
+
+    def __init__(
+        self,
+        file_path,
+        sync_policy=WAL_SYNC_PER_COMMIT,
+        sync_interval_ms=WAL_DEFAULT_SYNC_INTERVAL_MS,
+        statistics=None,
+        before_sync=None,
+    ):
+        if sync_policy not in WAL_SYNC_POLICIES:
+            raise ValueError("Unknown WAL sync policy {}".format(sync_policy))
         self._file_path = file_path
         self._wal_file = None
         self._next_id = self._get_next_id()
-        self._max_entries = max_entries
         self._read_files = {}
         self._lock = Lock()
-        self._current_entries = 0
+        self._sync_policy = sync_policy
+        self._sync_interval = sync_interval_ms / 1000.0
+        self._last_sync = time.monotonic()
+        self._dirty = False
+        self._stop_syncer = Event()
+        self._statistics = statistics
+        # called before every sync, files the WAL points into are synced
+        # first
+        self._before_sync = before_sync
         self.logger = CustomAdapter(
             logging.getLogger(__name__),
             {"logger": "{}".format("WALMNGR")},
         )
+        if self._sync_policy == WAL_SYNC_INTERVAL:
+            self._start_syncer_thread()
 
     def _get_next_id(self):
         wal_files = utils.get_walfiles(self._file_path)
@@ -32,52 +64,143 @@ class WalManager(object):
         else:
             return utils.get_file_id_from_absolute_path(wal_files[-1]) + 1
 
+    def _start_syncer_thread(self):
+        syncer_th = Thread(target=self._syncer_thread)
+        syncer_th.daemon = True
+        syncer_th.start()
+
+    def _syncer_thread(self):
+        while not self._stop_syncer.wait(self._sync_interval):
+            with self._lock:
+                if self._dirty and self._wal_file is not None:
+                    self._sync()
+
+    def _sync(self):
+        if self._before_sync is not None:
+            self._before_sync()
+        if self._statistics is None:
+            self._wal_file.sync()
+        else:
+            start = time.perf_counter()
+            self._wal_file.sync()
+            self._statistics.record(
+                stats.WAL_SYNC_MICROS, (time.perf_counter() - start) * 1e6
+            )
+            self._statistics.record_tick(stats.WAL_SYNCS)
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
     def _close_current_write_files(self):
         if self._wal_file is not None:
+            if self._dirty and self._sync_policy != WAL_SYNC_NONE:
+                self._sync()
             self._wal_file.close()
             self._wal_file = None
 
     def _create_new_wal_file(self, file_id):
         self._wal_file = writer.WalWriter(
-            os.path.join(self._file_path, WAL_FILE_NAME_FORMAT.format(file_id))
+            os.path.join(self._file_path, WAL_FILE_NAME_FORMAT.format(file_id)),
+            os_sync=self._sync_policy != WAL_SYNC_NONE,
         )
 
     def _rotate_files(self):
         self._next_id += 1
         self._close_current_write_files()
-        self._wal_file = self._create_new_wal_file(self._next_id)
+        self._create_new_wal_file(self._next_id)
 
-    def _check_write(self, data_len):
-        with self._lock:
-            if self._wal_file is None:
-                self._create_new_wal_file(self._next_id)
-            elif self._current_entries + 1 > self._max_entries:
-                self._rotate_files()
+    def _check_write(self):
+        if self._wal_file is None:
+            self._create_new_wal_file(self._next_id)
+
+    def _should_sync(self):
+        if self._sync_policy == WAL_SYNC_PER_COMMIT:
+            return True
+        elif self._sync_policy == WAL_SYNC_INTERVAL:
+            return time.monotonic() - self._last_sync >= self._sync_interval
+        return False
 
     def append(self, key, value):
-        self._check_write(len(key) + len(value))
-        self._current_entries += 1
-        return self._wal_file.append(key, value)
+        return self.append_many([(key, value)])
+
+    def append_many(self, records):
+        """
+        Write all records with a single write call and, depending on the
+        sync policy, at most one fsync.
+        """
+        with self._lock:
+            self._check_write()
+            offset = self._wal_file.append_many(records, False)
+            if self._statistics is not None:
+                self._statistics.record_tick(stats.WAL_RECORDS, len(records))
+                self._statistics.record_tick(
+                    stats.WAL_BYTES, self._wal_file.size - offset
+                )
+            if self._should_sync():
+                self._sync()
+            else:
+                self._dirty = True
+            return offset
+
+    def replay(self, threads=1):
+        for _, records in self.replay_files(threads):
+            for key, value in records:
+                yield key, value
 
-    def replay(self):
+    def replay_files(self, threads=1):
+        """
+        Yield (wal path, records) for every WAL file, oldest first. With
+        threads > 1 up to that many files ahead of the one being applied
+        are read and parsed in a thread pool, files still come out in log
+        order.
+        """
         wal_files = utils.get_walfiles(self._file_path)
         if not wal_files:
             self.logger.debug("No WAL files found")
-            return []
-        for wal in wal_files:
-            wal_replayer = reader.WalReader(wal)
-            for key, value in wal_replayer.read_all():
-                yield key, value
+            return
+        if threads <= 1 or len(wal_files) == 1:
+            for wal in wal_files:
+                yield wal, self._read_wal_file(wal)
+            return
+        with ThreadPoolExecutor(threads) as executor:
+            pending = deque()
+            for wal in wal_files:
+                pending.append((wal, executor.submit(self._read_wal_file, wal)))
+                if len(pending) > threads:
+                    wal, future = pending.popleft()
+                    yield wal, future.result()
+            while pending:
+                wal, future = pending.popleft()
+                yield wal, future.result()
+
+    def _read_wal_file(self, wal_path):
+        wal_replayer = reader.WalReader(wal_path)
+        try:
+            return list(wal_replayer.read_all())
+        finally:
+            wal_replayer.close()
 
     def rotate(self):
-        wal_path = self._wal_file.name
-        self._rotate_files()
-        return wal_path
+        """
+        Switch to a new WAL file and return the path of the old one, None
+        when nothing was written yet and no file is open.
+        """
+        with self._lock:
+            if self._wal_file is None:
+                return None
+            wal_path = self._wal_file.name
+            self._rotate_files()
+            return wal_path
+
+    def close(self):
+        self._stop_syncer.set()
+        with self._lock:
+            self._close_current_write_files()
 
 
 if __name__ == "__main__":
     wal_mngr = WalManager(".")
-    wal_mngr.append("test", "value")
-    wal_mngr.append("test1", "value")
+    wal_mngr.append(b"test", b"value")
+    wal_mngr.append(b"test1", b"value")
     for key, value in wal_mngr.replay():
         print(key, value)
+    wal_mngr.close()
@@ -0,0 +1,48 @@
+from hellodb.consts import DEL_OPERATION, PUT_OPERATION, TOMBSTONE_ENTRY
+from hellodb.io.encoders import check_key_length
+
+
+class WriteBatch(object):
+    """
+    Collects put and delete operations that HelloDB.write applies
+    atomically. The batch is logged as a single WAL record, so after a
+    crash either all of its operations are recovered or none are.
+    """
+
+    def __init__(self):
+        self._ops = []
+
+    def put(self, key, value):
+        check_key_length(key)
+        self._ops.append((PUT_OPERATION, key, value))
+        return self
+
+    def delete(self, key):
+        check_key_length(key)
+        self._ops.append((DEL_OPERATION, key, TOMBSTONE_ENTRY))
+        return self
+
+    def encoded(self, encode_key, encode_value):
+        """Return a copy of the batch with keys and put values encoded."""
+        batch = WriteBatch()
+        batch._ops = [
+            (operation, encode_key(key), encode_value(value))
+            if operation == PUT_OPERATION
+            else (operation, encode_key(key), value)
+            for operation, key, value in self._ops
+        ]
+        return batch
+
+    def clear(self):
+        self._ops = []
+
+    @property
+    def ops(self):
+        return self._ops
+
+    def __len__(self):
+        return len(self._ops)
+
+    def __iter__(self):
+        for _, key, value in self._ops:
+            yield key, value
@@ -0,0 +1,25 @@
+import asyncio
+
+from hellodb.async_db import AsyncHelloDB
+from hellodb.write_batch import WriteBatch
+
+
+def test_invalid_write_fails_only_its_caller(tmp_path):
+    async def run():
+        db = await AsyncHelloDB.open(str(tmp_path), None, binary=True)
+        try:
+            results = await asyncio.gather(
+                db.put(b"x", b"1"),
+                db.put("str", 5),
+                db.put(b"y", b"2"),
+                db.write(WriteBatch().put(b"z", b"3").put(b"w", 4)),
+                return_exceptions=True,
+            )
+            assert results[0] is None and results[2] is None
+            assert isinstance(results[1], TypeError)
+            assert isinstance(results[3], TypeError)
+            assert await db.multi_get([b"x", b"y", b"z"]) == [b"1", b"2", b""]
+        finally:
+            await db.close()
+
+    asyncio.run(run())
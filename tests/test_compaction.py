@@ -0,0 +1,70 @@
+import time
+
+from hellodb.consts import TOMBSTONE_ENTRY
+from hellodb.db import HelloDB
+from hellodb.sstable.compaction import merge_sstables
+
+
+class Table(object):
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+    def get_all_pairs(self):
+        return iter(self.pairs)
+
+
+class Writer(object):
+    def __init__(self):
+        self.pairs = []
+
+    def write_key_value(self, key, value):
+        self.pairs.append((key, value))
+
+
+OLDER = Table([(b"a", b"1"), (b"b", b"1"), (b"c", b"1")])
+NEWER = Table([(b"a", b"2"), (b"b", TOMBSTONE_ENTRY), (b"d", b"2")])
+
+
+def test_newer_tables_shadow_older_ones():
+    writer = Writer()
+    merge_sstables([OLDER, NEWER], writer, drop_tombstones=False)
+    assert writer.pairs == [
+        (b"a", b"2"),
+        (b"b", TOMBSTONE_ENTRY),
+        (b"c", b"1"),
+        (b"d", b"2"),
+    ]
+
+
+def test_tombstones_are_dropped_with_the_oldest_table():
+    writer = Writer()
+    merge_sstables([OLDER, NEWER], writer, drop_tombstones=True)
+    assert writer.pairs == [(b"a", b"2"), (b"c", b"1"), (b"d", b"2")]
+
+
+def test_compacted_tables_read_the_newest_versions(tmp_path):
+    db = HelloDB(str(tmp_path), 100)
+    expected = {}
+    for round in range(8):
+        for i in range(500):
+            key = "key{:04d}".format((i * 7 + round) % 600)
+            if i % 5 == 0:
+                db.delete(key)
+                expected[key] = ""
+            else:
+                db.put(key, "{}-{}".format(round, i))
+                expected[key] = "{}-{}".format(round, i)
+    deadline = time.monotonic() + 10
+    while not db.get_compaction_stats()["compactions"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    try:
+        assert {key: db.get(key) for key in expected} == expected
+    finally:
+        db.close()
+
+    db = HelloDB(str(tmp_path), 100)
+    try:
+        assert {key: db.get(key) for key in expected} == expected
+    finally:
+        db.close()
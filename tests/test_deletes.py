@@ -0,0 +1,28 @@
+from hellodb.db import HelloDB
+from hellodb.write_batch import WriteBatch
+
+VALUE = b"TOMBSTONE"
+
+
+def check(db):
+    assert db.get(b"put") == VALUE
+    assert db.get(b"batch_put") == VALUE
+    assert db.get(b"deleted") == b""
+    assert db.multi_get([b"put", b"deleted", b"batch_put"]) == [VALUE, b"", VALUE]
+    assert [key for key, _ in db.scan()] == [b"batch_put", b"put"]
+
+
+def test_deletes_are_not_a_value(tmp_path):
+    db = HelloDB(str(tmp_path), None, binary=True)
+    db.put(b"deleted", b"value")
+    db.put(b"put", VALUE)
+    db.write(WriteBatch().put(b"batch_put", VALUE).delete(b"deleted"))
+    check(db)
+    db.close()
+
+    # replayed from the WAL and flushed to a table
+    db = HelloDB(str(tmp_path), None, binary=True)
+    try:
+        check(db)
+    finally:
+        db.close()
@@ -0,0 +1,41 @@
+import errno
+
+import pytest
+
+from hellodb.db import BackgroundError, HelloDB
+
+
+def failing_writes(db, failures):
+    write_sstable = db._write_sstable
+
+    def write(memstore, file_id):
+        if failures[0] > 0:
+            failures[0] -= 1
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return write_sstable(memstore, file_id)
+
+    db._write_sstable = write
+
+
+def test_failed_flush_is_retried(tmp_path):
+    db = HelloDB(str(tmp_path), 50)
+    failing_writes(db, [1])
+    for i in range(1000):
+        db.put("key{}".format(i), "value{}".format(i))
+    db.close()
+
+    db = HelloDB(str(tmp_path), 50)
+    try:
+        assert db.get("key999") == "value999"
+    finally:
+        db.close()
+
+
+def test_writes_fail_once_flushing_stops(tmp_path):
+    db = HelloDB(str(tmp_path), 50)
+    failing_writes(db, [float("inf")])
+    with pytest.raises(BackgroundError):
+        for i in range(1000):
+            db.put("key{}".format(i), "value{}".format(i))
+    assert db.get("key0") == "value0"
+    db.close()
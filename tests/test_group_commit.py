@@ -0,0 +1,53 @@
+from threading import Barrier, Thread
+
+from hellodb.db import HelloDB
+from hellodb.write_batch import WriteBatch
+
+WRITERS = 6
+KEYS_PER_WRITER = 200
+
+
+def test_invalid_write_fails_only_its_caller(tmp_path):
+    db = HelloDB(str(tmp_path), None, binary=True)
+    barrier = Barrier(WRITERS)
+    errors = []
+
+    def good_writer(worker):
+        barrier.wait()
+        try:
+            for i in range(KEYS_PER_WRITER):
+                db.put("{}-{}".format(worker, i).encode(), b"value")
+        except Exception as ex:
+            errors.append(ex)
+
+    invalid_writes = (
+        (lambda: db.put(b"k" * 70000, b"value"), ValueError),
+        (lambda: db.put(b"key", 5), TypeError),
+        (lambda: db.write(WriteBatch().put(b"ok", b"value").put(b"key", 5)), TypeError),
+    )
+
+    def bad_writer(worker):
+        barrier.wait()
+        for _ in range(KEYS_PER_WRITER):
+            for write, error in invalid_writes:
+                try:
+                    write()
+                    errors.append("invalid write accepted")
+                except error:
+                    pass
+
+    threads = [Thread(target=bad_writer, args=(0,))] + [
+        Thread(target=good_writer, args=(worker,)) for worker in range(1, WRITERS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert errors == []
+        assert db.get(b"ok") == b""
+        for worker in range(1, WRITERS):
+            for i in range(KEYS_PER_WRITER):
+                assert db.get("{}-{}".format(worker, i).encode()) == b"value"
+    finally:
+        db.close()
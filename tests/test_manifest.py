@@ -0,0 +1,65 @@
+import os
+import shutil
+
+from hellodb.db import HelloDB
+from hellodb.manifest import Manifest, TableMeta, VersionEdit
+
+
+def table(file_id):
+    return TableMeta(file_id, 100, 10, b"a", b"z", (file_id, file_id))
+
+
+def test_recover_replays_every_edit(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    assert not manifest.recover()
+    manifest.write_snapshot([table(0), table(1)], 2)
+    edit = VersionEdit(4)
+    edit.add_table(table(3))
+    edit.delete_table(0)
+    manifest.log_and_apply(edit)
+    manifest.close()
+
+    manifest = Manifest(str(tmp_path))
+    try:
+        assert manifest.recover()
+        assert [meta.file_id for meta in manifest.live_tables()] == [1, 3]
+        assert manifest.next_file_id == 4
+        # a new snapshot replaces the previous manifest
+        manifest.write_snapshot(manifest.live_tables(), manifest.next_file_id)
+        assert sorted(name for name in os.listdir(tmp_path) if "MANIFEST" in name) == [
+            "MANIFEST-1"
+        ]
+        with open(os.path.join(tmp_path, "CURRENT")) as current_file:
+            assert current_file.read().strip() == "MANIFEST-1"
+    finally:
+        manifest.close()
+
+
+def write(path, value):
+    os.makedirs(path)
+    db = HelloDB(str(path), 100)
+    for i in range(1000):
+        db.put("key{:04d}".format(i), value + str(i))
+    db.close()
+    return sorted(name for name in os.listdir(path) if name.endswith(".sst"))
+
+
+def test_tables_missing_from_the_manifest_are_deleted(tmp_path):
+    stale_path, db_path = tmp_path / "stale", tmp_path / "db"
+    stale_tables = write(stale_path, "stale")
+    write(db_path, "value")
+
+    # a table whose edit never reached the manifest and a table that was
+    # still being written
+    shutil.copy(stale_path / stale_tables[-1], db_path / "900.sst")
+    with open(db_path / "901.sst.tmp", "wb") as tmp_file:
+        tmp_file.write(b"partial")
+    db = HelloDB(str(db_path), 100)
+    try:
+        names = os.listdir(db_path)
+        assert "900.sst" not in names and "901.sst.tmp" not in names
+        assert [db.get("key{:04d}".format(i)) for i in range(1000)] == [
+            "value{}".format(i) for i in range(1000)
+        ]
+    finally:
+        db.close()
@@ -0,0 +1,27 @@
+import os
+
+from hellodb.db import HelloDB
+
+NUM_KEYS = 30000
+
+
+def key(i):
+    return "key{:05d}".format(i)
+
+
+def test_reopen_after_overwrite_reads_newest_values(tmp_path):
+    # more than 5000 records per memstore, a memstore must still map to
+    # a single WAL file that its flush deletes
+    db = HelloDB(str(tmp_path), None)
+    for value in ("old", "new"):
+        for i in range(NUM_KEYS):
+            db.put(key(i), value)
+    db.close()
+    wal_files = [name for name in os.listdir(tmp_path) if name.endswith(".wal")]
+    assert len(wal_files) <= 1
+
+    db = HelloDB(str(tmp_path), None)
+    try:
+        assert [db.get(key(i)) for i in range(NUM_KEYS)] == ["new"] * NUM_KEYS
+    finally:
+        db.close()
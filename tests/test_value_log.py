@@ -0,0 +1,44 @@
+import os
+
+from hellodb.db import HelloDB
+
+NUM_KEYS = 300
+
+
+def value(i, generation):
+    return "{}-{}-".format(i, generation) * 40
+
+
+def open_db(path):
+    return HelloDB(
+        str(path), 200, value_log_threshold=100, value_log_file_size=20000
+    )
+
+
+def vlog_files(path):
+    return sorted(name for name in os.listdir(path) if name.endswith(".vlog"))
+
+
+def test_collected_files_relocate_live_values(tmp_path):
+    db = open_db(tmp_path)
+    for i in range(NUM_KEYS):
+        db.put("key{:04d}".format(i), value(i, 0))
+    first_files = vlog_files(tmp_path)
+    # every value log file ends up about half dead, the odd keys still
+    # point into them and are moved before the files go
+    for i in range(0, NUM_KEYS, 2):
+        db.put("key{:04d}".format(i), value(i, 1))
+    db.collect_garbage()
+    expected = [value(i, 1 - i % 2) for i in range(NUM_KEYS)]
+    try:
+        assert db.get_value_log_stats()["gc_files_collected"] > 0
+        assert set(first_files) - set(vlog_files(tmp_path))
+        assert [db.get("key{:04d}".format(i)) for i in range(NUM_KEYS)] == expected
+    finally:
+        db.close()
+
+    db = open_db(tmp_path)
+    try:
+        assert [db.get("key{:04d}".format(i)) for i in range(NUM_KEYS)] == expected
+    finally:
+        db.close()
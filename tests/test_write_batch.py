@@ -0,0 +1,31 @@
+import os
+
+from hellodb.db import HelloDB
+from hellodb.write_batch import WriteBatch
+
+
+def test_torn_batch_is_not_replayed(tmp_path):
+    db = HelloDB(str(tmp_path), None)
+    db.put("deleted", "value")
+    batch = WriteBatch()
+    for i in range(1000):
+        batch.put("key{}".format(i), "value{}".format(i))
+    batch.delete("deleted")
+    db.write(batch)
+    db.write(WriteBatch().put("torn1", "value").delete("key0").put("torn2", "value"))
+    db.close()
+
+    # cut the last record short, as a crash in the middle of its write would
+    (wal_file,) = [name for name in os.listdir(tmp_path) if name.endswith(".wal")]
+    wal_path = os.path.join(tmp_path, wal_file)
+    with open(wal_path, "r+b") as fh:
+        fh.truncate(os.path.getsize(wal_path) - 3)
+
+    db = HelloDB(str(tmp_path), None)
+    try:
+        assert db.get("key999") == "value999"
+        assert db.get("deleted") == ""
+        assert db.get("key0") == "value0"
+        assert db.get("torn1") == "" and db.get("torn2") == ""
+    finally:
+        db.close()